@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Adaptive output decimation for simulation streams
+Decides which integration steps are worth publishing instead of a fixed stride
+"""
+
+import numpy as np
+from typing import List, Optional, Sequence, Tuple
+
+
+class AdaptiveSampler:
+    """
+    Emits a sample when the trajectory leaves its predicted path
+
+    The prediction is either a linear extrapolation from the last emitted
+    sample ("linear") or the cubic Hermite curve a subscriber would draw
+    between two emitted samples using their positions and derivatives
+    ("hermite"). A heartbeat forces a sample every max_gap steps, and
+    boost() switches to full rate for a window of steps.
+    """
+
+    def __init__(self, tolerance: float = 1e-3, max_gap: int = 500,
+                 full_rate_window: int = 50, prediction: str = 'hermite', dim: int = 2):
+        self.tolerance = tolerance            # max allowed reconstruction error
+        self.max_gap = max(1, int(max_gap))   # heartbeat in steps
+        self.full_rate_window = full_rate_window
+        self.prediction = prediction
+        self.dim = dim
+
+        # Last emitted sample (anchor of the current segment)
+        self._anchor_step = None
+        self._anchor_t = 0.0
+        self._anchor_p = np.zeros(dim)
+        self._anchor_v = np.zeros(dim)
+
+        # Steps seen since the anchor but not emitted (hermite mode)
+        self._pending_steps = np.zeros(self.max_gap, dtype=np.int64)
+        self._pending_t = np.zeros(self.max_gap)
+        self._pending_p = np.zeros((self.max_gap, dim))
+        self._pending_v = np.zeros((self.max_gap, dim))
+        self._n_pending = 0
+
+        self._full_rate_until = -1
+        self.emitted = 0
+        self.offered = 0
+
+    def boost(self, step: int):
+        """Emit every step until full_rate_window steps after step"""
+        self._full_rate_until = max(self._full_rate_until, step + self.full_rate_window)
+
+    def offer(self, step: int, t: float, state: Sequence[float],
+              deriv: Sequence[float]) -> List[Tuple[int, Tuple[float, ...], Tuple[float, ...]]]:
+        """
+        Offer the state after an integration step
+        Returns the (step, state, deriv) samples to publish, oldest first
+        """
+        self.offered += 1
+
+        if self._anchor_step is None or step <= self._full_rate_until:
+            # Close the open segment first so the state before an input jump is kept
+            samples = [] if self._n_pending == 0 else [self._emit_pending(self._n_pending - 1)]
+            samples.append(self._emit_current(step, t, state, deriv))
+            return samples
+
+        p = np.asarray(state, dtype=float)
+        v = np.asarray(deriv, dtype=float)
+        heartbeat = step - self._anchor_step >= self.max_gap
+
+        if self.prediction == 'linear':
+            predicted = self._anchor_p + self._anchor_v * (t - self._anchor_t)
+            if heartbeat or np.max(np.abs(predicted - p)) > self.tolerance:
+                return [self._emit_current(step, t, state, deriv)]
+            return []
+
+        # Hermite: check that the skipped steps stay on the interpolant
+        # between the anchor and the current state
+        n = self._n_pending
+        if n > 0 and self._hermite_error(t, p, v) > self.tolerance:
+            sample = self._emit_pending(n - 1)
+            self._push_pending(step, t, p, v)
+            return [sample]
+        if heartbeat:
+            return [self._emit_current(step, t, state, deriv)]
+
+        self._push_pending(step, t, p, v)
+        return []
+
+    def flush(self) -> Optional[Tuple[int, Tuple[float, ...], Tuple[float, ...]]]:
+        """Emit the most recent pending step, e.g. when the simulation ends"""
+        if self._n_pending == 0:
+            return None
+        return self._emit_pending(self._n_pending - 1)
+
+    def _hermite_error(self, t: float, p: np.ndarray, v: np.ndarray) -> float:
+        """Max deviation of the pending steps from the Hermite interpolant"""
+        n = self._n_pending
+        h = t - self._anchor_t
+        if h <= 0:
+            return 0.0
+        s = ((self._pending_t[:n] - self._anchor_t) / h)[:, None]
+        s2 = s * s
+        s3 = s2 * s
+        h00 = 2 * s3 - 3 * s2 + 1
+        h10 = s3 - 2 * s2 + s
+        h01 = -2 * s3 + 3 * s2
+        h11 = s3 - s2
+        curve = (h00 * self._anchor_p + h10 * h * self._anchor_v
+                 + h01 * p + h11 * h * v)
+        return float(np.max(np.abs(curve - self._pending_p[:n])))
+
+    def _push_pending(self, step: int, t: float, p: np.ndarray, v: np.ndarray):
+        """Remember a skipped step"""
+        n = self._n_pending
+        if n == self.max_gap:
+            # Should not happen thanks to the heartbeat; drop the oldest
+            self._pending_steps[:-1] = self._pending_steps[1:]
+            self._pending_t[:-1] = self._pending_t[1:]
+            self._pending_p[:-1] = self._pending_p[1:]
+            self._pending_v[:-1] = self._pending_v[1:]
+            n -= 1
+        self._pending_steps[n] = step
+        self._pending_t[n] = t
+        self._pending_p[n] = p
+        self._pending_v[n] = v
+        self._n_pending = n + 1
+
+    def _emit_pending(self, i: int):
+        """Emit pending step i and make it the new anchor"""
+        step = int(self._pending_steps[i])
+        self._anchor_step = step
+        self._anchor_t = self._pending_t[i]
+        self._anchor_p = self._pending_p[i].copy()
+        self._anchor_v = self._pending_v[i].copy()
+        self._n_pending = 0
+        self.emitted += 1
+        return step, tuple(self._anchor_p.tolist()), tuple(self._anchor_v.tolist())
+
+    def _emit_current(self, step: int, t: float, state: Sequence[float], deriv: Sequence[float]):
+        """Emit the offered step and make it the new anchor"""
+        self._anchor_step = step
+        self._anchor_t = t
+        self._anchor_p = np.asarray(state, dtype=float).copy()
+        self._anchor_v = np.asarray(deriv, dtype=float).copy()
+        self._n_pending = 0
+        self.emitted += 1
+        return step, tuple(state), tuple(deriv)
+
+
+def create_sampler(params, dim: int = 2) -> Optional[AdaptiveSampler]:
+    """Build a sampler from simulation parameters, None for stride publishing"""
+    if params.get("publish_mode", "stride") != "adaptive":
+        return None
+    return AdaptiveSampler(
+        tolerance=params.get("sample_tolerance", 1e-3),
+        max_gap=params.get("max_publish_gap", 10 * params.get("publish_frequency", 100)),
+        full_rate_window=params.get("full_rate_window", 50),
+        prediction=params.get("sample_prediction", "hermite"),
+        dim=dim
+    )
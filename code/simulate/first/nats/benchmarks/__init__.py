@@ -0,0 +1,4 @@
+"""
+Benchmark suite for the NATS simulation system
+Run from the nats directory: python -m benchmarks --help
+"""
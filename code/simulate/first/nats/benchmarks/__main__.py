@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark runner
+Runs the suites, writes machine-readable results and compares them against
+a previous run to catch hot-path regressions
+
+    python -m benchmarks --quick --output bench.json
+    python -m benchmarks --compare bench_main.json --threshold 0.1
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+SUITES = ("integrators", "serialization", "engine_loop", "pipeline")
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """
+    Return (name, baseline, current, change) for results worse than threshold
+    Results missing from the baseline, or with a zero baseline that gives no
+    relative change, are listed but never count as regressions
+    """
+    regressions = []
+    for name, record in current["results"].items():
+        old = baseline["results"].get(name)
+        if not old or not old["value"]:
+            status = "new" if not old else "zero base"
+            print(f"{status:>10}  {name:<45} {'':>14} -> {record['value']:>14.4g} {record['unit']}")
+            continue
+        change = (record["value"] - old["value"]) / old["value"]
+        worse = -change if record.get("higher_is_better", True) else change
+        status = "REGRESSION" if worse > threshold else "ok"
+        print(f"{status:>10}  {name:<45} {old['value']:>14.4g} -> {record['value']:>14.4g} {record['unit']} ({change:+.1%})")
+        if worse > threshold:
+            regressions.append((name, old["value"], record["value"], change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark integrators, engine loop and NATS pipeline")
+    parser.add_argument("--quick", action="store_true", help="Shorter runs for CI")
+    parser.add_argument("--only", nargs="+", choices=SUITES, help="Run only these suites")
+    parser.add_argument("--server", default="nats://localhost:4222", help="NATS server for the pipeline suite")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--compare", help="Baseline JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Allowed relative slowdown")
+    args = parser.parse_args()
+
+    results = {}
+    for suite in args.only or SUITES:
+        print(f"Running {suite}...", file=sys.stderr)
+        module = __import__(f"benchmarks.{suite}", fromlist=["run"])
+        if suite == "pipeline":
+            results.update(module.run(args.quick, args.server))
+        else:
+            results.update(module.run(args.quick))
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "quick": args.quick,
+        "results": results
+    }
+
+    for name, record in results.items():
+        print(f"{name:<45} {record['value']:>14.4g} {record['unit']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) above {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Shared helpers for the benchmark suite
+Timing, result records and a no-op JetStream publisher
+"""
+
+import time
+from typing import Any, Callable, Dict
+
+
+def best_rate(fn: Callable[[], int], repeat: int = 5) -> float:
+    """
+    Run fn repeat times and return the best rate in operations/sec
+    fn performs some work and returns how many operations it did
+    """
+    best = 0.0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        ops = fn()
+        elapsed = time.perf_counter() - start
+        if elapsed > 0:
+            best = max(best, ops / elapsed)
+    return best
+
+
+def result(value: float, unit: str, higher_is_better: bool = True, **extra) -> Dict[str, Any]:
+    """Machine-readable record of one measurement"""
+    record = {"value": value, "unit": unit, "higher_is_better": higher_is_better}
+    record.update(extra)
+    return record
+
+
+class NullJetStream:
+    """JetStream stand-in that counts publishes, isolates the engine from the network"""
+
+    def __init__(self):
+        self.published = 0
+        self.bytes = 0
+
+    async def publish(self, subject, payload, **kwargs):
+        self.published += 1
+        self.bytes += len(payload)
+
+    async def add_stream(self, *args, **kwargs):
+        pass
+
+    async def subscribe(self, *args, **kwargs):
+        pass
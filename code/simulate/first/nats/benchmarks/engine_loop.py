@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Engine loop benchmarks
+Steps/sec of SimulationEngine runners with a no-op publisher, for one
+simulation and for N concurrent simulations in the same engine
+"""
+
+import asyncio
+import contextlib
+import io
+import time
+from typing import Any, Dict
+
+from simulation_engine import SimulationEngine
+from input_control import SimulationState
+from benchmarks.common import NullJetStream, result
+
+# Configuration from PERFORMANCE_GUIDE.md "High Performance"
+HOPF_PARAMS = {
+    "type": "hopf",
+    "dt": 0.001,
+    "integration_method": "rk4",
+    "publish_frequency": 200,
+    "status_frequency": 2000,
+    "mu": 0.1,
+    "omega": 1.0,
+    "alpha": -1.0,
+    "beta": -1.0,
+    "x0": 0.1,
+    "y0": 0.1
+}
+
+PREDATOR_PREY_PARAMS = {
+    "type": "predator_prey",
+    "dt": 0.001,
+    "integration_method": "rk4",
+    "publish_frequency": 200,
+    "status_frequency": 2000
+}
+
+
+def make_engine() -> SimulationEngine:
+    """Engine wired to a NullJetStream, keeping per-sim metrics after completion"""
+    engine = SimulationEngine(metrics_interval=0)
+    engine.js = NullJetStream()
+    engine.metrics.remove = lambda sim_id: None
+    return engine
+
+
+async def run_simulations(params: Dict[str, Any], n_sims: int, duration: float) -> Dict[str, float]:
+    """Run n_sims copies of a simulation concurrently, returns aggregate rates"""
+    engine = make_engine()
+    runs = []
+    for i in range(n_sims):
+        sim_id = f"bench_{i}"
+        engine.controller.simulations[sim_id] = SimulationState.RUNNING
+        runs.append(engine._run_simulation(sim_id, dict(params, duration=duration)))
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        await asyncio.gather(*runs)
+    elapsed = time.perf_counter() - start
+
+    steps = sum(m.steps for m in engine.metrics.simulations.values())
+    return {
+        "steps_per_sec": steps / elapsed,
+        "published_per_sec": engine.js.published / elapsed
+    }
+
+
+def pacing_error(params: Dict[str, Any], n_sims: int, duration: float) -> Dict[str, Any]:
+    """Relative deviation of paced runs from their realtime_factor / dt steps/sec target"""
+    target = params["realtime_factor"] / params["dt"]
+    rates = asyncio.run(run_simulations(params, n_sims, duration))
+    achieved = rates["steps_per_sec"] / n_sims
+    return result(abs(achieved - target) / target, "relative error", higher_is_better=False,
+                  target_steps_per_sec=target, steps_per_sec=achieved)
+
+
+def run(quick: bool = False) -> Dict[str, Any]:
+    duration = 1.0 if quick else 5.0
+    results = {}
+
+    # Throughput rows run free (realtime_factor 0), paced runs only show their cap;
+    # paced runs are measured separately for how closely they hold realtime_factor / dt
+    for name, params in (("hopf", HOPF_PARAMS), ("predator_prey", PREDATOR_PREY_PARAMS)):
+        rates = asyncio.run(run_simulations(dict(params, realtime_factor=0), 1, duration))
+        results[f"engine.{name}.steps"] = result(rates["steps_per_sec"], "steps/s", dt=params["dt"])
+        results[f"pacing.{name}.error"] = pacing_error(dict(params, realtime_factor=1.0), 1, duration)
+
+    for n_sims in ((1, 8) if quick else (1, 4, 16, 64)):
+        rates = asyncio.run(run_simulations(dict(HOPF_PARAMS, realtime_factor=0), n_sims, duration))
+        results[f"concurrency.hopf.{n_sims}.steps"] = result(
+            rates["steps_per_sec"], "steps/s", simulations=n_sims)
+        results[f"pacing.hopf.{n_sims}.error"] = pacing_error(
+            dict(HOPF_PARAMS, realtime_factor=1.0), n_sims, duration)
+    return results
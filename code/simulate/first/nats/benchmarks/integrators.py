@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Integrator benchmarks
+Steps/sec of HopfNormalForm and PredatorPreyModel for each integration method,
+on the scalar path (one trajectory) and the array path (many trajectories),
+and of StochasticModel ensembles for each SDE scheme
+"""
+
+import numpy as np
+from typing import Any, Dict
+
+from core_simulation import HopfNormalForm, PredatorPreyModel, StochasticModel
+from benchmarks.common import best_rate, result
+
+METHODS = ('euler', 'rk2', 'rk4')
+
+
+def _models(method: str):
+    yield 'hopf', HopfNormalForm(mu=0.1, omega=1.0, alpha=-1.0, beta=-1.0, dt=0.001,
+                                 integration_method=method), (0.1, 0.1)
+    yield 'predator_prey', PredatorPreyModel(dt=0.01, integration_method=method), (10.0, 5.0)
+
+
+def run(quick: bool = False) -> Dict[str, Any]:
+    steps = 20000 if quick else 200000
+    array_steps = 200 if quick else 2000
+    n_traj = 1000
+    results = {}
+
+    for method in METHODS:
+        for name, model, (x0, y0) in _models(method):
+            def scalar():
+                x, y = x0, y0
+                step = model.step
+                for _ in range(steps):
+                    x, y = step(x, y)
+                return steps
+
+            # The array path goes through the integrator directly, step() has a
+            # scalar-only overflow check
+            xs = np.full(n_traj, x0)
+            ys = np.full(n_traj, y0)
+
+            def array():
+                x, y = xs, ys
+                integrate = model._integrate
+                for _ in range(array_steps):
+                    x, y = integrate(x, y)
+                return array_steps * n_traj
+
+            results[f"integrator.{name}.{method}.scalar"] = result(best_rate(scalar, 3), "steps/s")
+            results[f"integrator.{name}.{method}.array{n_traj}"] = result(
+                best_rate(array, 3), "trajectory-steps/s")
+
+    # Monte-Carlo ensembles, noise drawn in blocks
+    n_paths = 10000
+    sde_steps = 20 if quick else 200
+    for method in StochasticModel.METHODS:
+        for name, model, (x0, y0) in _models('rk4'):
+            sde = StochasticModel(model, 0.05, 0.05, 'multiplicative', method, seed=0)
+
+            def ensemble():
+                sde.simulate(x0, y0, sde_steps, n_paths=n_paths, record_every=sde_steps)
+                return sde_steps * n_paths
+
+            results[f"sde.{name}.{method}.paths{n_paths}"] = result(
+                best_rate(ensemble, 3), "trajectory-steps/s")
+    return results
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+End-to-end pipeline benchmark
+Engine -> nats-server -> subscriber throughput and latency, needs a local
+nats-server with JetStream (nats-server -js)
+"""
+
+import asyncio
+import contextlib
+import io
+import json
+import time
+from typing import Any, Dict
+from urllib.parse import urlparse
+
+import nats
+
+from simulation_engine import SimulationEngine
+from benchmarks.common import result
+from benchmarks.engine_loop import HOPF_PARAMS
+
+
+async def measure(server: str, duration: float) -> Dict[str, Any]:
+    engine = SimulationEngine(server=server, metrics_interval=0)
+    engine.metrics.remove = lambda sim_id: None
+    sub_nc = await nats.connect(server)
+
+    received = 0
+    latency_sum = 0.0
+
+    async def handler(msg):
+        nonlocal received, latency_sum
+        data = json.loads(msg.data)
+        received += 1
+        latency_sum += time.time() - data["timestamp"]
+
+    sim_id = f"bench_pipeline_{int(time.time())}"
+    await sub_nc.subscribe(f"sim.hopf.{sim_id}.>", cb=handler)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        # The data stream has to exist before SIMULATION_CONTROL claims sim.control.>
+        try:
+            await sub_nc.jetstream().add_stream(name="SIMULATION", subjects=["sim.>"])
+        except Exception:
+            pass
+        await engine.connect()
+        params = dict(HOPF_PARAMS, duration=duration, publish_frequency=1)
+        await engine.controller._start_simulation(sim_id, params)
+        # The runner cancels its own task when it stops, so wait instead of awaiting it
+        await asyncio.wait([engine.controller.simulation_tasks[sim_id]])
+        await asyncio.sleep(0.5)  # drain in-flight messages
+        await engine.close()
+
+    await sub_nc.close()
+    steps = engine.metrics.simulations[sim_id].steps
+    return {
+        "pipeline.hopf.received": result(received / duration, "msgs/s"),
+        "pipeline.hopf.steps": result(steps / duration, "steps/s"),
+        "pipeline.hopf.latency": result(latency_sum / received if received else 0.0, "s",
+                                        higher_is_better=False)
+    }
+
+
+async def server_reachable(server: str, timeout: float = 1.0) -> bool:
+    """Probe the server port, nats.connect keeps retrying for minutes"""
+    url = urlparse(server)
+    try:
+        _, writer = await asyncio.wait_for(
+            asyncio.open_connection(url.hostname, url.port or 4222), timeout)
+        writer.close()
+        return True
+    except Exception:
+        return False
+
+
+def run(quick: bool = False, server: str = "nats://localhost:4222") -> Dict[str, Any]:
+    duration = 2.0 if quick else 10.0
+    if not asyncio.run(server_reachable(server)):
+        print(f"Skipping pipeline benchmark, no nats-server at {server}")
+        return {}
+    try:
+        return asyncio.run(measure(server, duration))
+    except Exception as e:
+        print(f"Skipping pipeline benchmark, nats-server not usable at {server}: {e}")
+        return {}
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Message encoding benchmarks
+Cost of building and JSON-encoding the data messages the engine publishes
+"""
+
+import json
+from typing import Any, Dict
+
+from core_simulation import HopfNormalForm, PredatorPreyModel
+from simulation_engine import SimulationEngine
+from benchmarks.common import best_rate, result
+
+
+def run(quick: bool = False) -> Dict[str, Any]:
+    n = 20000 if quick else 200000
+    engine = SimulationEngine()
+    hopf = HopfNormalForm(beta=-1.0)
+    pp = PredatorPreyModel()
+    hopf_sample = (1234, (0.31, -0.12), (0.05, 0.2))
+    pp_sample = (1234, (10.5, 4.2), (0.3, -0.1))
+    hopf_message = engine._hopf_message("bench", hopf, hopf_sample)
+    results = {}
+
+    def encode_only():
+        dumps = json.dumps
+        for _ in range(n):
+            dumps(hopf_message).encode()
+        return n
+
+    def build_and_encode_hopf():
+        for _ in range(n):
+            json.dumps(engine._hopf_message("bench", hopf, hopf_sample)).encode()
+        return n
+
+    def build_and_encode_pp():
+        for _ in range(n):
+            json.dumps(engine._predator_prey_message("bench", pp, pp_sample)).encode()
+        return n
+
+    results["serialization.hopf.encode"] = result(best_rate(encode_only), "msgs/s")
+    results["serialization.hopf.build_encode"] = result(best_rate(build_and_encode_hopf), "msgs/s")
+    results["serialization.predator_prey.build_encode"] = result(best_rate(build_and_encode_pp), "msgs/s")
+    results["serialization.hopf.message_bytes"] = result(
+        len(json.dumps(hopf_message).encode()), "bytes", higher_is_better=False)
+    return results
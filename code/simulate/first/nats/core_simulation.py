@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+Core simulation module containing mathematical functions
+Similar to the core Hopf normal form logic from n1.lua
+"""
+
+import numpy as np
+from typing import Dict, Tuple, Any, Callable
+
+
+class HopfNormalForm:
+    """
+    Core Hopf normal form implementation
+    Based on the mathematical formulation from n1.lua
+    """
+    
+    def __init__(self, mu: float = 0.1, omega: float = 1.0, 
+                 alpha: float = -1.0, beta: float = 1.0, dt: float = 0.01,
+                 integration_method: str = 'rk4'):
+        self.mu = mu          # bifurcation parameter
+        self.omega = omega    # frequency of oscillations
+        self.alpha = alpha    # negative for stable limit cycle
+        self.beta = beta      # frequency shift with amplitude
+        self.dt = dt          # time step
+        self.integration_method = integration_method
+        
+        # Setup integration method
+        if integration_method == 'rk4':
+            self._integrate = self._rk4_step
+        elif integration_method == 'rk2':
+            self._integrate = self._rk2_step
+        else:
+            self._integrate = self._euler_step
+    
+    def step(self, x: float, y: float) -> Tuple[float, float]:
+        """
+        Perform one step of Hopf normal form integration
+        Returns updated (x, y) values
+        """
+        # Check for numerical stability
+        if abs(x) > 1e6 or abs(y) > 1e6:
+            raise ValueError(f"Numerical overflow: x={x}, y={y}")
+        
+        return self._integrate(x, y)
+    
+    def get_derivatives(self, x: float, y: float) -> Tuple[float, float]:
+        """Get current derivatives without updating state"""
+        dx_dt = self.mu * x - self.omega * y + self.alpha * x * (x**2 + y**2)
+        dy_dt = self.mu * y + self.omega * x + self.beta * y * (x**2 + y**2)
+        return dx_dt, dy_dt
+    
+    def _euler_step(self, x: float, y: float) -> Tuple[float, float]:
+        """Euler integration method"""
+        dx_dt, dy_dt = self.get_derivatives(x, y)
+        return x + dx_dt * self.dt, y + dy_dt * self.dt
+    
+    def _rk2_step(self, x: float, y: float) -> Tuple[float, float]:
+        """2nd order Runge-Kutta (midpoint method)"""
+        dx_dt1, dy_dt1 = self.get_derivatives(x, y)
+        x_mid = x + 0.5 * self.dt * dx_dt1
+        y_mid = y + 0.5 * self.dt * dy_dt1
+        
+        dx_dt2, dy_dt2 = self.get_derivatives(x_mid, y_mid)
+        return x + self.dt * dx_dt2, y + self.dt * dy_dt2
+    
+    def _rk4_step(self, x: float, y: float) -> Tuple[float, float]:
+        """4th order Runge-Kutta integration method"""
+        # k1
+        dx_dt1, dy_dt1 = self.get_derivatives(x, y)
+        k1_x, k1_y = self.dt * dx_dt1, self.dt * dy_dt1
+        
+        # k2
+        x2, y2 = x + 0.5 * k1_x, y + 0.5 * k1_y
+        dx_dt2, dy_dt2 = self.get_derivatives(x2, y2)
+        k2_x, k2_y = self.dt * dx_dt2, self.dt * dy_dt2
+        
+        # k3
+        x3, y3 = x + 0.5 * k2_x, y + 0.5 * k2_y
+        dx_dt3, dy_dt3 = self.get_derivatives(x3, y3)
+        k3_x, k3_y = self.dt * dx_dt3, self.dt * dy_dt3
+        
+        # k4
+        x4, y4 = x + k3_x, y + k3_y
+        dx_dt4, dy_dt4 = self.get_derivatives(x4, y4)
+        k4_x, k4_y = self.dt * dx_dt4, self.dt * dy_dt4
+        
+        # Combine
+        x_new = x + (k1_x + 2*k2_x + 2*k3_x + k4_x) / 6
+        y_new = y + (k1_y + 2*k2_y + 2*k3_y + k4_y) / 6
+        
+        return x_new, y_new
+    
+    def get_polar_coords(self, x: float, y: float) -> Tuple[float, float]:
+        """Convert to polar coordinates"""
+        r = np.sqrt(x**2 + y**2)
+        theta = np.arctan2(y, x)
+        return r, theta
+    
+    def update_params(self, **kwargs):
+        """Update simulation parameters"""
+        for key, value in kwargs.items():
+            if hasattr(self, key):
+                setattr(self, key, value)
+    
+    def get_params(self) -> Dict[str, Any]:
+        """Get current parameters"""
+        return {
+            'mu': self.mu,
+            'omega': self.omega,
+            'alpha': self.alpha,
+            'beta': self.beta,
+            'dt': self.dt,
+            'integration_method': self.integration_method
+        }
+
+
+class PredatorPreyModel:
+    """
+    Core Lotka-Volterra predator-prey implementation
+    Based on the mathematical formulation from n1-predprey.lua
+    """
+    
+    def __init__(self, alpha: float = 1.1, beta: float = 0.4, 
+                 delta: float = 0.1, gamma: float = 0.4, dt: float = 0.1,
+                 integration_method: str = 'rk4'):
+        self.alpha = alpha    # prey growth rate
+        self.beta = beta     # predation rate
+        self.delta = delta    # predator efficiency
+        self.gamma = gamma    # predator death rate
+        self.dt = dt         # time step
+        self.integration_method = integration_method
+        
+        # Setup integration method
+        if integration_method == 'rk4':
+            self._integrate = self._rk4_step
+        elif integration_method == 'rk2':
+            self._integrate = self._rk2_step
+        else:
+            self._integrate = self._euler_step
+    
+    def step(self, x: float, y: float) -> Tuple[float, float]:
+        """
+        Perform one step of Lotka-Volterra integration
+        Returns updated (prey, predator) values
+        """
+        return self._integrate(x, y)
+    
+    def get_derivatives(self, x: float, y: float) -> Tuple[float, float]:
+        """Get current derivatives without updating state"""
+        dx_dt = self.alpha * x - self.beta * x * y
+        dy_dt = self.delta * x * y - self.gamma * y
+        return dx_dt, dy_dt
+    
+    def _euler_step(self, x: float, y: float) -> Tuple[float, float]:
+        """Euler integration method"""
+        dx_dt, dy_dt = self.get_derivatives(x, y)
+        return x + dx_dt * self.dt, y + dy_dt * self.dt
+    
+    def _rk2_step(self, x: float, y: float) -> Tuple[float, float]:
+        """2nd order Runge-Kutta (midpoint method)"""
+        dx_dt1, dy_dt1 = self.get_derivatives(x, y)
+        x_mid = x + 0.5 * self.dt * dx_dt1
+        y_mid = y + 0.5 * self.dt * dy_dt1
+        
+        dx_dt2, dy_dt2 = self.get_derivatives(x_mid, y_mid)
+        return x + self.dt * dx_dt2, y + self.dt * dy_dt2
+    
+    def _rk4_step(self, x: float, y: float) -> Tuple[float, float]:
+        """4th order Runge-Kutta integration method"""
+        # k1
+        dx_dt1, dy_dt1 = self.get_derivatives(x, y)
+        k1_x, k1_y = self.dt * dx_dt1, self.dt * dy_dt1
+        
+        # k2
+        x2, y2 = x + 0.5 * k1_x, y + 0.5 * k1_y
+        dx_dt2, dy_dt2 = self.get_derivatives(x2, y2)
+        k2_x, k2_y = self.dt * dx_dt2, self.dt * dy_dt2
+        
+        # k3
+        x3, y3 = x + 0.5 * k2_x, y + 0.5 * k2_y
+        dx_dt3, dy_dt3 = self.get_derivatives(x3, y3)
+        k3_x, k3_y = self.dt * dx_dt3, self.dt * dy_dt3
+        
+        # k4
+        x4, y4 = x + k3_x, y + k3_y
+        dx_dt4, dy_dt4 = self.get_derivatives(x4, y4)
+        k4_x, k4_y = self.dt * dx_dt4, self.dt * dy_dt4
+        
+        # Combine
+        x_new = x + (k1_x + 2*k2_x + 2*k3_x + k4_x) / 6
+        y_new = y + (k1_y + 2*k2_y + 2*k3_y + k4_y) / 6
+        
+        return x_new, y_new
+    
+    def update_params(self, **kwargs):
+        """Update simulation parameters"""
+        for key, value in kwargs.items():
+            if hasattr(self, key):
+                setattr(self, key, value)
+    
+    def get_params(self) -> Dict[str, Any]:
+        """Get current parameters"""
+        return {
+            'alpha': self.alpha,
+            'beta': self.beta,
+            'delta': self.delta,
+            'gamma': self.gamma,
+            'dt': self.dt,
+            'integration_method': self.integration_method
+        }
+
+
+class StochasticModel:
+    """
+    Stochastic version of a deterministic model: dX = f(X) dt + g(X) dW
+    The drift f is the wrapped model's get_derivatives, the noise is diagonal,
+    either additive (g = sigma) or multiplicative (g = sigma * X).
+    Works on scalars or on arrays of independent realizations; Wiener
+    increments are drawn in blocks from a seeded numpy Generator.
+    """
+    
+    METHODS = ('euler_maruyama', 'milstein', 'srk')
+    
+    def __init__(self, model, sigma_x: float = 0.01, sigma_y: float = 0.01,
+                 noise_type: str = 'additive', method: str = 'euler_maruyama',
+                 seed=None, block_elements: int = 2**20):
+        if method not in self.METHODS:
+            raise ValueError(f"Unknown SDE method: {method}")
+        if noise_type not in ('additive', 'multiplicative'):
+            raise ValueError(f"Unknown noise type: {noise_type}")
+        self.model = model              # deterministic drift
+        self.sigma_x = sigma_x          # noise amplitude on x
+        self.sigma_y = sigma_y          # noise amplitude on y
+        self.noise_type = noise_type
+        self.method = method
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self.block_elements = block_elements  # random numbers drawn per block
+        
+        # Buffered standard normals for step()
+        self._normals = None
+        self._next = 0
+    
+    @property
+    def dt(self) -> float:
+        return self.model.dt
+    
+    def diffusion(self, x, y):
+        """Noise amplitudes g(x, y)"""
+        if self.noise_type == 'additive':
+            return self.sigma_x, self.sigma_y
+        return self.sigma_x * x, self.sigma_y * y
+    
+    def step(self, x, y):
+        """
+        Perform one stochastic step
+        x, y are scalars or arrays holding one value per realization
+        """
+        shape = np.shape(x)
+        # Same stability check as HopfNormalForm.step, which the drift bypasses
+        if shape:
+            overflow = np.any(np.abs(x) > 1e6) or np.any(np.abs(y) > 1e6)
+        else:
+            overflow = abs(x) > 1e6 or abs(y) > 1e6
+        if overflow:
+            raise ValueError(f"Numerical overflow: x={x}, y={y}")
+        n = int(np.prod(shape)) if shape else 1
+        if self._normals is None or self._normals.shape[2] != n or self._next >= len(self._normals):
+            self._normals = self._draw_block(n)
+            self._next = 0
+        z = self._normals[self._next]
+        self._next += 1
+        sqdt = np.sqrt(self.dt)
+        if shape:
+            dwx, dwy = z[0].reshape(shape) * sqdt, z[1].reshape(shape) * sqdt
+        else:
+            dwx, dwy = float(z[0, 0]) * sqdt, float(z[1, 0]) * sqdt
+        return self._sde_step(x, y, dwx, dwy)
+    
+    def simulate(self, x0, y0, n_steps: int, n_paths: int = 1, record_every: int = 1):
+        """
+        Integrate n_paths independent realizations for n_steps
+        Returns (t, X, Y) with X, Y of shape (n_steps // record_every + 1, n_paths)
+        """
+        x = np.full(n_paths, x0, dtype=float)
+        y = np.full(n_paths, y0, dtype=float)
+        n_records = n_steps // record_every + 1
+        X = np.empty((n_records, n_paths))
+        Y = np.empty((n_records, n_paths))
+        X[0], Y[0] = x, y
+        
+        sqdt = np.sqrt(self.dt)
+        step = 0
+        record = 1
+        while step < n_steps:
+            block = self._draw_block(n_paths, n_steps - step)
+            block *= sqdt
+            for dw in block:
+                x, y = self._sde_step(x, y, dw[0], dw[1])
+                step += 1
+                if step % record_every == 0:
+                    self._check_overflow(x, y)
+                    X[record], Y[record] = x, y
+                    record += 1
+            self._check_overflow(x, y)
+        
+        t = np.arange(n_records) * record_every * self.dt
+        return t, X, Y
+    
+    @staticmethod
+    def _check_overflow(x, y):
+        """The stability check of step() for arrays, also catching the NaN an overflow turns into"""
+        if not (np.all(np.abs(x) <= 1e6) and np.all(np.abs(y) <= 1e6)):
+            raise ValueError(f"Numerical overflow: x={x}, y={y}")
+    
+    def _draw_block(self, n_paths: int, max_steps: int = None) -> np.ndarray:
+        """Standard normals of shape (steps, 2, n_paths) for a block of steps"""
+        steps = max(1, self.block_elements // (2 * n_paths))
+        if max_steps is not None:
+            steps = min(steps, max_steps)
+        return self.rng.standard_normal((steps, 2, n_paths))
+    
+    def _sde_step(self, x, y, dwx, dwy):
+        """One step of the selected scheme given Wiener increments"""
+        dt = self.dt
+        fx, fy = self.model.get_derivatives(x, y)
+        gx, gy = self.diffusion(x, y)
+        x_new = x + fx * dt + gx * dwx
+        y_new = y + fy * dt + gy * dwy
+        
+        if self.method == 'milstein' and self.noise_type == 'multiplicative':
+            # 0.5 g g' (dW^2 - dt) with g' = sigma, zero for additive noise
+            x_new = x_new + 0.5 * gx * self.sigma_x * (dwx * dwx - dt)
+            y_new = y_new + 0.5 * gy * self.sigma_y * (dwy * dwy - dt)
+        elif self.method == 'srk' and self.noise_type == 'multiplicative':
+            # Platen's derivative-free Milstein scheme
+            sqdt = np.sqrt(dt)
+            gx_hat, gy_hat = self.diffusion(x + fx * dt + gx * sqdt, y + fy * dt + gy * sqdt)
+            x_new = x_new + (gx_hat - gx) * (dwx * dwx - dt) / (2 * sqdt)
+            y_new = y_new + (gy_hat - gy) * (dwy * dwy - dt) / (2 * sqdt)
+        
+        return x_new, y_new
+    
+    def get_derivatives(self, x, y):
+        """Drift of the underlying model"""
+        return self.model.get_derivatives(x, y)
+    
+    def get_polar_coords(self, x, y):
+        return self.model.get_polar_coords(x, y)
+    
+    def update_params(self, **kwargs):
+        """Update noise parameters here, everything else on the model"""
+        for key in ('sigma_x', 'sigma_y'):
+            if key in kwargs:
+                setattr(self, key, kwargs.pop(key))
+        self.model.update_params(**kwargs)
+    
+    def get_params(self) -> Dict[str, Any]:
+        """Get current parameters including noise"""
+        params = self.model.get_params()
+        params.update({
+            'sigma_x': self.sigma_x,
+            'sigma_y': self.sigma_y,
+            'noise_type': self.noise_type,
+            'integration_method': self.method,
+            'seed': self.seed
+        })
+        return params
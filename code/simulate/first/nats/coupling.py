@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Feedback coupling between simulation engines
+States of coupled simulations travel as batched binary frames; the reading
+engine keeps a mirror StateHistory of each remote source, so feedback terms
+on remote sources are applied exactly like local ones (see feedback.py)
+"""
+
+import asyncio
+import json
+import struct
+from array import array
+from typing import Any, Dict, List, Tuple
+
+from feedback import FeedbackHub, StateHistory
+
+# Outside sim.> so frames are not stored in the SIMULATION stream
+SUBJECT_PREFIX = "coupling"
+FRAME_HEADER = struct.Struct("<qIB")  # first step, number of steps, flags
+FRAME_CLOSED = 1
+
+
+def _ring_read(values: List[float], capacity: int, start: int, stop: int) -> array:
+    """Steps start..stop-1 of a ring buffer list as a double array"""
+    i, j = start % capacity, stop % capacity
+    if stop - start == capacity or (j <= i and stop > start):
+        return array('d', values[i:] + values[:j])
+    return array('d', values[i:j])
+
+
+def _ring_write(values: List[float], capacity: int, start: int, data: array):
+    """Store data as steps start.. of a ring buffer list"""
+    i = start % capacity
+    n = len(data)
+    head = min(n, capacity - i)
+    values[i:i + head] = data[:head].tolist()
+    if head < n:
+        values[:n - head] = data[head:].tolist()
+
+
+def encode_frame(history: StateHistory, start: int, stop: int, closed: bool = False) -> bytes:
+    """Header plus x and y of steps start..stop-1 as little-endian doubles"""
+    xs = _ring_read(history.xs, history.capacity, start, stop)
+    ys = _ring_read(history.ys, history.capacity, start, stop)
+    return FRAME_HEADER.pack(start, stop - start, FRAME_CLOSED if closed else 0) + xs.tobytes() + ys.tobytes()
+
+
+def decode_frame(data: bytes) -> Tuple[int, array, array, bool]:
+    """(first step, xs, ys, closed) of a frame"""
+    first, n, flags = FRAME_HEADER.unpack_from(data)
+    values = array('d')
+    values.frombytes(data[FRAME_HEADER.size:FRAME_HEADER.size + 16 * n])
+    return first, values[:n], values[n:], bool(flags & FRAME_CLOSED)
+
+
+class CouplingTransport:
+    """
+    Exchanges coupled simulation states with other engines over core NATS
+
+    coupling.<sim_id>.state carries frames of consecutive states of a source,
+    at most `sync` steps each, where sync is the smallest coupling delay of
+    its remote readers. A reader with delay d only needs the source d steps
+    behind, so it keeps integrating while the next frame is in flight and the
+    link latency is hidden as long as it is shorter than d steps of source
+    computation.
+
+    coupling.<sim_id>.ack carries each reading engine's oldest needed step.
+    The source engine registers it as a reader of the local history, which
+    bounds how far the source runs ahead (lockstep with the delay as window,
+    or max_lag more for bounded-lag terms). Acks are repeated every
+    resend_interval so engines can be started in any order.
+    """
+
+    def __init__(self, nc, hub: FeedbackHub, engine_id: str = "engine",
+                 max_frame_steps: int = 4096, resend_interval: float = 1.0):
+        self.nc = nc
+        self.hub = hub
+        self.engine_id = engine_id
+        self.max_frame_steps = max_frame_steps
+        self.resend_interval = resend_interval
+        self.remote: Dict[str, Dict[str, int]] = {}   # local source -> {reader engine: sync}
+        self.sent: Dict[str, Tuple[StateHistory, int, bool]] = {}  # source -> (history, next step, closed sent)
+        self.mirrors: Dict[str, Any] = {}             # remote source -> frame subscription
+        self.acked: Dict[str, Any] = {}               # remote source -> last ack payload
+        self.frames_sent = 0
+        self.frames_received = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.gaps = 0
+        self._ack_sub = None
+        self._task = None
+
+    async def start(self):
+        self._ack_sub = await self.nc.subscribe(f"{SUBJECT_PREFIX}.*.ack", cb=self._on_ack)
+        await self.nc.flush()
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        for sim_id in list(self.mirrors):
+            await self._leave(sim_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "frames_sent": self.frames_sent,
+            "frames_received": self.frames_received,
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "gaps": self.gaps,
+            "remote_readers": {sim_id: sorted(engines) for sim_id, engines in self.remote.items() if engines},
+            "mirrors": sorted(self.mirrors)
+        }
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        last_resend = loop.time()
+        while True:
+            # Take the event first so progress made while sending is not missed
+            changed = self.hub.changed
+            resend = loop.time() - last_resend >= self.resend_interval
+            if resend:
+                last_resend = loop.time()
+            try:
+                await self._send_frames()
+                await self._sync_mirrors(resend)
+            except Exception as e:
+                print(f"Coupling transport error: {e}")
+            try:
+                await asyncio.wait_for(changed.wait(), self.resend_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    # Source side
+
+    async def _on_ack(self, msg):
+        try:
+            sim_id = msg.subject.split(".")[1]
+            ack = json.loads(msg.data)
+            engine = ack["engine"]
+            if engine == self.engine_id:
+                return
+            history = self.hub.histories.get(sim_id)
+            if history is not None and history.mirror:
+                return  # another reader of the same remote source
+            reader = f"@{engine}"
+            if ack.get("leave"):
+                self.remote.get(sim_id, {}).pop(engine, None)
+                self.hub.unread(sim_id, reader)
+            else:
+                history = self.hub.history(sim_id)
+                # Same window as the reader's mirror, sized for its delay
+                history.reserve(ack.get("capacity", 0))
+                history.readers[reader] = ack.get("needed")
+                self.remote.setdefault(sim_id, {})[engine] = max(1, ack.get("sync") or 1)
+            history = self.hub.histories.get(sim_id)
+            if history is not None:
+                engines = self.remote.get(sim_id)
+                history.sync = min(min(engines.values()), self.max_frame_steps) if engines else None
+            self.hub.notify()
+        except Exception as e:
+            print(f"Error processing coupling ack: {e}")
+
+    async def _send_frames(self):
+        for sim_id, engines in list(self.remote.items()):
+            history = self.hub.histories.get(sim_id)
+            if not engines or history is None or history.mirror or history.first is None:
+                continue
+            previous, sent, closed_sent = self.sent.get(sim_id, (None, 0, False))
+            if previous is not history:
+                # New run of the simulation, start from its first recorded step
+                sent, closed_sent = history.first, False
+            sent = max(sent, history.written - history.capacity)
+            while sent < history.written:
+                stop = min(history.written, sent + self.max_frame_steps)
+                closed = history.closed and stop == history.written
+                await self._publish_frame(sim_id, encode_frame(history, sent, stop, closed))
+                sent = stop
+                closed_sent = closed_sent or closed
+            if history.closed and not closed_sent:
+                await self._publish_frame(sim_id, encode_frame(history, sent, sent, True))
+                closed_sent = True
+            self.sent[sim_id] = (history, sent, closed_sent)
+
+    async def _publish_frame(self, sim_id: str, frame: bytes):
+        await self.nc.publish(f"{SUBJECT_PREFIX}.{sim_id}.state", frame)
+        self.frames_sent += 1
+        self.bytes_sent += len(frame)
+
+    # Reader side
+
+    async def _sync_mirrors(self, resend: bool):
+        for sim_id, history in list(self.hub.histories.items()):
+            if history.mirror and sim_id not in self.mirrors:
+                self.mirrors[sim_id] = await self.nc.subscribe(
+                    f"{SUBJECT_PREFIX}.{sim_id}.state", cb=self._frame_handler(sim_id))
+                await self.nc.flush()
+                print(f"Coupling: mirroring remote simulation {sim_id}")
+        for sim_id in list(self.mirrors):
+            history = self.hub.histories.get(sim_id)
+            if history is None or not history.mirror:
+                await self._leave(sim_id)
+                continue
+            needed = list(history.readers.values())
+            ack = {
+                "engine": self.engine_id,
+                "needed": None if not needed or None in needed else min(needed),
+                "capacity": history.capacity,
+                "sync": history.sync
+            }
+            if resend or ack != self.acked.get(sim_id):
+                self.acked[sim_id] = ack
+                await self.nc.publish(f"{SUBJECT_PREFIX}.{sim_id}.ack", json.dumps(ack).encode())
+
+    async def _leave(self, sim_id: str):
+        sub = self.mirrors.pop(sim_id, None)
+        self.acked.pop(sim_id, None)
+        if sub is not None:
+            await sub.unsubscribe()
+        await self.nc.publish(f"{SUBJECT_PREFIX}.{sim_id}.ack",
+                              json.dumps({"engine": self.engine_id, "leave": True}).encode())
+
+    def _frame_handler(self, sim_id: str):
+        async def handler(msg):
+            history = self.hub.histories.get(sim_id)
+            if history is None or not history.mirror:
+                return
+            try:
+                first, xs, ys, closed = decode_frame(msg.data)
+            except Exception as e:
+                print(f"Error decoding coupling frame for {sim_id}: {e}")
+                return
+            self.frames_received += 1
+            self.bytes_received += len(msg.data)
+            self._store(history, first, xs, ys)
+            if closed:
+                history.closed = True
+            self.hub.notify()
+        return handler
+
+    def _store(self, history: StateHistory, first: int, xs: array, ys: array):
+        if history.first is None:
+            history.first = history.written = first
+        if first > history.written:
+            # Lost frame: hold the last known state over the gap
+            self.gaps += 1
+            print(f"Coupling: {history.sim_id} missing steps {history.written}..{first - 1}")
+            last = (history.written - 1) % history.capacity if history.written > history.first else None
+            start = max(history.written, first - history.capacity)
+            fill_x = array('d', [history.xs[last] if last is not None else xs[0]]) * (first - start)
+            fill_y = array('d', [history.ys[last] if last is not None else ys[0]]) * (first - start)
+            _ring_write(history.xs, history.capacity, start, fill_x)
+            _ring_write(history.ys, history.capacity, start, fill_y)
+            history.written = first
+        skip = history.written - first
+        if skip >= len(xs):
+            return
+        _ring_write(history.xs, history.capacity, history.written, xs[skip:])
+        _ring_write(history.ys, history.capacity, history.written, ys[skip:])
+        history.written = first + len(xs)
+        history.step = history.written - 1
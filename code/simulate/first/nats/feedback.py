@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Step-aligned feedback between simulations of one engine
+Each coupled simulation records its state at every integration step into a
+ring buffer; readers apply gain * delayed state as a forcing term with the
+delay counted in steps, not wall-clock time
+"""
+
+import asyncio
+from typing import Any, Dict, List, Optional
+
+FEEDBACK_MODES = ("diffusive", "direct")
+
+
+class StateHistory:
+    """
+    States of one simulation indexed by step, kept in a ring buffer
+
+    Steps first..written-1 are recorded, step k at k % capacity. Readers
+    register the oldest step they still need and the writer never runs far
+    enough ahead to overwrite it. Plain lists keep the per-step writes in
+    the integration loop cheap.
+    """
+
+    def __init__(self, sim_id: str, capacity: int = 4096, mirror: bool = False):
+        self.sim_id = sim_id
+        self.mirror = mirror      # filled from another engine by coupling.CouplingTransport
+        self.capacity = capacity
+        self.xs = [0.0] * capacity
+        self.ys = [0.0] * capacity
+        self.first = None         # first recorded step, None before the writer starts
+        self.written = 0          # one past the last recorded step
+        self.step = 0             # writer's current step
+        self.closed = False       # writer finished, readers hold the last state
+        self.sync = None          # steps between state exchanges with other engines
+        self.readers: Dict[str, Optional[int]] = {}  # reader -> oldest needed step, None for `first`
+
+    def reserve(self, capacity: int):
+        """Grow the buffer to at least capacity steps, keeping recorded states"""
+        if capacity <= self.capacity:
+            return
+        xs = [0.0] * capacity
+        ys = [0.0] * capacity
+        if self.first is not None:
+            for k in range(max(self.first, self.written - self.capacity), self.written):
+                xs[k % capacity] = self.xs[k % self.capacity]
+                ys[k % capacity] = self.ys[k % self.capacity]
+        self.xs, self.ys, self.capacity = xs, ys, capacity
+
+    def room(self, step: int) -> int:
+        """Steps the writer may record from step without overwriting a reader's data"""
+        if not self.readers:
+            return 1 << 62
+        oldest = min(self.first if n is None else n for n in self.readers.values())
+        return oldest + self.capacity - step
+
+
+class FeedbackTerm:
+    """
+    gain * (source state delay steps ago [- own state]) added as forcing
+
+    Reader step s reads source step s + offset - delay. Simulations started
+    together are aligned step for step (offset 0); a reader joining a
+    running source is aligned to the source step current at joining.
+    With max_lag > 0 the reader may run up to max_lag steps past the newest
+    source state instead of waiting, holding that state meanwhile.
+    """
+
+    def __init__(self, source: str, history: StateHistory, gain, delay: int, mode: str,
+                 own: bool = False, max_lag: int = 0):
+        self.source = source
+        self.history = history
+        self.own = own            # feedback from the reader's own past
+        self.offset = None
+        self.bind_step = 0
+        self.configure(gain, delay, mode, max_lag)
+
+    def configure(self, gain, delay: int, mode: str, max_lag: int = 0):
+        if isinstance(gain, (list, tuple)):
+            self.gx, self.gy = float(gain[0]), float(gain[1])
+        else:
+            self.gx = self.gy = float(gain)
+        if mode not in FEEDBACK_MODES:
+            raise ValueError(f"Unknown feedback mode {mode!r}, expected one of {FEEDBACK_MODES}")
+        self.delay = max(1, int(delay))
+        self.mode = mode
+        self.max_lag = max(0, int(max_lag))
+
+    def resolve(self) -> bool:
+        """Fix the step offset once the source has recorded something"""
+        if self.offset is None and self.history.first is not None:
+            self.offset = self.history.first - self.bind_step
+        return self.offset is not None
+
+    def available(self, step: int) -> int:
+        """Steps the reader can take from step before it needs unrecorded source states"""
+        if self.own or self.history.closed:
+            # Own states are recorded inside the step loop before they are read
+            return 1 << 62
+        if not self.resolve() or self.history.written <= self.history.first:
+            return 0
+        return self.history.written - (step + self.offset - self.delay) + self.max_lag
+
+    def needed(self, step: int) -> Optional[int]:
+        """Oldest source step still read from step on"""
+        return None if self.offset is None else step + self.offset - self.delay
+
+
+class SimulationFeedback:
+    """
+    Feedback terms of one simulation and the history it records for others
+
+    The integration loop asks limit() how many steps it may take, records
+    its state into `history` and reads `hot_terms()` inside the step loop,
+    then calls advance() after each chunk.
+    """
+
+    def __init__(self, hub: "FeedbackHub", sim_id: str, chunk_size: int):
+        self.hub = hub
+        self.sim_id = sim_id
+        self.chunk_size = chunk_size
+        self.terms: List[FeedbackTerm] = []
+        self.history: Optional[StateHistory] = None
+        self.wait_seconds = 0.0
+
+    def configure(self, specs, step: int = 0):
+        """Bind, update or drop terms to match the feedback parameter"""
+        if isinstance(specs, dict):
+            specs = [specs]
+        terms = []
+        for spec in specs or []:
+            source = spec.get("source", self.sim_id)
+            gain = spec.get("gain", 0.1)
+            delay = spec.get("delay", spec.get("delay_steps", 1))
+            mode = spec.get("mode", "diffusive")
+            max_lag = spec.get("max_lag", 0)
+            term = next((t for t in self.terms if t.source == source and t not in terms), None)
+            if term is None:
+                history = self.hub.history(source, mirror=spec.get("remote", False))
+                term = FeedbackTerm(source, history, gain, delay, mode,
+                                    own=source == self.sim_id, max_lag=max_lag)
+                term.bind_step = step
+                if term.own:
+                    term.offset = 0
+                elif history.first is not None:
+                    # Source already running: align to its current step
+                    term.offset = history.step - step
+            else:
+                term.configure(gain, delay, mode, max_lag)
+            term.history.reserve(term.delay + term.max_lag + 4 * max(self.chunk_size, 1) + 1024)
+            if term.history.mirror:
+                # The delay (plus any allowed lag) is the lookahead: that many states can travel together
+                window = term.delay + term.max_lag
+                term.history.sync = min(term.history.sync or window, window)
+            terms.append(term)
+        for term in self.terms:
+            if term not in terms:
+                self.hub.unread(term.source, self.sim_id)
+        self.terms = terms
+        self._register(step)
+
+    def limit(self, step: int, n: int, x: float, y: float) -> int:
+        """
+        Steps that can be taken now from state (x, y) at step, at most n
+        0 means wait(). The current state is recorded right away so that
+        readers waiting for exactly this step can go on.
+        """
+        history = self.history = self.hub.recording(self.sim_id)
+        if history is not None:
+            if history.first is None:
+                history.first = history.written = step
+            history.step = step
+            room = history.room(step)
+            if room > 0 and history.written <= step:
+                history.xs[step % history.capacity] = x
+                history.ys[step % history.capacity] = y
+                history.written = step + 1
+                self.hub.notify()
+            n = min(n, room)
+            if history.sync:
+                n = min(n, history.sync)
+        for term in self.terms:
+            n = min(n, term.available(step))
+        return max(0, n)
+
+    def hot_terms(self, step: int):
+        """Flat tuples for the step loop: xs, ys, capacity, lag, lo, hi, gx, gy, diffusive"""
+        hot = []
+        for term in self.terms:
+            h = term.history
+            if not term.resolve() or (h.written <= h.first and not term.own):
+                continue  # source never recorded anything
+            hi = h.written - 1 if h.closed or term.max_lag else 1 << 62
+            hot.append((h.xs, h.ys, h.capacity, term.delay - term.offset, h.first, hi,
+                        term.gx, term.gy, term.mode == "diffusive"))
+        return hot
+
+    def advance(self, step: int):
+        """Publish progress after a chunk ending before step"""
+        if self.history is not None:
+            self.history.written = step
+        self._register(step)
+        self.hub.notify()
+
+    async def wait(self, timeout: float = 0.1):
+        """Wait until another simulation made progress"""
+        loop = asyncio.get_running_loop()
+        t0 = loop.time()
+        try:
+            await asyncio.wait_for(self.hub.changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self.wait_seconds += loop.time() - t0
+
+    def close(self, step: int):
+        if self.history is not None:
+            self.history.written = step
+        for term in self.terms:
+            self.hub.unread(term.source, self.sim_id)
+        self.terms = []
+        self.hub.finish(self.sim_id)
+
+    def _register(self, step: int):
+        # Several terms on one source register the oldest step any of them reads
+        needs: Dict[int, List] = {}
+        for term in self.terms:
+            term.resolve()
+            needs.setdefault(id(term.history), [term.history]).append(term.needed(step))
+        for history, *needed in needs.values():
+            history.readers[self.sim_id] = None if None in needed else min(needed)
+
+
+class FeedbackHub:
+    """State histories of all coupled simulations in an engine"""
+
+    def __init__(self):
+        self.histories: Dict[str, StateHistory] = {}
+        self.changed = asyncio.Event()
+
+    def history(self, sim_id: str, mirror: bool = False) -> StateHistory:
+        """History of sim_id, created for a source that has not started yet"""
+        history = self.histories.get(sim_id)
+        if history is None:
+            history = self.histories[sim_id] = StateHistory(sim_id, mirror=mirror)
+        return history
+
+    def recording(self, sim_id: str) -> Optional[StateHistory]:
+        """History sim_id should record into, None while nobody reads it"""
+        history = self.histories.get(sim_id)
+        if history is None or not history.readers:
+            return None
+        return history
+
+    def start(self, sim_id: str):
+        """A simulation starts: replace a history left over from an earlier run"""
+        history = self.histories.get(sim_id)
+        if history is not None and history.closed:
+            del self.histories[sim_id]
+
+    def unread(self, source: str, reader: str):
+        history = self.histories.get(source)
+        if history is None:
+            return
+        history.readers.pop(reader, None)
+        if not history.readers:
+            # The writer stops recording, a later reader starts a fresh history
+            self.histories.pop(source, None)
+
+    def finish(self, sim_id: str):
+        """Writer done: readers hold its last state"""
+        history = self.histories.get(sim_id)
+        if history is not None:
+            history.closed = True
+            if not history.readers:
+                self.histories.pop(sim_id, None)
+        self.notify()
+
+    def notify(self):
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+
+def create_feedback(hub: FeedbackHub, sim_id: str, params: Dict[str, Any],
+                    chunk_size: int) -> SimulationFeedback:
+    """Feedback state for a starting simulation, terms from params['feedback']"""
+    hub.start(sim_id)
+    feedback = SimulationFeedback(hub, sim_id, chunk_size)
+    feedback.configure(params.get("feedback"))
+    return feedback
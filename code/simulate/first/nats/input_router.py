@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Shared external input subscriptions for the simulation engine
+Input messages are decoded once and dispatched to every simulation whose
+input subject matches, through an in-process routing table
+"""
+
+import json
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def subject_matches(pattern: str, subject: str) -> bool:
+    """Whether NATS subject pattern covers subject, which may itself contain wildcards"""
+    p = pattern.split(".")
+    s = subject.split(".")
+    for i, token in enumerate(p):
+        if token == ">":
+            return len(s) > i
+        if i >= len(s):
+            return False
+        if token == "*":
+            if s[i] == ">":
+                return False
+        elif token != s[i]:
+            return False
+    return len(p) == len(s)
+
+
+def decode_inputs(data: bytes) -> Tuple[List[Tuple[Optional[int], float, float]], Optional[int]]:
+    """
+    (step, x, y) inputs of a {"x", "y"} message, or of a batch with lists, and its first step
+    Messages without "step" give inputs with step None
+    """
+    message = json.loads(data)
+    xs, ys = message["x"], message["y"]
+    step = message.get("step")
+    if not isinstance(xs, list):
+        xs, ys = [xs], [ys]
+    if step is None:
+        return [(None, x, y) for x, y in zip(xs, ys)], None
+    return [(step + i, x, y) for i, (x, y) in enumerate(zip(xs, ys))], step
+
+
+class InputSchedule:
+    """
+    Applies the buffered inputs of one simulation at their own step
+
+    The first indexed input is anchored to the simulation step it is taken
+    at, and an input k steps after it is applied k steps later. Across a gap
+    in the steps, or while the buffer waits for the next batch, the last
+    input is held. When inputs fall behind, because
+    they arrive late or the buffer overflowed, the newest one that is due is
+    applied at once, the older ones are counted in inputs_dropped, and the
+    stream is anchored again from there; so is a stream whose steps start
+    over. Inputs without a step are applied one per step in arrival order.
+    """
+
+    __slots__ = ("buffer", "metrics", "offset", "last", "held")
+
+    def __init__(self, buffer: deque, metrics):
+        self.buffer = buffer
+        self.metrics = metrics
+        self.offset = None  # simulation step minus input step
+        self.last = None    # step of the last input taken
+        self.held = None    # last input applied, held across gaps
+
+    def take(self, step: int) -> Optional[Tuple[float, float]]:
+        """Input to apply at simulation step, None before the first one"""
+        buffer = self.buffer
+        while buffer:
+            k, x, y = buffer[0]
+            if k is None:
+                buffer.popleft()
+                self.held = (x, y)
+                return self.held
+            if self.offset is None or k < self.last:
+                self.offset = step - k
+            due = step - self.offset
+            if k > due:
+                if len(buffer) < buffer.maxlen:
+                    return self.held
+                self.offset = step - k  # full buffer, the stream is ahead of us
+            buffer.popleft()
+            self.last = k
+            if k < due:
+                if buffer and buffer[0][0] is not None and buffer[0][0] <= due:
+                    self.metrics.inputs_dropped += 1
+                    continue
+                self.offset = step - k
+            self.held = (x, y)
+            return self.held
+        return self.held
+
+
+class InputRoute:
+    """Where inputs for one simulation go"""
+
+    __slots__ = ("sim_id", "pattern", "buffer", "metrics", "debug")
+
+    def __init__(self, sim_id: str, pattern: str, buffer: deque, metrics, debug: bool = False):
+        self.sim_id = sim_id
+        self.pattern = pattern
+        self.buffer = buffer
+        self.metrics = metrics
+        self.debug = debug
+
+
+class InputRouter:
+    """
+    One core NATS subscription per input subject pattern, shared by all simulations
+
+    Subscriptions are the smallest set of patterns covering every route, so
+    a message is received and decoded once however many simulations it
+    drives. Routes per concrete subject are cached until routes change.
+    Adding a route costs a dict insert, plus one subscribe when its pattern
+    is not covered yet.
+    """
+
+    def __init__(self, nc):
+        self.nc = nc
+        self.routes: Dict[str, InputRoute] = {}     # sim_id -> route
+        self.subscriptions: Dict[str, Any] = {}     # pattern -> subscription
+        self.table: Dict[str, List[InputRoute]] = {}  # subject -> routes, filled on first message
+        self.messages = 0
+        self.inputs = 0
+        self.errors = 0
+
+    async def add(self, sim_id: str, pattern: str, buffer: deque, metrics, debug: bool = False):
+        """Deliver inputs published on subjects matching pattern to buffer"""
+        self.routes[sim_id] = InputRoute(sim_id, pattern, buffer, metrics, debug)
+        self.table.clear()
+        await self._resubscribe()
+
+    async def remove(self, sim_id: str):
+        if self.routes.pop(sim_id, None) is not None:
+            self.table.clear()
+            await self._resubscribe()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "routes": len(self.routes),
+            "subscriptions": sorted(self.subscriptions),
+            "messages": self.messages,
+            "inputs": self.inputs,
+            "errors": self.errors
+        }
+
+    async def _resubscribe(self):
+        patterns = set(route.pattern for route in self.routes.values())
+        needed = set(p for p in patterns
+                     if not any(q != p and subject_matches(q, p) for q in patterns))
+        added = False
+        for pattern in needed - set(self.subscriptions):
+            self.subscriptions[pattern] = await self.nc.subscribe(pattern, cb=self._handle)
+            added = True
+        if added:
+            await self.nc.flush()
+        # Drop the old subscriptions only after their replacements are active
+        for pattern in set(self.subscriptions) - needed:
+            await self.subscriptions.pop(pattern).unsubscribe()
+
+    async def _handle(self, msg):
+        routes = self.table.get(msg.subject)
+        if routes is None:
+            routes = self.table[msg.subject] = [
+                route for route in self.routes.values() if subject_matches(route.pattern, msg.subject)]
+        if not routes:
+            return
+        try:
+            inputs, step = decode_inputs(msg.data)
+        except Exception as e:
+            self.errors += 1
+            print(f"Error processing input on {msg.subject}: {e}")
+            return
+        n = len(inputs)
+        self.messages += 1
+        self.inputs += n
+        for route in routes:
+            buffer = route.buffer
+            route.metrics.inputs_received += n
+            # deque discards the oldest inputs
+            route.metrics.inputs_dropped += max(0, len(buffer) + n - buffer.maxlen)
+            buffer.extend(inputs)
+            if route.debug:
+                print(f"Received external input for {route.sim_id}: {n} samples from step {step}")
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Fast rendering for live plots
+Per-pixel decimation of long lines and a blitting renderer that only
+redraws the full figure when the axes have to be rescaled
+"""
+
+import numpy as np
+from typing import Dict, Tuple
+
+
+def minmax_decimate(x: np.ndarray, y: np.ndarray, buckets: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Keep the min and max of y in each of `buckets` equal-count buckets
+    Drawn one bucket per pixel column this is indistinguishable from the
+    full line, extremes included. NaN values are never chosen unless a
+    whole bucket is NaN.
+    """
+    n = len(y)
+    if buckets <= 0 or n <= 2 * buckets:
+        return x, y
+    size = n // buckets
+    m = size * buckets
+    block = y[:m].reshape(buckets, size)
+    finite = ~np.isnan(block)
+    lo = np.where(finite, block, np.inf).argmin(axis=1)
+    hi = np.where(finite, block, -np.inf).argmax(axis=1)
+    # Keep each bucket's two points in x order
+    first = np.minimum(lo, hi)
+    second = np.maximum(lo, hi)
+    base = np.arange(buckets) * size
+    idx = np.empty(2 * buckets, dtype=np.int64)
+    idx[0::2] = base + first
+    idx[1::2] = base + second
+    if m < n:
+        idx = np.concatenate([idx, np.arange(m, n)])
+    return x[idx], y[idx]
+
+
+def lttb_decimate(x: np.ndarray, y: np.ndarray, n_out: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Largest-Triangle-Three-Buckets downsampling to n_out points
+    Better visual shape than min/max at low point counts, but sequential,
+    so slower for long lines.
+    """
+    n = len(y)
+    if n_out < 3 or n <= n_out:
+        return x, y
+    xf = np.asarray(x, dtype=float)
+    yf = np.nan_to_num(np.asarray(y, dtype=float))
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0] = 0
+    idx[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        # Average of the next bucket is the third triangle vertex
+        nxt_stop = edges[i + 2] if i + 2 < len(edges) else n
+        cx = xf[stop:nxt_stop].mean() if nxt_stop > stop else xf[-1]
+        cy = yf[stop:nxt_stop].mean() if nxt_stop > stop else yf[-1]
+        bx = xf[start:stop]
+        by = yf[start:stop]
+        area = np.abs((xf[a] - cx) * (by - yf[a]) - (xf[a] - bx) * (cy - yf[a]))
+        a = start + int(area.argmax())
+        idx[i + 1] = a
+    return x[idx], y[idx]
+
+
+class BlitRenderer:
+    """
+    Draws a set of animated lines on one axes with blitting
+
+    The static parts of the figure (axes, ticks, grid, legend) are drawn
+    once into a cached background. Each frame restores that background and
+    draws only the lines. A full draw happens when a line is added or
+    removed, the window is resized, or data leaves the current limits;
+    limits then grow with some headroom so a scrolling window does not
+    trigger a rescale every frame.
+    """
+
+    def __init__(self, fig, ax, method: str = 'minmax', headroom: float = 0.25,
+                 padding: float = 0.1, legend_loc: str = 'upper right'):
+        self.fig = fig
+        self.ax = ax
+        self.canvas = fig.canvas
+        self.method = method          # 'minmax', 'lttb' or 'none'
+        self.headroom = headroom      # extra x range added when rescaling
+        self.padding = padding        # extra y range added when rescaling
+        self.legend_loc = legend_loc
+        self.lines = {}
+        self._extents: Dict[str, Tuple[float, float, float, float]] = {}
+        self._background = None
+        self._dirty = True            # a full draw is needed
+        self.full_draws = 0
+        self.blits = 0
+        self._cid = self.canvas.mpl_connect('draw_event', self._on_draw)
+
+    def line(self, key: str, **kwargs):
+        """The line for key, created on first use"""
+        line = self.lines.get(key)
+        if line is None:
+            line, = self.ax.plot([], [], label=key, animated=True, **kwargs)
+            self.lines[key] = line
+            self._legend()
+        return line
+
+    def remove(self, key: str):
+        line = self.lines.pop(key, None)
+        self._extents.pop(key, None)
+        if line is not None:
+            line.remove()
+            self._legend()
+
+    def clear(self):
+        for key in list(self.lines):
+            self.remove(key)
+
+    def set_data(self, key: str, x: np.ndarray, y: np.ndarray, **kwargs):
+        """Decimate to the axes pixel width and hand the points to the line"""
+        line = self.line(key, **kwargs)
+        if len(x) == 0:
+            line.set_data([], [])
+            self._extents.pop(key, None)
+            return
+        width = int(self.ax.get_window_extent().width) or 1000
+        if self.method == 'minmax':
+            x, y = minmax_decimate(x, y, width)
+        elif self.method == 'lttb':
+            x, y = lttb_decimate(x, y, 2 * width)
+        line.set_data(x, y)
+        # Extremes survive decimation, so the decimated points give exact bounds
+        finite = y[~np.isnan(y)]
+        if finite.size:
+            self._extents[key] = (x[0], x[-1], finite.min(), finite.max())
+        else:
+            self._extents.pop(key, None)
+
+    def render(self):
+        """Draw a frame, blitting unless a full redraw is needed"""
+        self._rescale()
+        if self._dirty or self._background is None or not self.canvas.supports_blit:
+            # draw() fires draw_event, which recaptures the background and draws the lines
+            self.canvas.draw()
+            self.full_draws += 1
+        else:
+            self.canvas.restore_region(self._background)
+            self._draw_lines()
+            self.canvas.blit(self.fig.bbox)
+            self.blits += 1
+        self.canvas.flush_events()
+
+    def savefig(self, *args, **kwargs):
+        """Figure.savefig including the lines, which are skipped while animated"""
+        for line in self.lines.values():
+            line.set_animated(False)
+        try:
+            self.fig.savefig(*args, **kwargs)
+        finally:
+            for line in self.lines.values():
+                line.set_animated(True)
+            self._dirty = True
+
+    def invalidate(self):
+        """Force a full draw on the next frame, e.g. after changing labels"""
+        self._dirty = True
+
+    def _rescale(self):
+        if not self._extents:
+            return
+        ext = np.array(list(self._extents.values()))
+        x_min, x_max = ext[:, 0].min(), ext[:, 1].max()
+        y_min, y_max = ext[:, 2].min(), ext[:, 3].max()
+        (xl, xh), (yl, yh) = self.ax.get_xlim(), self.ax.get_ylim()
+        if x_min < xl or x_max > xh:
+            span = max(x_max - x_min, 1.0)
+            self.ax.set_xlim(x_min, x_max + self.headroom * span)
+            self._dirty = True
+        if y_min < yl or y_max > yh:
+            pad = (y_max - y_min) * self.padding if y_max > y_min else 1.0
+            self.ax.set_ylim(y_min - pad, y_max + pad)
+            self._dirty = True
+
+    def _legend(self):
+        if self.lines:
+            self.ax.legend(handles=list(self.lines.values()), loc=self.legend_loc)
+        elif self.ax.get_legend() is not None:
+            self.ax.get_legend().remove()
+        self._dirty = True
+
+    def _draw_lines(self):
+        for line in self.lines.values():
+            self.ax.draw_artist(line)
+
+    def _on_draw(self, event):
+        # Full draw (ours, resize or expose): animated lines are skipped by
+        # matplotlib, so grab the clean background and put the lines on top
+        if self.canvas.supports_blit:
+            self._background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self._draw_lines()
+        self._dirty = False
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Hot-path metrics for the simulation engine
+Per-simulation and per-engine counters, timers and histograms, a sampling
+profiler and a Prometheus-style text endpoint
+"""
+
+import asyncio
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Any, List, Optional, Sequence
+
+
+# Latency buckets in seconds (upper bounds), Prometheus style
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+class Histogram:
+    """Fixed-bucket histogram with cumulative bucket export"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        """Record one observation"""
+        i = 0
+        for bound in self.buckets:
+            if value <= bound:
+                break
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Upper bucket bound containing the q-quantile"""
+        if self.count == 0:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= target:
+                return bound
+        return float('inf')
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+            "buckets": dict(zip([str(b) for b in self.buckets] + ["+Inf"], self.counts))
+        }
+
+
+class SimulationMetrics:
+    """Metrics of a single simulation"""
+
+    def __init__(self, sim_id: str, sim_type: str):
+        self.sim_id = sim_id
+        self.sim_type = sim_type
+        self.start_time = time.time()
+        self.steps = 0
+        self.integrator_seconds = 0.0
+        self.serialization_seconds = 0.0
+        self.publish_latency = Histogram()
+        self.published = 0
+        self.publish_errors = 0
+        self.inputs_received = 0
+        self.inputs_dropped = 0
+        self.input_queue_depth = 0
+        self.coupling_wait_seconds = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        elapsed = time.time() - self.start_time
+        return {
+            "simulation_id": self.sim_id,
+            "type": self.sim_type,
+            "uptime": elapsed,
+            "steps": self.steps,
+            "steps_per_sec": self.steps / elapsed if elapsed > 0 else 0.0,
+            "integrator_seconds": self.integrator_seconds,
+            "integrator_us_per_step": 1e6 * self.integrator_seconds / self.steps if self.steps else 0.0,
+            "serialization_seconds": self.serialization_seconds,
+            "published": self.published,
+            "publish_errors": self.publish_errors,
+            "publish_latency": self.publish_latency.to_dict(),
+            "inputs_received": self.inputs_received,
+            "inputs_dropped": self.inputs_dropped,
+            "input_queue_depth": self.input_queue_depth,
+            "coupling_wait_seconds": self.coupling_wait_seconds
+        }
+
+
+class EngineMetrics:
+    """Metrics of all simulations in one engine plus engine-wide gauges"""
+
+    def __init__(self, engine_id: str = "engine"):
+        self.engine_id = engine_id
+        self.start_time = time.time()
+        self.simulations: Dict[str, SimulationMetrics] = {}
+        self.loop_lag = Histogram()
+        self.last_loop_lag = 0.0
+
+    def register(self, sim_id: str, sim_type: str) -> SimulationMetrics:
+        """Create fresh metrics for a starting simulation"""
+        metrics = SimulationMetrics(sim_id, sim_type)
+        self.simulations[sim_id] = metrics
+        return metrics
+
+    def remove(self, sim_id: str):
+        self.simulations.pop(sim_id, None)
+
+    def to_dict(self) -> Dict[str, Any]:
+        sims = list(self.simulations.values())
+        return {
+            "engine_id": self.engine_id,
+            "timestamp": time.time(),
+            "uptime": time.time() - self.start_time,
+            "simulations": len(sims),
+            "steps": sum(m.steps for m in sims),
+            "published": sum(m.published for m in sims),
+            "inputs_dropped": sum(m.inputs_dropped for m in sims),
+            "event_loop_lag": self.loop_lag.to_dict(),
+            "last_event_loop_lag": self.last_loop_lag
+        }
+
+    async def monitor_loop_lag(self, interval: float = 0.1):
+        """Measure how late the event loop wakes up a sleeping task"""
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + interval
+            await asyncio.sleep(interval)
+            lag = max(0.0, loop.time() - expected)
+            self.last_loop_lag = lag
+            self.loop_lag.observe(lag)
+
+    def render_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = []
+        engine = f'engine="{self.engine_id}"'
+
+        def histogram(name: str, labels: str, hist: Histogram):
+            cumulative = 0
+            for bound, n in zip(list(hist.buckets) + ["+Inf"], hist.counts):
+                cumulative += n
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_sum{{{labels}}} {hist.sum}')
+            lines.append(f'{name}_count{{{labels}}} {hist.count}')
+
+        lines.append('# TYPE dynsys_event_loop_lag_seconds histogram')
+        histogram('dynsys_event_loop_lag_seconds', engine, self.loop_lag)
+        lines.append('# TYPE dynsys_simulations gauge')
+        lines.append(f'dynsys_simulations{{{engine}}} {len(self.simulations)}')
+
+        counters = [
+            ('dynsys_steps_total', 'counter', 'steps'),
+            ('dynsys_integrator_seconds_total', 'counter', 'integrator_seconds'),
+            ('dynsys_serialization_seconds_total', 'counter', 'serialization_seconds'),
+            ('dynsys_published_total', 'counter', 'published'),
+            ('dynsys_publish_errors_total', 'counter', 'publish_errors'),
+            ('dynsys_inputs_received_total', 'counter', 'inputs_received'),
+            ('dynsys_inputs_dropped_total', 'counter', 'inputs_dropped'),
+            ('dynsys_input_queue_depth', 'gauge', 'input_queue_depth'),
+            ('dynsys_coupling_wait_seconds_total', 'counter', 'coupling_wait_seconds'),
+        ]
+        sims = list(self.simulations.values())
+        for name, kind, attr in counters:
+            lines.append(f'# TYPE {name} {kind}')
+            for m in sims:
+                lines.append(f'{name}{{{engine},sim="{m.sim_id}",type="{m.sim_type}"}} {getattr(m, attr)}')
+        lines.append('# TYPE dynsys_publish_latency_seconds histogram')
+        for m in sims:
+            histogram('dynsys_publish_latency_seconds',
+                      f'{engine},sim="{m.sim_id}",type="{m.sim_type}"', m.publish_latency)
+        return "\n".join(lines) + "\n"
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler for simulation coroutines
+    A background thread samples the engine thread's stack and attributes each
+    sample to the simulation whose coroutine frame is on the stack
+    """
+
+    def __init__(self, interval: float = 0.005, depth: int = 3):
+        self.interval = interval
+        self.depth = depth              # innermost frames recorded per sample
+        self.enabled: set = set()       # sim_ids being profiled
+        self.samples: Dict[str, Counter] = {}
+        self._thread_id = threading.get_ident()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def enable(self, sim_id: str):
+        """Start profiling sim_id, starting the sampler thread if needed"""
+        self.enabled.add(sim_id)
+        self.samples[sim_id] = Counter()
+        if self._thread is None or not self._thread.is_alive():
+            self._thread_id = threading.get_ident()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def disable(self, sim_id: str) -> List[Dict[str, Any]]:
+        """Stop profiling sim_id and return its hottest stacks"""
+        self.enabled.discard(sim_id)
+        report = self.report(sim_id)
+        self.samples.pop(sim_id, None)
+        if not self.enabled:
+            self._stop.set()
+        return report
+
+    def report(self, sim_id: str, top: int = 20) -> List[Dict[str, Any]]:
+        """Most frequently sampled stacks for sim_id"""
+        counts = self.samples.get(sim_id, Counter())
+        total = sum(counts.values())
+        return [
+            {"stack": stack, "samples": n, "fraction": n / total}
+            for stack, n in counts.most_common(top)
+        ]
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+            stack = []
+            sim_id = None
+            while frame is not None:
+                if len(stack) < self.depth:
+                    code = frame.f_code
+                    stack.append(f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}:{frame.f_lineno}")
+                if sim_id is None and _is_runner_frame(frame.f_code.co_name):
+                    sim_id = frame.f_locals.get("sim_id")
+                frame = frame.f_back
+            if sim_id in self.enabled:
+                self.samples[sim_id][" <- ".join(stack)] += 1
+
+
+def _is_runner_frame(name: str) -> bool:
+    """Whether a frame belongs to a per-simulation runner coroutine"""
+    return name.startswith("_run_")
+
+
+async def serve_prometheus(metrics: EngineMetrics, host: str = "127.0.0.1", port: int = 9464):
+    """Serve metrics.render_prometheus() over plain HTTP"""
+
+    async def handle(reader, writer):
+        try:
+            await reader.readuntil(b"\r\n\r\n")
+        except Exception:
+            pass
+        body = metrics.render_prometheus().encode()
+        writer.write(b"HTTP/1.1 200 OK\r\n"
+                     b"Content-Type: text/plain; version=0.0.4\r\n"
+                     + f"Content-Length: {len(body)}\r\n".encode()
+                     + b"Connection: close\r\n\r\n" + body)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    print(f"Metrics endpoint on http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,560 @@
+#!/usr/bin/env python3
+"""
+Minimal NATS subscriber for dynamic systems simulation
+Receives and processes simulation data from NATS
+"""
+
+import asyncio
+import json
+import nats
+import nats.js.errors
+from nats.js.api import AckPolicy, ConsumerConfig, DeliverPolicy
+import matplotlib.pyplot as plt
+import numpy as np
+import time
+import argparse
+from datetime import datetime, timedelta, timezone
+from ring_buffer import ColumnarRingBuffer
+from live_render import BlitRenderer
+
+
+# State fields drawn in the live plot, per simulation type
+PLOT_FIELDS = ('x', 'y', 'prey', 'predator')
+
+# Data subjects per simulation type (control commands live elsewhere)
+DATA_SUBJECTS = {"hopf": "sim.hopf.>", "predator_prey": "sim.predator_prey.>"}
+
+
+class NatsSimulationSubscriber:
+    def __init__(self, server="nats://localhost:4222", stream_name="SIMULATION", buffer_size=2000,
+                 decimation='minmax'):
+        self.server = server
+        self.stream_name = stream_name
+        self.nc = None
+        self.js = None
+        
+        # Generic data storage - key: simulation_id, value: columnar ring buffer
+        self.buffer_size = buffer_size
+        self.simulation_data = {}  # sim_id -> ColumnarRingBuffer
+        # Local receive times, not payload timestamps: replayed history is not stale
+        self.simulation_start_times = {}  # sim_id -> local time of the first sample
+        self.last_received = {}  # sim_id -> local time of the latest sample
+        self.last_processed_counts = {}  # sim_id -> samples appended when last drawn
+        
+        # Track subscription start time to filter old messages
+        self.subscription_start_time = None
+        
+        # Pull consumer mode
+        self.pull_tasks = []
+        self.messages_ingested = 0
+        
+        # Live plot setup
+        self.fig = None
+        self.ax = None
+        self.lines = {}  # sim_id -> line objects
+        self.renderer = None
+        self.decimation = decimation  # 'minmax', 'lttb' or 'none'
+        self.plot_initialized = False
+        
+    async def connect(self):
+        """Connect to NATS server and setup JetStream"""
+        try:
+            self.nc = await nats.connect(self.server)
+            self.js = self.nc.jetstream()
+            print(f"Connected to NATS at {self.server}")
+            
+            # Set subscription start time to filter old messages
+            self.subscription_start_time = time.time()
+            
+            # Clear old data to ensure only new messages
+            try:
+                stream_info = await self.js.stream_info(self.stream_name)
+                print(f"Stream {self.stream_name} has {stream_info.state.messages} messages")
+                # Don't delete stream, just note it exists
+            except Exception as e:
+                print(f"Stream info not available: {e}")
+                
+        except Exception as e:
+            print(f"Failed to connect to NATS: {e}")
+            raise
+    
+    async def subscribe_all_simulations(self):
+        """Subscribe to all simulation data generically"""
+        print("Subscribing to all simulation data...")
+        
+        async def message_handler(msg):
+            try:
+                data = json.loads(msg.data)
+                
+                # Only process messages newer than subscription start time
+                if self.subscription_start_time and data.get("timestamp", 0) < self.subscription_start_time:
+                    return  # Skip old messages
+                
+                self._ingest(data)
+                
+            except Exception as e:
+                print(f"Error processing message: {e}")
+                import traceback
+                traceback.print_exc()
+        
+        # Subscribe to simulation data only (not control commands)
+        try:
+            # First try to get stream info to make sure SIMULATION stream exists
+            try:
+                stream_info = await self.js.stream_info(self.stream_name)
+                print(f"Found stream {self.stream_name} with {stream_info.state.messages} messages")
+            except Exception as e:
+                print(f"Stream {self.stream_name} not found: {e}")
+                return
+            
+            # Subscribe to Hopf simulation data
+            await self.js.subscribe(
+                subject="sim.hopf.>",  # Hopf simulation data
+                stream=self.stream_name,
+                cb=message_handler,
+                deliver_policy="new_only"  # Only get new messages
+            )
+            print("Successfully subscribed to Hopf simulation data (new messages only)")
+            
+            # Subscribe to predator-prey simulation data
+            await self.js.subscribe(
+                subject="sim.predator_prey.>",  # Predator-prey simulation data
+                stream=self.stream_name,
+                cb=message_handler,
+                deliver_policy="new_only"  # Only get new messages
+            )
+            print("Successfully subscribed to predator-prey simulation data (new messages only)")
+        except Exception as e:
+            print(f"Failed to subscribe to simulations: {e}")
+            # Fallback to regular subscription
+            try:
+                await self.js.subscribe(
+                    subject="sim.>",
+                    stream=self.stream_name,
+                    cb=message_handler
+                )
+                print("Subscribed to all simulations (all messages)")
+            except Exception as e2:
+                print(f"Fallback subscription also failed: {e2}")
+                raise
+    
+    def _ingest(self, data):
+        """Store one decoded simulation message"""
+        sim_id = data.get("simulation_id", "unknown")
+        buffer = self.simulation_data.get(sim_id)
+        
+        # Initialize data storage for this simulation if needed
+        if buffer is None:
+            fields = [k for k, v in data.items()
+                      if isinstance(v, (int, float)) and k != "step"]
+            buffer = ColumnarRingBuffer(fields, self.buffer_size)
+            self.simulation_data[sim_id] = buffer
+            self.simulation_start_times[sim_id] = time.time()
+            self.last_processed_counts[sim_id] = 0  # Reset processed count for new simulation
+            print(f"Initialized new simulation: {sim_id}")
+        
+        # Store the data point
+        buffer.append(data.get("step", 0), data)
+        self.last_received[sim_id] = time.time()
+        self.messages_ingested += 1
+    
+    @staticmethod
+    def _decode_batch(msgs):
+        """Decode a fetched batch with one json.loads call, per message on error"""
+        try:
+            return json.loads(b"[" + b",".join(m.data for m in msgs) + b"]")
+        except ValueError:
+            records = []
+            for m in msgs:
+                try:
+                    records.append(json.loads(m.data))
+                except ValueError:
+                    print(f"Skipping undecodable message on {m.subject}")
+            return records
+    
+    async def subscribe_pull(self, durable=None, batch_size=1000, start_time=None, start_sequence=None):
+        """
+        Subscribe to all simulation data with pull consumers
+        Messages are requested in batches, decoded in bulk and acknowledged once
+        per batch. Where delivery starts is decided by the server: new messages
+        only by default, or from start_time (datetime) / start_sequence. With
+        a durable name the consumers survive restarts and resume after the last
+        acknowledged batch, the start options only apply when they are created.
+        Messages handed to a batch request still open at shutdown are
+        redelivered once the consumer's ack wait expires.
+        """
+        if start_sequence is not None:
+            policy = {"deliver_policy": DeliverPolicy.BY_START_SEQUENCE, "opt_start_seq": start_sequence}
+        elif start_time is not None:
+            policy = {"deliver_policy": DeliverPolicy.BY_START_TIME, "opt_start_time": start_time}
+        else:
+            policy = {"deliver_policy": DeliverPolicy.NEW}
+        
+        for sim_type, subject in DATA_SUBJECTS.items():
+            name = f"{durable}_{sim_type}" if durable else None
+            info = None
+            if name:
+                try:
+                    info = await self.js.consumer_info(self.stream_name, name)
+                    print(f"Resuming durable consumer {name} after stream sequence {info.ack_floor.stream_seq}")
+                except nats.js.errors.NotFoundError:
+                    pass
+            if info is None:
+                config = ConsumerConfig(
+                    durable_name=name,
+                    filter_subject=subject,
+                    ack_policy=AckPolicy.ALL,       # acking the last message acks the batch
+                    max_ack_pending=max(10 * batch_size, 10000),
+                    inactive_threshold=None if name else 30.0,  # ephemeral consumers are cleaned up
+                    **policy
+                )
+                info = await self.js.add_consumer(self.stream_name, config)
+            self.pull_tasks.append(asyncio.create_task(self._pull_loop(info.name, subject, batch_size)))
+            print(f"Pull consumer {info.name} on {subject}")
+    
+    async def _pull_loop(self, consumer, subject, batch_size, flush_interval=0.1,
+                         expires=1.0, report_interval=5.0):
+        """
+        Keep one batch request outstanding and ingest what arrives
+        The request is sent straight to the consumer's next-message API with
+        replies going to a plain subscription, which avoids the per-message
+        task and timeout overhead of JetStream fetch(). Received messages are
+        ingested when a batch is complete or every flush_interval seconds.
+        """
+        next_subject = f"$JS.API.CONSUMER.MSG.NEXT.{self.stream_name}.{consumer}"
+        request = json.dumps({"batch": batch_size, "expires": int(expires * 1e9)}).encode()
+        pending = []          # received, not yet ingested
+        owed = 0              # messages the outstanding request may still deliver
+        errors = 0            # unexpected status replies since the last message
+        wake = asyncio.Event()
+        
+        async def on_message(msg):
+            nonlocal owed, errors
+            if not msg.data and msg.headers and msg.headers.get("Status"):
+                # 404/408: request ended with fewer messages than asked for
+                if msg.headers["Status"] not in ("404", "408"):
+                    errors += 1
+                    print(f"Pull request on {subject}: {msg.headers['Status']} {msg.headers.get('Description', '')}")
+                owed = 0
+                wake.set()
+                return
+            pending.append(msg)
+            owed -= 1
+            errors = 0
+            if owed <= 0 or len(pending) >= batch_size:
+                wake.set()
+        
+        inbox = self.nc.new_inbox()
+        sub = await self.nc.subscribe(inbox, cb=on_message, pending_msgs_limit=4 * batch_size)
+        received = 0
+        last_report = time.time()
+        try:
+            while True:
+                if owed <= 0:
+                    if errors:
+                        await asyncio.sleep(min(5.0, 0.1 * errors))
+                    owed = batch_size
+                    await self.nc.publish(next_subject, request, reply=inbox)
+                
+                try:
+                    await asyncio.wait_for(wake.wait(), flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                wake.clear()
+                
+                if pending:
+                    msgs, pending[:] = list(pending), []
+                    for data in self._decode_batch(msgs):
+                        try:
+                            self._ingest(data)
+                        except Exception as e:
+                            print(f"Error processing message: {e}")
+                    await msgs[-1].ack()
+                    received += len(msgs)
+                
+                now = time.time()
+                if received and now - last_report >= report_interval:
+                    print(f"{subject}: {received / (now - last_report):.0f} msg/s")
+                    received = 0
+                    last_report = now
+        finally:
+            if not self.nc.is_closed:
+                await sub.unsubscribe()
+    
+    def reset_plot(self):
+        """Reset the plot completely - useful after crashes"""
+        if self.plot_initialized and self.fig:
+            # Clear all lines
+            self.renderer.clear()
+            
+            # Clear data
+            self.simulation_data.clear()
+            self.simulation_start_times.clear()
+            self.last_received.clear()
+            self.last_processed_counts.clear()
+            
+            # Reset plot limits
+            self.ax.clear()
+            self.ax.set_title('Live Simulation Data')
+            self.ax.set_xlabel('Time Step')
+            self.ax.set_ylabel('Value')
+            self.ax.grid(True, alpha=0.3)
+            self.renderer.invalidate()
+            
+            print("Plot reset complete")
+    
+    def setup_live_plot(self):
+        """Setup live plot for real-time visualization"""
+        plt.ion()  # Turn on interactive mode
+        self.fig, self.ax = plt.subplots(figsize=(12, 6))
+        self.ax.set_title('Live Simulation Data')
+        self.ax.set_xlabel('Time Step')
+        self.ax.set_ylabel('Value')
+        self.ax.grid(True, alpha=0.3)
+        
+        # Lines are drawn by the blitting renderer, decimated to the axes width
+        self.renderer = BlitRenderer(self.fig, self.ax, method=self.decimation)
+        self.lines = self.renderer.lines  # "<sim_id>_<field>" -> line
+        
+        self.plot_initialized = True
+        print("Live plot initialized")
+        
+        # Make plot window not steal focus
+        if plt.get_backend() == 'TkAgg':
+            self.fig.canvas.manager.window.attributes('-topmost', False)
+            
+            # Add keyboard shortcut for reset
+            def on_key(event):
+                if event.key == 'r':  # Press 'r' to reset plot
+                    print("Resetting plot...")
+                    self.reset_plot()
+                elif event.key == 'c':  # Press 'c' to clear data only
+                    print("Clearing data...")
+                    self.simulation_data.clear()
+                    self.simulation_start_times.clear()
+                    self.last_received.clear()
+                    self.last_processed_counts.clear()
+                    
+            self.fig.canvas.mpl_connect('key_press_event', on_key)
+        
+        plt.show(block=False)
+    
+    def update_live_plot(self):
+        """Update the live plot from the ring buffers, work scales with new messages"""
+        if not self.plot_initialized:
+            return
+        
+        # Clean up stale simulations (no data for more than 5 seconds)
+        current_time = time.time()
+        stale_sims = []
+        for sim_id, start_time in self.simulation_start_times.items():
+            if current_time - start_time > 5 and sim_id in self.simulation_data:
+                buffer = self.simulation_data[sim_id]
+                if buffer.count == 0 or current_time - self.last_received.get(sim_id, 0) > 5:
+                    stale_sims.append(sim_id)
+        
+        # Clean up stale simulation data and plot lines
+        for sim_id in stale_sims:
+            print(f"Cleaning up stale simulation: {sim_id}")
+            # Remove data
+            self.simulation_data.pop(sim_id, None)
+            self.simulation_start_times.pop(sim_id, None)
+            self.last_received.pop(sim_id, None)
+            self.last_processed_counts.pop(sim_id, None)
+            # Remove plot lines
+            for key in [k for k in self.lines if k.startswith(f"{sim_id}_")]:
+                self.renderer.remove(key)
+        
+        # Hand the buffer views of simulations with new samples to the renderer
+        changed = bool(stale_sims)
+        for sim_id, buffer in self.simulation_data.items():
+            if buffer.total == self.last_processed_counts.get(sim_id, 0):
+                continue
+            self.last_processed_counts[sim_id] = buffer.total
+            changed = True
+            
+            steps = buffer.step_view()
+            for key in [f for f in PLOT_FIELDS if f in buffer.fields][:2]:
+                style = '--' if key in ('y', 'predator') else '-'
+                self.renderer.set_data(f"{sim_id}_{key}", steps, buffer.view(key),
+                                       alpha=0.8, linewidth=2, linestyle=style)
+        
+        if not changed:
+            try:
+                self.fig.canvas.flush_events()  # keep the window responsive
+            except:
+                pass
+            return
+        
+        # Blit the lines, the axes are only rescaled when data leaves them
+        try:
+            self.renderer.render()
+        except:
+            pass  # Ignore if window is closed
+    
+    def plot_predator_prey(self, data):
+        """Plot a predator-prey trajectory, data as returned by recorder.load_trajectory"""
+        if not data or len(data.get("prey", ())) == 0:
+            print("No predator-prey data to plot")
+            return
+        
+        # Extract data
+        prey = data["prey"]
+        predator = data["predator"]
+        timestamps = data["timestamp"]
+        
+        # Create subplots
+        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 5))
+        
+        # Phase space plot
+        ax1.plot(prey, predator, 'b-', alpha=0.7)
+        ax1.scatter(prey[0], predator[0], c='green', s=100, label='Start')
+        ax1.scatter(prey[-1], predator[-1], c='red', s=100, label='End')
+        ax1.set_xlabel('Prey Population')
+        ax1.set_ylabel('Predator Population')
+        ax1.set_title('Predator-Prey Phase Space')
+        ax1.grid(True, alpha=0.3)
+        ax1.legend()
+        
+        # Time series plot
+        time_relative = timestamps - timestamps[0]
+        ax2.plot(time_relative, prey, 'g-', label='Prey', alpha=0.7)
+        ax2.plot(time_relative, predator, 'r-', label='Predator', alpha=0.7)
+        ax2.set_xlabel('Time (s)')
+        ax2.set_ylabel('Population')
+        ax2.set_title('Population Time Series')
+        ax2.grid(True, alpha=0.3)
+        ax2.legend()
+        
+        plt.tight_layout()
+        plt.savefig('/home/n/data/p/dynsys/code/simulate/first/nats/predator_prey_plot.png', dpi=150)
+        plt.close()  # Close plot to continue live updates
+    
+    def plot_hopf(self, data):
+        """Plot Hopf bifurcation data, data as returned by recorder.load_trajectory"""
+        if not data or len(data.get("x", ())) == 0:
+            print("No Hopf data to plot")
+            return
+        
+        # Extract data
+        x = data["x"]
+        y = data["y"]
+        r = data["r"]
+        theta = data["theta"]
+        timestamps = data["timestamp"]
+        
+        # Create subplots
+        fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(12, 10))
+        
+        # Phase space plot
+        ax1.plot(x, y, 'b-', alpha=0.5)
+        ax1.set_xlabel('x')
+        ax1.set_ylabel('y')
+        ax1.set_title('Hopf Phase Space')
+        ax1.grid(True, alpha=0.3)
+        ax1.set_aspect('equal')
+        
+        # Radius over time
+        time_relative = timestamps - timestamps[0]
+        ax2.plot(time_relative, r, 'r-', alpha=0.7)
+        ax2.set_xlabel('Time (s)')
+        ax2.set_ylabel('Radius r')
+        ax2.set_title('Limit Cycle Radius')
+        ax2.grid(True, alpha=0.3)
+        
+        # Angle over time
+        ax3.plot(time_relative, theta, 'g-', alpha=0.7)
+        ax3.set_xlabel('Time (s)')
+        ax3.set_ylabel('Angle θ')
+        ax3.set_title('Phase Angle')
+        ax3.grid(True, alpha=0.3)
+        
+        # Polar plot
+        ax4.plot(theta, r, 'b-', alpha=0.5)
+        ax4.set_xlabel('θ')
+        ax4.set_ylabel('r')
+        ax4.set_title('Polar Representation')
+        ax4.grid(True, alpha=0.3)
+        
+        plt.tight_layout()
+        plt.savefig('/home/n/data/p/dynsys/code/simulate/first/nats/hopf_plot.png', dpi=150)
+        plt.close()  # Close plot to continue live updates
+    
+    async def run_live_plotting(self, update_interval=1 / 30):
+        """Run live plotting while receiving data"""
+        print("Starting live plotting...")
+        
+        # Setup the live plot
+        self.setup_live_plot()
+        
+        async def plot_loop():
+            while True:
+                await asyncio.sleep(update_interval)
+                
+                # Update live plot with current data
+                self.update_live_plot()
+        
+        # Start plotting loop
+        plot_task = asyncio.create_task(plot_loop())
+        
+        try:
+            # Keep running
+            while True:
+                await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            plot_task.cancel()
+            plt.close('all')
+    
+    async def close(self):
+        """Close NATS connection"""
+        for task in self.pull_tasks:
+            task.cancel()
+        await asyncio.gather(*self.pull_tasks, return_exceptions=True)
+        self.pull_tasks.clear()
+        if self.nc:
+            await self.nc.close()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Live plot of simulation data from NATS")
+    parser.add_argument("--server", default="nats://localhost:4222")
+    parser.add_argument("--pull", action="store_true", help="Batch ingestion with pull consumers")
+    parser.add_argument("--durable", help="Durable consumer name, resumes where a previous run stopped (implies --pull)")
+    parser.add_argument("--batch", type=int, default=1000, help="Messages per fetch in pull mode")
+    parser.add_argument("--since", type=float, help="Replay messages from this many seconds ago (pull mode)")
+    parser.add_argument("--start-seq", type=int, help="Replay messages from this stream sequence (pull mode)")
+    parser.add_argument("--buffer-size", type=int, default=2000, help="Samples kept per simulation")
+    parser.add_argument("--decimation", choices=["minmax", "lttb", "none"], default="minmax",
+                        help="Downsampling of each line to the plot width")
+    parser.add_argument("--fps", type=float, default=30.0)
+    args = parser.parse_args()
+    
+    subscriber = NatsSimulationSubscriber(server=args.server, buffer_size=args.buffer_size,
+                                          decimation=args.decimation)
+    
+    try:
+        await subscriber.connect()
+        
+        if args.pull or args.durable or args.since is not None or args.start_seq is not None:
+            start_time = None
+            if args.since is not None:
+                start_time = datetime.now(timezone.utc) - timedelta(seconds=args.since)
+            await subscriber.subscribe_pull(durable=args.durable, batch_size=args.batch,
+                                            start_time=start_time, start_sequence=args.start_seq)
+        else:
+            # Subscribe to all simulations generically
+            await subscriber.subscribe_all_simulations()
+        
+        # Run live plotting
+        await subscriber.run_live_plotting(update_interval=1 / args.fps)
+        
+    except Exception as e:
+        print(f"Error: {e}")
+    finally:
+        await subscriber.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
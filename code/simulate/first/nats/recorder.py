@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""
+Headless recorder for simulation streams
+Subscribes to sim.> and writes every simulation to append-only columnar
+segment files that load back as NumPy arrays without parsing JSON
+
+Layout per simulation, under <root>/<simulation_id>/:
+    meta.json       simulation type and column names
+    params.jsonl    parameter sets, one line per change: {"step": ..., "parameters": {...}}
+    index.jsonl     one line per chunk: segment, rows, byte offset of every
+                    column and the step / timestamp / sim_time bounds
+    seg-00000.npc   chunks back to back, each column stored as one .npy record
+"""
+
+import asyncio
+import argparse
+import json
+import os
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import nats
+
+import config
+
+
+# Subjects under sim.> that never carry simulation samples
+SKIP_PREFIXES = ("sim.control.", "sim.input.", "sim.metrics.", "sim.query.")
+
+# Columns every recording has, in front of the model fields
+INDEX_COLUMNS = ("step", "timestamp", "sim_time")
+
+NAN = float("nan")
+
+
+class TrajectoryWriter:
+    """
+    Row buffer and segment files of one recorded simulation
+    append() runs on the event loop, write_chunk() on the writer thread
+    """
+
+    def __init__(self, directory: str, sim_type: str, fields: Sequence[str],
+                 chunk_rows: int = 65536, segment_bytes: int = 256 * 2**20, store=None):
+        self.directory = directory
+        self.sim_id = os.path.basename(directory)
+        self.store = store            # optional TrajectoryStore fed with every chunk
+        self.sim_type = sim_type
+        self.fields = tuple(fields)
+        self.columns = INDEX_COLUMNS + self.fields
+        self.chunk_rows = chunk_rows
+        self.segment_bytes = segment_bytes
+        self.rows = 0                 # rows in the current chunk
+        self.total = 0                # rows ever appended
+        self.last_step = None
+        self.sim_time = 0.0
+        self.parameters = None
+        self.pending_params = []      # parameter changes not written yet
+        self.buffer = []              # rows of the current chunk
+
+        # Writer thread state
+        os.makedirs(directory, exist_ok=True)
+        index = os.path.join(directory, "index.jsonl")
+        self.segment = 0
+        if os.path.exists(index):
+            # Appending to an existing recording, start a fresh segment
+            with open(index) as f:
+                entries = [json.loads(line) for line in f if line.strip()]
+            if entries:
+                self.segment = int(entries[-1]["segment"][4:9]) + 1
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump({"type": sim_type, "columns": list(self.columns)}, f)
+
+    def append(self, data: Dict[str, Any]) -> bool:
+        """Buffer one message, returns True when the chunk is full"""
+        step = data.get("step", 0)
+        params = data.get("parameters")
+        if params is not None and params != self.parameters:
+            # Parameter changes are rare, they go to params.jsonl with the next chunk
+            self.parameters = params
+            self.pending_params.append({"step": step, "parameters": params})
+
+        # Simulated time follows dt as it was when the steps were taken; the
+        # state published for step k is the one after k + 1 integration steps
+        if self.last_step is not None:
+            dt = params.get("dt", 0.0) if params else 0.0
+            self.sim_time += (step - self.last_step) * dt
+        elif params:
+            self.sim_time = (step + 1) * params.get("dt", 0.0)
+        self.last_step = step
+
+        # Rows stay Python tuples here, columns are built on the writer thread
+        get = data.get
+        self.buffer.append((step, get("timestamp", NAN), self.sim_time)
+                           + tuple([get(f, NAN) for f in self.fields]))
+        self.rows += 1
+        self.total += 1
+        return self.rows >= self.chunk_rows
+
+    def take(self) -> Tuple[List[tuple], List[Dict[str, Any]]]:
+        """Hand over the buffered rows and parameter changes, start a new chunk"""
+        rows, self.buffer = self.buffer, []
+        params, self.pending_params = self.pending_params, []
+        self.rows = 0
+        return rows, params
+
+    def _to_columns(self, rows: List[tuple]) -> Dict[str, np.ndarray]:
+        try:
+            table = np.array(rows, dtype=float)
+        except (TypeError, ValueError):
+            # Some value was not a number, replace those with NaN
+            table = np.array([[v if isinstance(v, (int, float)) else NAN for v in row]
+                              for row in rows], dtype=float)
+        table = table.reshape(len(rows), len(self.columns))
+        columns = {c: np.ascontiguousarray(table[:, i]) for i, c in enumerate(self.columns)}
+        columns["step"] = columns["step"].astype(np.int64)
+        return columns
+
+    def write_chunk(self, rows: List[tuple], params: List[Dict[str, Any]]):
+        """Append a chunk to the current segment and index it (writer thread)"""
+        if params:
+            with open(os.path.join(self.directory, "params.jsonl"), "a") as f:
+                for p in params:
+                    f.write(json.dumps(p) + "\n")
+        if not rows:
+            return
+        chunk = self._to_columns(rows)
+
+        path = self._segment_path()
+        if os.path.exists(path) and os.path.getsize(path) >= self.segment_bytes:
+            self.segment += 1
+            path = self._segment_path()
+
+        offsets = {}
+        with open(path, "ab") as f:
+            for c in self.columns:
+                offsets[c] = f.tell()
+                np.save(f, chunk[c])
+
+        steps, stamps, sim_times = chunk["step"], chunk["timestamp"], chunk["sim_time"]
+        entry = {
+            "segment": os.path.basename(path),
+            "rows": len(rows),
+            "offsets": offsets,
+            "step_min": int(steps.min()), "step_max": int(steps.max()),
+            "timestamp_min": float(np.nanmin(stamps)) if not np.isnan(stamps).all() else None,
+            "timestamp_max": float(np.nanmax(stamps)) if not np.isnan(stamps).all() else None,
+            "sim_time_min": float(sim_times.min()), "sim_time_max": float(sim_times.max())
+        }
+        # The index line is written last, a crash never indexes a partial chunk
+        with open(os.path.join(self.directory, "index.jsonl"), "a") as f:
+            f.write(json.dumps(entry) + "\n")
+        if self.store is not None:
+            self.store.append(self.sim_id, chunk, self.sim_type)
+
+    def _segment_path(self) -> str:
+        return os.path.join(self.directory, f"seg-{self.segment:05d}.npc")
+
+
+class SimulationRecorder:
+    """
+    Records all simulation data on sim.> to disk
+    Messages are buffered per simulation in the event loop; full chunks and a
+    periodic flush of partial ones are written by a single writer thread so
+    ingestion never waits for the disk.
+    """
+
+    def __init__(self, server: str = config.NATS_SERVER, root: str = "recordings",
+                 chunk_rows: int = 65536, segment_bytes: int = 256 * 2**20,
+                 flush_interval: float = 5.0, store=None):
+        self.server = server
+        self.root = root
+        self.chunk_rows = chunk_rows
+        self.segment_bytes = segment_bytes
+        self.flush_interval = flush_interval
+        self.store = store
+        self.nc = None
+        self.sub = None
+        self.writers: Dict[str, TrajectoryWriter] = {}
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="recorder")
+        self._pending = set()         # chunk writes not finished yet
+        self._flush_task = None
+        self.messages = 0
+        self.write_errors = 0
+
+    async def connect(self):
+        """Connect to NATS and start recording"""
+        self.nc = await nats.connect(self.server)
+        self.sub = await self.nc.subscribe("sim.>", cb=self._on_message,
+                                           pending_msgs_limit=1_000_000,
+                                           pending_bytes_limit=512 * 2**20)
+        self._flush_task = asyncio.create_task(self._flush_loop())
+        print(f"Recording sim.> from {self.server} into {os.path.abspath(self.root)}")
+
+    async def _on_message(self, msg):
+        if msg.subject.startswith(SKIP_PREFIXES):
+            return
+        try:
+            data = json.loads(msg.data)
+        except ValueError:
+            return
+        if not isinstance(data, dict) or "step" not in data or "simulation_id" not in data:
+            return
+
+        sim_id = data["simulation_id"]
+        writer = self.writers.get(sim_id)
+        if writer is None:
+            fields = [k for k, v in data.items()
+                      if isinstance(v, (int, float)) and k not in INDEX_COLUMNS]
+            sim_type = msg.subject.split(".")[1]
+            writer = TrajectoryWriter(os.path.join(self.root, sim_id), sim_type, fields,
+                                      self.chunk_rows, self.segment_bytes, self.store)
+            self.writers[sim_id] = writer
+            print(f"Recording {sim_type} simulation {sim_id}: {', '.join(writer.columns)}")
+
+        self.messages += 1
+        if writer.append(data):
+            self._submit(writer)
+
+    def _submit(self, writer: TrajectoryWriter):
+        """Queue the writer's buffered rows for the writer thread"""
+        rows, params = writer.take()
+        future = asyncio.get_running_loop().run_in_executor(
+            self.executor, writer.write_chunk, rows, params)
+        self._pending.add(future)
+        future.add_done_callback(self._write_done)
+
+    def _write_done(self, future):
+        self._pending.discard(future)
+        if future.exception() is not None:
+            self.write_errors += 1
+            print(f"Error writing chunk: {future.exception()}")
+
+    async def _flush_loop(self):
+        """Write partial chunks periodically so slow simulations reach the disk"""
+        last_messages = 0
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            for writer in self.writers.values():
+                if writer.rows:
+                    self._submit(writer)
+            rate = (self.messages - last_messages) / self.flush_interval
+            last_messages = self.messages
+            if rate:
+                print(f"Recorded {self.messages} messages ({rate:.0f} msg/s), "
+                      f"{len(self.writers)} simulations, {len(self._pending)} chunks queued")
+
+    async def close(self):
+        """Stop receiving, write what is buffered and close"""
+        if self.sub:
+            await self.sub.unsubscribe()
+        if self._flush_task:
+            self._flush_task.cancel()
+        for writer in self.writers.values():
+            if writer.rows:
+                self._submit(writer)
+        if self._pending:
+            await asyncio.wait(list(self._pending))
+        self.executor.shutdown(wait=True)
+        if self.nc:
+            await self.nc.close()
+        print(f"Recorder closed after {self.messages} messages")
+
+
+def list_recordings(root: str = "recordings") -> List[str]:
+    """Simulation ids with a recording under root"""
+    if not os.path.isdir(root):
+        return []
+    return sorted(d for d in os.listdir(root)
+                  if os.path.exists(os.path.join(root, d, "index.jsonl")))
+
+
+def read_index(root: str, sim_id: str) -> List[Dict[str, Any]]:
+    """Chunk index of a recording"""
+    with open(os.path.join(root, sim_id, "index.jsonl")) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def load_trajectory(root: str, sim_id: str, columns: Optional[Iterable[str]] = None,
+                    step_range: Optional[Tuple[int, int]] = None,
+                    timestamp_range: Optional[Tuple[float, float]] = None) -> Dict[str, np.ndarray]:
+    """
+    Load a recorded trajectory as {column: array}
+    Only chunks overlapping step_range / timestamp_range (inclusive) are read,
+    and of those only the requested columns.
+    """
+    directory = os.path.join(root, sim_id)
+    with open(os.path.join(directory, "meta.json")) as f:
+        meta = json.load(f)
+    wanted = list(columns) if columns is not None else list(meta["columns"])
+    # Range filters need their column even if not requested
+    needed = list(wanted)
+    if step_range is not None and "step" not in needed:
+        needed.append("step")
+    if timestamp_range is not None and "timestamp" not in needed:
+        needed.append("timestamp")
+
+    chunks = []
+    for entry in read_index(root, sim_id):
+        if step_range is not None and (entry["step_max"] < step_range[0] or entry["step_min"] > step_range[1]):
+            continue
+        if timestamp_range is not None and (entry["timestamp_max"] is None
+                                            or entry["timestamp_max"] < timestamp_range[0]
+                                            or entry["timestamp_min"] > timestamp_range[1]):
+            continue
+        chunks.append(entry)
+
+    parts = {c: [] for c in needed}
+    handles = {}
+    try:
+        for entry in chunks:
+            f = handles.get(entry["segment"])
+            if f is None:
+                f = handles[entry["segment"]] = open(os.path.join(directory, entry["segment"]), "rb")
+            for c in needed:
+                offset = entry["offsets"].get(c)
+                if offset is None:
+                    # Column added when the recording was resumed
+                    parts[c].append(np.full(entry["rows"], np.nan))
+                    continue
+                f.seek(offset)
+                parts[c].append(np.load(f))
+    finally:
+        for f in handles.values():
+            f.close()
+
+    data = {c: np.concatenate(p) if p else np.empty(0, dtype=np.int64 if c == "step" else float)
+            for c, p in parts.items()}
+    mask = None
+    if step_range is not None:
+        mask = (data["step"] >= step_range[0]) & (data["step"] <= step_range[1])
+    if timestamp_range is not None:
+        m = (data["timestamp"] >= timestamp_range[0]) & (data["timestamp"] <= timestamp_range[1])
+        mask = m if mask is None else mask & m
+    if mask is not None and not mask.all():
+        data = {c: a[mask] for c, a in data.items()}
+    return {c: data[c] for c in wanted}
+
+
+def load_parameters(root: str, sim_id: str) -> List[Dict[str, Any]]:
+    """Parameter sets of a recording with the step they took effect"""
+    path = os.path.join(root, sim_id, "params.jsonl")
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Record simulation streams to columnar files")
+    parser.add_argument("--server", default=config.NATS_SERVER)
+    parser.add_argument("--root", default=config.RECORDING["root"], help="Recording directory")
+    parser.add_argument("--chunk-rows", type=int, default=config.RECORDING["chunk_rows"])
+    parser.add_argument("--segment-mb", type=float, default=config.RECORDING["segment_mb"],
+                        help="Start a new segment file above this size")
+    parser.add_argument("--flush-interval", type=float, default=config.RECORDING["flush_interval"])
+    parser.add_argument("--store", nargs="?", const=config.RECORDING["store_root"],
+                        help="Also append to a memory-mapped trajectory store (trajectory_store.py)")
+    args = parser.parse_args()
+
+    store = None
+    if args.store:
+        from trajectory_store import TrajectoryStore
+        store = TrajectoryStore(args.store)
+    recorder = SimulationRecorder(args.server, args.root, args.chunk_rows,
+                                  int(args.segment_mb * 2**20), args.flush_interval, store)
+    await recorder.connect()
+    # Flush buffered rows on SIGTERM as well as Ctrl-C
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    try:
+        while True:
+            await asyncio.sleep(1)
+    except asyncio.CancelledError:
+        pass
+    finally:
+        await recorder.close()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
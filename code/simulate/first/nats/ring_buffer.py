@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Columnar ring buffer for simulation samples
+Preallocated float arrays per field, appended to by message handlers and read
+by plots as zero-copy views
+"""
+
+import numpy as np
+from typing import Any, Dict, Sequence
+
+
+class ColumnarRingBuffer:
+    """
+    Fixed-capacity ring buffer storing one float column per field plus steps
+
+    Every value is written twice, at i and i + capacity, so the latest n
+    values are always one contiguous slice and view() never copies.
+    """
+
+    def __init__(self, fields: Sequence[str], capacity: int = 2000, overflow: float = 1e6):
+        self.fields = tuple(fields)
+        self.capacity = capacity
+        self.overflow = overflow  # values beyond this are stored as NaN
+        self.columns = {f: np.full(2 * capacity, np.nan) for f in self.fields}
+        self.steps = np.zeros(2 * capacity, dtype=np.int64)
+        self.index = 0            # next write position in [0, capacity)
+        self.count = 0            # valid entries, <= capacity
+        self.total = 0            # entries ever appended
+        self.overflows = 0        # values replaced by NaN
+
+    def append(self, step: int, values: Dict[str, Any]):
+        """Append one sample, missing or non-numeric fields are stored as NaN"""
+        i = self.index
+        j = i + self.capacity
+        for f in self.fields:
+            col = self.columns[f]
+            v = values.get(f)
+            v = float(v) if isinstance(v, (int, float)) else np.nan
+            if abs(v) > self.overflow:
+                v = np.nan
+                self.overflows += 1
+            col[i] = v
+            col[j] = v
+        self.steps[i] = step
+        self.steps[j] = step
+        self.index = (i + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+        self.total += 1
+
+    def _window(self) -> slice:
+        """Slice of the mirrored arrays holding the valid entries, oldest first"""
+        if self.count < self.capacity:
+            return slice(0, self.count)
+        return slice(self.index, self.index + self.capacity)
+
+    def view(self, field: str) -> np.ndarray:
+        """Valid values of a field in order, a view into the buffer"""
+        return self.columns[field][self._window()]
+
+    def step_view(self) -> np.ndarray:
+        """Valid steps in order, a view into the buffer"""
+        return self.steps[self._window()]
+
+    def clear(self):
+        """Drop all samples"""
+        for f in self.fields:
+            self.columns[f].fill(np.nan)
+        self.index = 0
+        self.count = 0
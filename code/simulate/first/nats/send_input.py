@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+Send external input to running simulations
+Declarative waveforms are evaluated in blocks with numpy and published as
+batched, step-indexed messages on sim.input.<simulation_id>
+"""
+import asyncio
+import argparse
+import json
+import time
+import nats
+import numpy as np
+from typing import Any, List, Optional, Sequence
+
+
+class Constant:
+    def __init__(self, value: float = 0.0):
+        self.value = float(value)
+
+    def __call__(self, t: np.ndarray) -> np.ndarray:
+        return np.full(t.shape, self.value)
+
+
+class Sine:
+    """amplitude * sin(2 pi frequency t + phase) + offset"""
+
+    def __init__(self, amplitude: float = 1.0, frequency: float = 1.0, phase: float = 0.0, offset: float = 0.0):
+        self.amplitude = amplitude
+        self.frequency = frequency
+        self.phase = phase
+        self.offset = offset
+
+    def __call__(self, t: np.ndarray) -> np.ndarray:
+        return self.amplitude * np.sin(2 * np.pi * self.frequency * t + self.phase) + self.offset
+
+
+class Chirp:
+    """
+    Sine sweeping from f0 to f1 over duration seconds, linearly or exponentially
+    After the sweep the frequency stays at f1 with a continuous phase.
+    """
+
+    def __init__(self, amplitude: float = 1.0, f0: float = 0.1, f1: float = 1.0, duration: float = 60.0,
+                 method: str = "linear", phase: float = 0.0, offset: float = 0.0):
+        if method not in ("linear", "exponential"):
+            raise ValueError(f"Unknown chirp method {method!r}")
+        if method == "exponential" and (f0 <= 0 or f1 <= 0):
+            raise ValueError("Exponential chirp needs positive frequencies")
+        self.amplitude = amplitude
+        self.f0 = f0
+        self.f1 = f1
+        self.duration = duration
+        self.method = method
+        self.phase = phase
+        self.offset = offset
+
+    def _cycles(self, t: np.ndarray) -> np.ndarray:
+        T = self.duration
+        if self.method == "linear" or self.f0 == self.f1:
+            return self.f0 * t + (self.f1 - self.f0) * t * t / (2 * T)
+        k = self.f1 / self.f0
+        return self.f0 * T / np.log(k) * (k ** (t / T) - 1)
+
+    def __call__(self, t: np.ndarray) -> np.ndarray:
+        sweep = np.minimum(t, self.duration)
+        cycles = self._cycles(sweep) + self.f1 * (t - sweep)
+        return self.amplitude * np.sin(2 * np.pi * cycles + self.phase) + self.offset
+
+
+class Step:
+    """Cycles through levels, each held for duration seconds"""
+
+    def __init__(self, levels: Sequence[float] = (0.5, -0.5), duration: float = 1.0):
+        self.levels = np.asarray(levels, dtype=float)
+        self.duration = duration
+
+    def __call__(self, t: np.ndarray) -> np.ndarray:
+        return self.levels[(t // self.duration).astype(np.int64) % len(self.levels)]
+
+
+class Noise:
+    """Gaussian (amplitude = std) or uniform (amplitude = half width) noise"""
+
+    def __init__(self, amplitude: float = 0.1, distribution: str = "gaussian", seed: Optional[int] = None):
+        if distribution not in ("gaussian", "uniform"):
+            raise ValueError(f"Unknown noise distribution {distribution!r}")
+        self.amplitude = amplitude
+        self.distribution = distribution
+        self.rng = np.random.default_rng(seed)
+
+    def __call__(self, t: np.ndarray) -> np.ndarray:
+        if self.distribution == "gaussian":
+            return self.rng.normal(0.0, self.amplitude, t.shape)
+        return self.rng.uniform(-self.amplitude, self.amplitude, t.shape)
+
+
+class Piecewise:
+    """
+    Values at given times from a file, interpolated linearly or held
+    The file is JSON ([[t, value], ...]) or two-column CSV/whitespace text.
+    """
+
+    def __init__(self, file: str = None, points: Sequence[Sequence[float]] = None,
+                 interpolation: str = "linear", repeat: bool = False):
+        if points is None:
+            if file is None:
+                raise ValueError("Piecewise waveform needs a file or points")
+            points = self._load(file)
+        data = np.asarray(points, dtype=float)
+        order = np.argsort(data[:, 0], kind="stable")
+        self.times = data[order, 0]
+        self.values = data[order, 1]
+        if interpolation not in ("linear", "hold"):
+            raise ValueError(f"Unknown interpolation {interpolation!r}")
+        self.interpolation = interpolation
+        self.repeat = repeat
+
+    @staticmethod
+    def _load(file: str):
+        if file.endswith(".json"):
+            with open(file) as f:
+                return json.load(f)
+        return np.loadtxt(file, delimiter="," if file.endswith(".csv") else None, ndmin=2)[:, :2]
+
+    def __call__(self, t: np.ndarray) -> np.ndarray:
+        if self.repeat and self.times[-1] > self.times[0]:
+            t = self.times[0] + (t - self.times[0]) % (self.times[-1] - self.times[0])
+        if self.interpolation == "linear":
+            return np.interp(t, self.times, self.values)
+        idx = np.searchsorted(self.times, t, side="right") - 1
+        return self.values[np.clip(idx, 0, len(self.values) - 1)]
+
+
+class Sum:
+    def __init__(self, parts: List[Any]):
+        self.parts = parts
+
+    def __call__(self, t: np.ndarray) -> np.ndarray:
+        total = self.parts[0](t)
+        for part in self.parts[1:]:
+            total = total + part(t)
+        return total
+
+
+WAVEFORMS = {
+    "constant": Constant,
+    "sine": Sine,
+    "chirp": Chirp,
+    "step": Step,
+    "noise": Noise,
+    "piecewise": Piecewise,
+}
+
+
+def build_waveform(spec):
+    """Waveform from a number, a {"type": ..., **params} dict or a list of those (summed)"""
+    if isinstance(spec, (int, float)):
+        return Constant(spec)
+    if isinstance(spec, list):
+        return Sum([build_waveform(part) for part in spec])
+    params = dict(spec)
+    kind = params.pop("type", "sine")
+    if kind not in WAVEFORMS:
+        raise ValueError(f"Unknown waveform {kind!r}, expected one of {sorted(WAVEFORMS)}")
+    return WAVEFORMS[kind](**params)
+
+
+def _is_random(spec) -> bool:
+    if isinstance(spec, list):
+        return any(_is_random(part) for part in spec)
+    return isinstance(spec, dict) and spec.get("type") == "noise"
+
+
+class InputGenerator:
+    """
+    Publishes waveform samples to many simulations
+
+    Sample k of every target is the waveform at t = k * dt (+ target index *
+    spread), one sample per simulation step. Samples are evaluated a batch at
+    a time for all targets at once and published as
+    {"step": k0, "dt": dt, "x": [...], "y": [...]} at `rate` samples per
+    second per target. Deterministic waveforms without spread are evaluated
+    and serialized once per batch and shared by all targets.
+    """
+
+    def __init__(self, nc, targets: Sequence[str], x_spec, y_spec, dt: float = 0.01,
+                 rate: float = None, batch: int = 50, spread: float = 0.0, js=None,
+                 subject_prefix: str = "sim.input"):
+        self.nc = nc
+        self.js = js                  # JetStream context when every publish should be acknowledged
+        self.targets = list(targets)
+        self.subjects = [f"{subject_prefix}.{target}" for target in self.targets]
+        self.x = build_waveform(x_spec)
+        self.y = build_waveform(y_spec)
+        self.dt = dt
+        self.rate = rate if rate else 1.0 / dt
+        self.batch = max(1, int(batch))
+        self.spread = spread
+        # One row per target only when targets actually differ
+        self.shared = not spread and not _is_random(x_spec) and not _is_random(y_spec)
+        rows = 1 if self.shared else len(self.targets)
+        self._offsets = (np.arange(rows) * spread)[:, None]
+        self._index = np.arange(self.batch)
+        self.step = 0
+        self.messages = 0
+        self.bytes = 0
+        self.late = 0.0               # seconds behind schedule, worst seen
+
+    def block(self, n: int):
+        """(x, y) arrays of shape (rows, n) for the next n samples"""
+        t = (self.step + self._index[:n]) * self.dt + self._offsets
+        return self.x(t), self.y(t)
+
+    def _payload(self, step: int, xs: np.ndarray, ys: np.ndarray) -> bytes:
+        return json.dumps({"step": step, "dt": self.dt, "x": xs.tolist(), "y": ys.tolist()}).encode()
+
+    async def _publish(self, subject: str, payload: bytes):
+        if self.js is not None:
+            await self.js.publish(subject, payload)
+        else:
+            await self.nc.publish(subject, payload)
+        self.messages += 1
+        self.bytes += len(payload)
+
+    async def run(self, duration: float = None, samples: int = None, report_interval: float = 5.0,
+                  verbose: bool = False):
+        """Publish until duration seconds or samples per target have been sent"""
+        start = time.perf_counter()
+        last_report = start
+        reported = (0, 0, 0)
+        while True:
+            elapsed = time.perf_counter() - start
+            if duration is not None and elapsed >= duration:
+                break
+            n = self.batch if samples is None else min(self.batch, samples - self.step)
+            if n <= 0:
+                break
+
+            xs, ys = self.block(n)
+            if self.shared:
+                payload = self._payload(self.step, xs[0], ys[0])
+                for subject in self.subjects:
+                    await self._publish(subject, payload)
+            else:
+                for i, subject in enumerate(self.subjects):
+                    await self._publish(subject, self._payload(self.step, xs[i], ys[i]))
+            if verbose:
+                print(f"Sent input {self.step}..{self.step + n - 1}: x={xs[0, -1]:.3f}, y={ys[0, -1]:.3f}")
+            self.step += n
+
+            # Pace against the sample schedule, catching up without sleeping when late
+            now = time.perf_counter()
+            delay = self.step / self.rate - (now - start)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                self.late = max(self.late, -delay)
+                await asyncio.sleep(0)
+
+            if report_interval and now - last_report >= report_interval:
+                span = now - last_report
+                steps, messages, size = reported
+                print(f"{(self.step - steps) / span:.0f} samples/s per target, "
+                      f"{(self.messages - messages) / span:.0f} msg/s, "
+                      f"{(self.bytes - size) / span / 1e6:.2f} MB/s to {len(self.targets)} targets, "
+                      f"at most {self.late:.3f} s behind schedule")
+                last_report = now
+                reported = (self.step, self.messages, self.bytes)
+        await self.nc.flush()
+
+
+async def send_input(server="nats://localhost:4222", sim_id="hopf_2"):
+    """The original demo: a slow circle, one sample every 0.5 s"""
+    nc = await nats.connect(server)
+    try:
+        generator = InputGenerator(
+            nc, [sim_id],
+            {"type": "sine", "amplitude": 0.3, "frequency": 1 / (2 * np.pi)},
+            {"type": "sine", "amplitude": 0.3, "frequency": 1 / (2 * np.pi), "phase": np.pi / 2},
+            dt=0.1, rate=2.0, batch=1, js=nc.jetstream()
+        )
+        await generator.run(report_interval=0, verbose=True)
+    finally:
+        await nc.close()
+
+
+def _load_spec(value):
+    """Inline JSON or the path of a JSON file"""
+    if value is None:
+        return None
+    try:
+        return json.loads(value)
+    except ValueError:
+        with open(value) as f:
+            return json.load(f)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Publish programmable external input to simulations")
+    parser.add_argument("sims", nargs="*", help="Target simulation IDs")
+    parser.add_argument("--server", default="nats://localhost:4222", help="NATS server URL")
+    parser.add_argument("--prefix", help="Also target <prefix>0 .. <prefix><count-1>")
+    parser.add_argument("--count", type=int, default=0)
+    parser.add_argument("--spec", help='JSON (inline or file) with "x" and "y" waveforms')
+    parser.add_argument("--x", help="x waveform, JSON inline or file")
+    parser.add_argument("--y", help="y waveform, JSON inline or file")
+    parser.add_argument("--dt", type=float, help="Seconds of waveform time per sample, the simulations' dt")
+    parser.add_argument("--rate", type=float, help="Samples per second per target (default 1/dt)")
+    parser.add_argument("--batch", type=int, help="Samples per message")
+    parser.add_argument("--spread", type=float, default=0.0, help="Time offset between consecutive targets")
+    parser.add_argument("--duration", type=float, help="Stop after this many seconds")
+    parser.add_argument("--samples", type=int, help="Stop after this many samples per target")
+    parser.add_argument("--ack", action="store_true", help="Wait for a JetStream ack for every message")
+    args = parser.parse_args()
+
+    targets = list(args.sims)
+    if args.prefix and args.count:
+        targets += [f"{args.prefix}{i}" for i in range(args.count)]
+    if not targets:
+        targets = ["hopf_2"]
+
+    spec = _load_spec(args.spec) or {}
+    x_spec = _load_spec(args.x) if args.x is not None else spec.get("x")
+    y_spec = _load_spec(args.y) if args.y is not None else spec.get("y")
+    if x_spec is None and y_spec is None and args.rate is None and args.dt is None and len(targets) == 1:
+        # No waveform given: the original slow demo
+        await send_input(args.server, targets[0])
+        return
+
+    nc = await nats.connect(args.server)
+    try:
+        dt = args.dt or 0.01
+        rate = args.rate or 1.0 / dt
+        generator = InputGenerator(
+            nc, targets,
+            x_spec if x_spec is not None else 0.0,
+            y_spec if y_spec is not None else 0.0,
+            dt=dt, rate=rate, batch=args.batch or max(1, int(rate * 0.05)),
+            spread=args.spread, js=nc.jetstream() if args.ack else None
+        )
+        print(f"Sending to {len(targets)} targets at {generator.rate:g} samples/s, "
+              f"{generator.batch} samples per message")
+        await generator.run(duration=args.duration, samples=args.samples)
+        print(f"Sent {generator.step} samples per target in {generator.messages} messages, "
+              f"at most {generator.late:.3f} s behind schedule")
+    finally:
+        await nc.close()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\nStopping input sender...")
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Bridge simulation output to input for feedback loops
+Feeds published (sampled) outputs back as external input. Engines couple
+simulations directly with the "feedback" parameter, applied at every
+integration step with an exact delay, also across engines with
+"remote": true (see feedback.py and coupling.py)
+"""
+import asyncio
+import json
+import nats
+from collections import deque
+
+class SimulationBridge:
+    def __init__(self, server="nats://localhost:4222", sim_id="hopf_2"):
+        self.server = server
+        self.sim_id = sim_id
+        self.nc = None
+        self.js = None
+        
+        # Configuration
+        self.output_subject = f"sim.hopf.{sim_id}.>"
+        self.input_subject = f"sim.input.{sim_id}"
+        
+        # Feedback parameters
+        self.feedback_strength = 0.1  # How much of output affects input
+        self.delay_steps = 5  # Number of steps to delay feedback
+        self.output_buffer = deque()  # published outputs not yet fed back, oldest first
+        self.latest_step = -1
+        
+    async def connect(self):
+        """Connect to NATS"""
+        self.nc = await nats.connect(self.server)
+        self.js = self.nc.jetstream()
+        print(f"Connected to NATS at {self.server}")
+        
+    async def setup_output_subscription(self):
+        """Subscribe to simulation output"""
+        async def output_handler(msg):
+            try:
+                data = json.loads(msg.data.decode())
+                
+                # Extract x, y from simulation output
+                if "x" in data and "y" in data:
+                    step = data.get("step", 0)
+                    
+                    # Delay is counted in simulation steps, outputs only exist every publish_frequency steps
+                    self.output_buffer.append((step, data["x"], data["y"]))
+                    self.latest_step = max(self.latest_step, step)
+                    
+                    print(f"Received output step {step}: x={data['x']:.3f}, y={data['y']:.3f}")
+                    
+            except Exception as e:
+                print(f"Error processing output: {e}")
+        
+        # Subscribe to simulation output with simpler configuration
+        try:
+            # First try to get stream info to make sure it exists
+            stream_info = await self.js.stream_info("SIMULATION")
+            print(f"Found SIMULATION stream with {stream_info.state.messages} messages")
+            
+            # Use regular subscription instead of JetStream consumer
+            await self.nc.subscribe(
+                subject=self.output_subject,
+                cb=output_handler
+            )
+            print(f"Subscribed to output: {self.output_subject}")
+            
+        except Exception as e:
+            print(f"Failed to subscribe to output: {e}")
+            # Try fallback to JetStream with explicit config
+            try:
+                await self.js.subscribe(
+                    subject=self.output_subject,
+                    stream="SIMULATION",
+                    cb=output_handler,
+                    deliver_policy="new_only",
+                    manual_ack=False
+                )
+                print(f"Subscribed to output via JetStream: {self.output_subject}")
+            except Exception as e2:
+                print(f"Fallback also failed: {e2}")
+                raise
+    
+    async def send_feedback(self):
+        """Send delayed feedback to input"""
+        while True:
+            await asyncio.sleep(0.1)  # Check every 100ms
+            
+            # Feed back every output that is at least delay_steps behind the newest one
+            while self.output_buffer and self.output_buffer[0][0] <= self.latest_step - self.delay_steps:
+                step, x, y = self.output_buffer.popleft()
+                
+                # Apply feedback transformation
+                x_feedback = x * self.feedback_strength
+                y_feedback = y * self.feedback_strength
+                
+                # Create input message
+                input_data = {
+                    "x": x_feedback,
+                    "y": y_feedback,
+                    "source": "feedback",
+                    "original_step": step
+                }
+                
+                # Send to input stream
+                await self.js.publish(
+                    self.input_subject,
+                    json.dumps(input_data).encode()
+                )
+                
+                print(f"Sent feedback: x={x_feedback:.3f}, y={y_feedback:.3f} (from step {step})")
+    
+    async def run(self):
+        """Run the bridge"""
+        await self.connect()
+        await self.setup_output_subscription()
+        
+        print(f"Bridge running for {self.sim_id}")
+        print(f"Feedback strength: {self.feedback_strength}")
+        print(f"Delay steps: {self.delay_steps}")
+        print(f"Output -> {self.output_subject}")
+        print(f"Input -> {self.input_subject}")
+        
+        # Start feedback loop
+        feedback_task = asyncio.create_task(self.send_feedback())
+        
+        try:
+            while True:
+                await asyncio.sleep(1)
+        except KeyboardInterrupt:
+            print("\nStopping bridge...")
+            feedback_task.cancel()
+        finally:
+            await self.nc.close()
+
+async def main():
+    import sys
+    sim_id = sys.argv[1] if len(sys.argv) > 1 else "hopf_2"
+    strength = float(sys.argv[2]) if len(sys.argv) > 2 else 0.1
+    delay = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    
+    bridge = SimulationBridge(sim_id=sim_id)
+    bridge.feedback_strength = strength
+    bridge.delay_steps = delay
+    
+    await bridge.run()
+
+if __name__ == "__main__":
+    asyncio.run(main())
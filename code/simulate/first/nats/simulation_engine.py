@@ -0,0 +1,557 @@
+#!/usr/bin/env python3
+"""
+Independent simulation module that orchestrates the simulation process
+Combines input control with core simulation logic
+"""
+
+import asyncio
+import json
+import time
+from typing import Dict, Any
+from collections import deque
+import nats
+from core_simulation import HopfNormalForm, PredatorPreyModel, StochasticModel
+from adaptive_sampler import create_sampler
+from input_control import SimulationController, SimulationState
+from metrics import EngineMetrics, SamplingProfiler, serve_prometheus
+from feedback import FeedbackHub, create_feedback
+from coupling import CouplingTransport
+from input_router import InputRouter, InputSchedule
+
+
+class SimulationEngine:
+    """
+    Independent simulation module that runs the actual simulations
+    Similar to the main simulation logic but modularized
+    """
+    
+    def __init__(self, server="nats://localhost:4222", stream_name="SIMULATION",
+                 engine_id=None, metrics_interval=5.0, metrics_port=None):
+        self.server = server
+        self.stream_name = stream_name
+        self.nc = None
+        self.js = None
+        
+        # Instrumentation
+        self.engine_id = engine_id or "engine"
+        self.metrics = EngineMetrics(self.engine_id)
+        self.profiler = SamplingProfiler()
+        self.metrics_interval = metrics_interval  # seconds between sim.metrics.* publishes
+        self.metrics_port = metrics_port  # optional Prometheus text endpoint
+        self._metrics_server = None
+        self._background_tasks = []
+        
+        # Core simulation instances
+        self.hopf_simulations = {}  # sim_id -> HopfNormalForm
+        self.predator_prey_simulations = {}  # sim_id -> PredatorPreyModel
+        
+        # Simulation state
+        self.simulation_states = {}  # sim_id -> SimulationState
+        self.samplers = {}  # sim_id -> AdaptiveSampler (adaptive publishing only)
+        self.current_steps = {}  # sim_id -> current step
+        self.feedback_hub = FeedbackHub()  # step-aligned coupling between simulations
+        self.coupling = None  # CouplingTransport for sources on other engines
+        self.inputs = None  # InputRouter shared by all simulations with external input
+        
+        # Setup controller; only a named engine leaves unknown simulations to its peers
+        self.controller = SimulationController(server, engine_id=engine_id)
+        self.controller.set_simulation_runner(self._run_simulation)
+        self.controller.set_update_handler(self.update_simulation_params)
+        self.controller.set_profile_handler(self.set_profiling)
+    
+    async def connect(self):
+        """Connect to NATS and setup streams"""
+        await self.controller.connect()
+        self.nc = self.controller.nc
+        self.js = self.controller.js
+        
+        # Create data stream if it doesn't exist
+        try:
+            from nats.js.api import StreamConfig
+            await self.js.add_stream(StreamConfig(
+                name=self.stream_name,
+                subjects=["sim.>"],
+                description="Dynamic systems simulation data"
+            ))
+            print(f"Created data stream: {self.stream_name}")
+        except Exception as e:
+            print(f"Data stream might already exist: {e}")
+        
+        self.inputs = InputRouter(self.nc)
+        
+        # Exchange states of coupled simulations with other engines
+        self.coupling = CouplingTransport(self.nc, self.feedback_hub, self.engine_id)
+        await self.coupling.start()
+        
+        # Start instrumentation
+        self._background_tasks.append(asyncio.create_task(self.metrics.monitor_loop_lag()))
+        if self.metrics_interval:
+            self._background_tasks.append(asyncio.create_task(self._publish_metrics_loop()))
+        if self.metrics_port:
+            self._metrics_server = await serve_prometheus(self.metrics, port=self.metrics_port)
+    
+    async def _run_simulation(self, sim_id: str, params: Dict[str, Any]):
+        """
+        Main simulation runner - called by input control module
+        This is where the actual simulation logic happens
+        """
+        sim_type = params.get("type", "hopf")
+        duration = params.get("duration", 60)
+        dt = params.get("dt", 0.01)
+        
+        print(f"Starting {sim_type} simulation {sim_id} for {duration}s...")
+        print(f"Parameters: {params}")
+        external_input_enabled = params.get("external_input", False)
+        print(f"External input enabled: {external_input_enabled}")
+        if external_input_enabled:
+            print(f"Input subject: {params.get('input_subject', 'sim.input.>')}")
+        
+        # Initialize simulation based on type
+        if sim_type == "hopf":
+            await self._run_hopf_simulation(sim_id, params, duration, dt)
+        elif sim_type == "predator_prey":
+            await self._run_predator_prey_simulation(sim_id, params, duration, dt)
+        else:
+            print(f"Unknown simulation type: {sim_type}")
+            return
+    
+    async def _run_hopf_simulation(self, sim_id: str, params: Dict[str, Any], duration: float, dt: float):
+        """Run Hopf bifurcation simulation"""
+        print(f"DEBUG: Starting _run_hopf_simulation for {sim_id}")
+        
+        # Validate parameters for stability
+        mu = params.get("mu", 0.1)
+        alpha = params.get("alpha", -1.0)
+        
+        print(f"DEBUG: mu={mu}, alpha={alpha}")
+        
+        if mu > 0.3:
+            print(f"Warning: mu={mu} is high, may cause instability")
+        if alpha > 0:
+            print(f"Warning: alpha={alpha} is positive, may cause unbounded growth")
+        
+        # Initialize Hopf simulation
+        print(f"DEBUG: Creating HopfNormalForm")
+        integration_method = params.get("integration_method", "rk4")
+        hopf = HopfNormalForm(
+            mu=mu,
+            omega=params.get("omega", 1.0),
+            alpha=alpha,
+            beta=params.get("beta", 1.0),
+            dt=dt,
+            integration_method=integration_method
+        )
+        hopf = self._with_noise(hopf, params)
+        self.hopf_simulations[sim_id] = hopf
+        sim_metrics = self.metrics.register(sim_id, "hopf")
+        print(f"DEBUG: HopfNormalForm created")
+        
+        # Route external input to this simulation through the engine's shared subscriptions
+        external_input_enabled = params.get("external_input", False)
+        input_buffer = deque(maxlen=params.get("input_buffer_size", 1000))
+        if external_input_enabled:
+            input_subject = params.get("input_subject", "sim.input.>")
+            await self.inputs.add(sim_id, input_subject, input_buffer, sim_metrics,
+                                  debug=params.get("debug", False))
+        
+        # Initial conditions
+        x = params.get("x0", 0.1)
+        y = params.get("y0", 0.1)
+        print(f"DEBUG: Initial x={x}, y={y}")
+        
+        def status(step, x, y, steps_per_sec):
+            r, theta = hopf.get_polar_coords(x, y)
+            return f"Hopf {sim_id} Step {step}: r={r:.3f}, theta={theta:.3f}, {steps_per_sec:.1f} steps/sec"
+        
+        print(f"DEBUG: Starting simulation loop with {integration_method} integration")
+        step = 0
+        try:
+            step = await self._run_integration_loop(
+                sim_id, "hopf", hopf, (x, y), params, duration, sim_metrics,
+                lambda sample: self._hopf_message(sim_id, hopf, sample), status,
+                publish_frequency=params.get("publish_frequency", 100),
+                status_frequency=params.get("status_frequency", 1000),
+                input_buffer=input_buffer if external_input_enabled else None
+            )
+        except Exception as e:
+            print(f"Simulation loop error: {e}")
+        finally:
+            # Clean up simulation state
+            step = self.current_steps.get(sim_id, step)
+            self.hopf_simulations.pop(sim_id, None)
+            if external_input_enabled:
+                await self.inputs.remove(sim_id)
+            await self._finish_simulation(sim_id)
+            print(f"Hopf simulation {sim_id} completed after {step} steps")
+    
+    async def _run_predator_prey_simulation(self, sim_id: str, params: Dict[str, Any], duration: float, dt: float):
+        """Run predator-prey simulation"""
+        # Initialize predator-prey simulation
+        integration_method = params.get("integration_method", "rk4")
+        pp = PredatorPreyModel(
+            alpha=params.get("alpha", 1.1),
+            beta=params.get("beta", 0.4),
+            delta=params.get("delta", 0.1),
+            gamma=params.get("gamma", 0.4),
+            dt=dt,
+            integration_method=integration_method
+        )
+        pp = self._with_noise(pp, params)
+        self.predator_prey_simulations[sim_id] = pp
+        sim_metrics = self.metrics.register(sim_id, "predator_prey")
+        
+        # Initial conditions
+        prey = params.get("prey0", 10.0)
+        predator = params.get("predator0", 5.0)
+        
+        def status(step, prey, predator, steps_per_sec):
+            return f"Predator-Prey {sim_id} Step {step}: prey={prey:.2f}, predator={predator:.2f}, {steps_per_sec:.1f} steps/sec"
+        
+        try:
+            await self._run_integration_loop(
+                sim_id, "predator_prey", pp, (prey, predator), params, duration, sim_metrics,
+                lambda sample: self._predator_prey_message(sim_id, pp, sample), status,
+                publish_frequency=params.get("publish_frequency", 50),
+                status_frequency=params.get("status_frequency", 500)
+            )
+        except Exception as e:
+            print(f"Simulation loop error: {e}")
+        finally:
+            self.predator_prey_simulations.pop(sim_id, None)
+            await self._finish_simulation(sim_id)
+            print(f"Predator-prey simulation {sim_id} completed")
+    
+    def _with_noise(self, model, params: Dict[str, Any]):
+        """Wrap a model in a StochasticModel when an SDE integration method is requested"""
+        method = params.get("integration_method", "rk4")
+        if method not in StochasticModel.METHODS:
+            return model
+        sigma = params.get("noise_strength", 0.01)
+        stochastic = StochasticModel(
+            model,
+            sigma_x=params.get("sigma_x", sigma),
+            sigma_y=params.get("sigma_y", sigma),
+            noise_type=params.get("noise_type", "additive"),
+            method=method,
+            seed=params.get("seed")
+        )
+        print(f"Stochastic {method} integration, {stochastic.noise_type} noise "
+              f"sigma=({stochastic.sigma_x}, {stochastic.sigma_y})")
+        return stochastic
+    
+    async def _run_integration_loop(self, sim_id: str, sim_type: str, model, state, params: Dict[str, Any],
+                                    duration: float, sim_metrics, build_message, status_message,
+                                    publish_frequency: int, status_frequency: int, input_buffer=None) -> int:
+        """
+        Step a model in tight chunks until the duration has passed or it is stopped
+        Derivatives and messages are only computed for published steps, control
+        changes arrive through the controller's SimulationControl flags.
+        Feedback terms (params["feedback"]) are applied at every step; chunks
+        shrink, or wait, so that delayed states of other simulations exist.
+        Returns the number of steps taken.
+        """
+        control = self.controller.get_control(sim_id)
+        sampler = create_sampler(params)
+        if sampler is not None:
+            self.samplers[sim_id] = sampler
+            print(f"Adaptive publishing: tolerance={sampler.tolerance}, max gap={sampler.max_gap} steps")
+        
+        # Pacing: simulated seconds per wall-clock second, 0 runs as fast as possible
+        realtime_factor = params.get("realtime_factor", 1.0)
+        # Steps per chunk, by default ~20 ms of wall-clock time when paced
+        chunk_size = params.get("chunk_size")
+        if not chunk_size:
+            chunk_size = max(1, int(0.02 * realtime_factor / model.dt)) if realtime_factor else 1000
+        enable_debug = params.get("debug", False)
+        input_strength = params.get("input_strength", 0.1)
+        take_input = InputSchedule(input_buffer, sim_metrics).take if input_buffer is not None else None
+        last_external = None
+        feedback = create_feedback(self.feedback_hub, sim_id, params, chunk_size)
+        if feedback.terms:
+            print("Feedback: " + ", ".join(
+                f"{t.source} gain=({t.gx}, {t.gy}) delay={t.delay} {t.mode}" for t in feedback.terms))
+        
+        x, y = state
+        step = 0
+        sim_time = 0.0
+        next_publish = 0
+        next_status = 0
+        start_time = time.time()
+        paced_start = time.perf_counter()
+        step_fn = model.step
+        derivatives = model.get_derivatives
+        
+        try:
+            while True:
+                if control.stopped:
+                    print(f"DEBUG: Simulation {sim_id} not running, breaking")
+                    break
+                if not control.running.is_set():
+                    paused_at = time.perf_counter()
+                    await control.running.wait()
+                    paced_start += time.perf_counter() - paused_at
+                    continue
+                if control.params_changed:
+                    control.params_changed = False
+                    input_strength = params.get("input_strength", 0.1)
+                    try:
+                        feedback.configure(params.get("feedback"), step)
+                    except ValueError as e:
+                        print(f"Ignoring feedback update for {sim_id}: {e}")
+                
+                current_time = time.time()
+                if current_time - start_time >= duration:
+                    break
+                
+                # Coupled simulations may have to wait for their sources
+                n = feedback.limit(step, chunk_size, x, y)
+                if n == 0:
+                    await feedback.wait()
+                    sim_metrics.coupling_wait_seconds = feedback.wait_seconds
+                    continue
+                history = feedback.history
+                if history is not None:
+                    hxs, hys, hcap = history.xs, history.ys, history.capacity
+                terms = feedback.hot_terms(step)
+                
+                # Tight stepping loop, only published steps build samples
+                samples = []
+                dt = model.dt
+                t0 = time.perf_counter()
+                try:
+                    for _ in range(n):
+                        if history is not None:
+                            i = step % hcap
+                            hxs[i] = x
+                            hys[i] = y
+                        if take_input is not None:
+                            # Apply the external input due at this step (you can customize how to combine)
+                            external = take_input(step)
+                            if external is not None:
+                                external_x, external_y = external
+                                x = x * (1 - input_strength) + external_x * input_strength
+                                y = y * (1 - input_strength) + external_y * input_strength
+                                # Only a new input boosts publishing, not one held since
+                                if sampler is not None and external is not last_external:
+                                    sampler.boost(step)
+                                last_external = external
+                        if terms:
+                            # Delayed feedback as forcing, Euler-split from the integrator step
+                            fx = fy = 0.0
+                            for src_x, src_y, cap, lag, lo, hi, gx, gy, diffusive in terms:
+                                j = step - lag
+                                if j < lo:
+                                    j = lo
+                                elif j > hi:
+                                    j = hi
+                                j %= cap
+                                if diffusive:
+                                    fx += gx * (src_x[j] - x)
+                                    fy += gy * (src_y[j] - y)
+                                else:
+                                    fx += gx * src_x[j]
+                                    fy += gy * src_y[j]
+                            x, y = step_fn(x, y)
+                            x += dt * fx
+                            y += dt * fy
+                        else:
+                            x, y = step_fn(x, y)
+                        sim_time += dt
+                        if sampler is not None:
+                            samples += sampler.offer(step, sim_time, (x, y), derivatives(x, y))
+                        elif step == next_publish:
+                            samples.append((step, (x, y), derivatives(x, y)))
+                            next_publish += publish_frequency
+                        step += 1
+                except Exception as e:
+                    print(f"Error in simulation step {step}: {e}")
+                    break
+                finally:
+                    sim_metrics.integrator_seconds += time.perf_counter() - t0
+                    sim_metrics.steps = step
+                    self.current_steps[sim_id] = step
+                    feedback.advance(step)
+                    if input_buffer is not None:
+                        sim_metrics.input_queue_depth = len(input_buffer)
+                
+                data = None
+                if samples:
+                    data = await self._publish_samples(sim_id, sim_type, samples, build_message, sim_metrics)
+                
+                # Status updates less frequently
+                if step >= next_status:
+                    elapsed = time.time() - start_time
+                    steps_per_sec = step / elapsed if elapsed > 0 else 0
+                    print(status_message(step, x, y, steps_per_sec))
+                    if enable_debug and data is not None:
+                        print(json.dumps(data))
+                    next_status = (step // status_frequency + 1) * status_frequency
+                
+                # Pace against simulated time, yield to the event loop at least once per chunk
+                delay = 0.0
+                if realtime_factor:
+                    delay = sim_time / realtime_factor - (time.perf_counter() - paced_start)
+                await asyncio.sleep(max(0.0, delay))
+        finally:
+            feedback.close(step)
+            # Publish the last skipped step so the trajectory ends where the simulation did
+            if sampler is not None:
+                await self._flush_sampler(sim_id, sampler, sim_type, build_message, sim_metrics)
+        return step
+    
+    async def _finish_simulation(self, sim_id: str):
+        """Drop per-simulation engine state and mark the simulation stopped"""
+        self.simulation_states.pop(sim_id, None)
+        self.samplers.pop(sim_id, None)
+        self.current_steps.pop(sim_id, None)
+        self.metrics.remove(sim_id)
+        self.profiler.disable(sim_id)
+        # Use controller's stop method for proper cleanup
+        try:
+            await self.controller._stop_simulation(sim_id)
+        except Exception as e:
+            print(f"Error cleaning up simulation state: {e}")
+    
+    def _hopf_message(self, sim_id: str, hopf: HopfNormalForm, sample) -> Dict[str, Any]:
+        """Build the data message for a published Hopf step"""
+        step, (x, y), (dx_dt, dy_dt) = sample
+        r, theta = hopf.get_polar_coords(x, y)
+        return {
+            "timestamp": time.time(),
+            "simulation_id": sim_id,
+            "step": step,
+            "x": x,
+            "y": y,
+            "r": r,
+            "theta": theta,
+            "dx_dt": dx_dt,
+            "dy_dt": dy_dt,
+            "parameters": hopf.get_params()
+        }
+    
+    def _predator_prey_message(self, sim_id: str, pp: PredatorPreyModel, sample) -> Dict[str, Any]:
+        """Build the data message for a published predator-prey step"""
+        step, (prey, predator), (dx_dt, dy_dt) = sample
+        return {
+            "timestamp": time.time(),
+            "simulation_id": sim_id,
+            "step": step,
+            "prey": prey,
+            "predator": predator,
+            "dx_dt": dx_dt,
+            "dy_dt": dy_dt,
+            "parameters": pp.get_params()
+        }
+    
+    async def _publish_samples(self, sim_id: str, sim_type: str, samples, build_message, sim_metrics):
+        """Serialize and publish samples, returns the last message"""
+        data = None
+        for sample in samples:
+            t0 = time.perf_counter()
+            data = build_message(sample)
+            payload = json.dumps(data).encode()
+            t1 = time.perf_counter()
+            sim_metrics.serialization_seconds += t1 - t0
+            try:
+                await self.js.publish(f"sim.{sim_type}.{sim_id}.{sample[0]}", payload)
+                sim_metrics.publish_latency.observe(time.perf_counter() - t1)
+                sim_metrics.published += 1
+            except Exception as e:
+                sim_metrics.publish_errors += 1
+                print(f"Error publishing to NATS at step {sample[0]}: {e}")
+                # Continue simulation even if publishing fails
+        return data
+    
+    async def _flush_sampler(self, sim_id: str, sampler, sim_type: str, build_message, sim_metrics):
+        """Publish the last step an adaptive sampler is still holding back"""
+        sample = sampler.flush()
+        if sample is None or self.js is None:
+            return
+        await self._publish_samples(sim_id, sim_type, [sample], build_message, sim_metrics)
+        print(f"{sim_id}: published {sampler.emitted} of {sampler.offered} steps (adaptive)")
+    
+    async def _publish_metrics_loop(self):
+        """Publish engine and per-simulation metrics on sim.metrics.*"""
+        while True:
+            await asyncio.sleep(self.metrics_interval)
+            try:
+                report = self.metrics.to_dict()
+                if self.coupling is not None:
+                    report["coupling"] = self.coupling.stats()
+                if self.inputs is not None:
+                    report["inputs"] = self.inputs.stats()
+                await self.nc.publish(f"sim.metrics.engine.{self.engine_id}", json.dumps(report).encode())
+                for sim_id, sim_metrics in list(self.metrics.simulations.items()):
+                    report = sim_metrics.to_dict()
+                    if sim_id in self.profiler.enabled:
+                        report["profile"] = self.profiler.report(sim_id, top=10)
+                    await self.nc.publish(f"sim.metrics.{sim_id}", json.dumps(report).encode())
+            except Exception as e:
+                print(f"Error publishing metrics: {e}")
+    
+    async def set_profiling(self, sim_id: str, enabled: bool) -> Dict[str, Any]:
+        """Toggle the sampling profiler for a simulation"""
+        if sim_id not in self.metrics.simulations:
+            return {"status": "error", "message": f"Simulation {sim_id} not running"}
+        if enabled:
+            self.profiler.enable(sim_id)
+            return {"status": "profiling", "message": f"Profiling {sim_id}"}
+        return {"status": "profiled", "profile": self.profiler.disable(sim_id)}
+    
+    async def update_simulation_params(self, sim_id: str, params: Dict[str, Any]):
+        """Update parameters for a running simulation"""
+        if sim_id in self.hopf_simulations:
+            self.hopf_simulations[sim_id].update_params(**params)
+            print(f"Updated Hopf simulation {sim_id} parameters: {params}")
+        elif sim_id in self.predator_prey_simulations:
+            self.predator_prey_simulations[sim_id].update_params(**params)
+            print(f"Updated predator-prey simulation {sim_id} parameters: {params}")
+        else:
+            print(f"Simulation {sim_id} not found for parameter update")
+            return
+        
+        # Publish the transient after a parameter change at full rate
+        if sim_id in self.samplers:
+            self.samplers[sim_id].boost(self.current_steps.get(sim_id, 0))
+    
+    async def close(self):
+        """Close connections and cleanup"""
+        for task in self._background_tasks:
+            task.cancel()
+        if self._metrics_server:
+            self._metrics_server.close()
+        if self.coupling is not None:
+            await self.coupling.close()
+        await self.controller.close()
+
+
+async def main():
+    """Main function to run the simulation engine"""
+    import argparse
+    parser = argparse.ArgumentParser(description="Run the simulation engine")
+    parser.add_argument("--server", default="nats://localhost:4222", help="NATS server URL")
+    parser.add_argument("--engine-id", help="Name used in sim.metrics.engine.<id> (default engine); "
+                        "engines sharing the control subject need distinct ids")
+    parser.add_argument("--metrics-interval", type=float, default=5.0, help="Seconds between metrics publishes (0 disables)")
+    parser.add_argument("--metrics-port", type=int, help="Serve Prometheus text metrics on this port")
+    args = parser.parse_args()
+    
+    engine = SimulationEngine(server=args.server, engine_id=args.engine_id,
+                              metrics_interval=args.metrics_interval, metrics_port=args.metrics_port)
+    
+    try:
+        await engine.connect()
+        print("Simulation engine started. Waiting for control commands...")
+        
+        # Keep running
+        while True:
+            await asyncio.sleep(1)
+            
+    except KeyboardInterrupt:
+        print("\nShutting down simulation engine...")
+    finally:
+        await engine.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
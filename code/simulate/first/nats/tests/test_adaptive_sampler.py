@@ -0,0 +1,89 @@
+"""Adaptive publishing of simulation steps"""
+
+import numpy as np
+
+from adaptive_sampler import AdaptiveSampler, create_sampler
+from core_simulation import HopfNormalForm
+
+
+def hopf_trajectory(n_steps, dt=0.01):
+    """(step, t, state, deriv) after each integration step of a Hopf oscillator"""
+    model = HopfNormalForm(mu=1.0, omega=2.0, alpha=-1.0, beta=0.0, dt=dt)
+    x, y = 0.1, 0.0
+    for step in range(n_steps):
+        x, y = model.step(x, y)
+        yield step, (step + 1) * dt, (x, y), model.get_derivatives(x, y)
+
+
+def run(sampler, trajectory):
+    emitted = []
+    for step, t, state, deriv in trajectory:
+        emitted += sampler.offer(step, t, state, deriv)
+    last = sampler.flush()
+    if last is not None:
+        emitted.append(last)
+    return emitted
+
+
+def hermite(t0, p0, v0, t1, p1, v1, t):
+    h = t1 - t0
+    s = (t - t0) / h
+    return ((2 * s**3 - 3 * s**2 + 1) * p0 + (s**3 - 2 * s**2 + s) * h * v0
+            + (-2 * s**3 + 3 * s**2) * p1 + (s**3 - s**2) * h * v1)
+
+
+def test_straight_line_only_emits_heartbeats():
+    sampler = AdaptiveSampler(tolerance=1e-6, max_gap=100, prediction="linear")
+    emitted = run(sampler, ((k, k * 0.1, (k * 0.1, 1.0), (1.0, 0.0)) for k in range(1000)))
+    assert [s[0] for s in emitted] == list(range(0, 1000, 100))
+
+
+def test_curvature_beyond_tolerance_emits():
+    trajectory = list(hopf_trajectory(2000))
+    steps = {}
+    for prediction in ("linear", "hermite"):
+        for tolerance in (1e-2, 1e-3, 1e-4):
+            sampler = AdaptiveSampler(tolerance=tolerance, max_gap=10000, prediction=prediction)
+            steps[prediction, tolerance] = len(run(sampler, trajectory))
+        # Tighter tolerance, more samples
+        assert steps[prediction, 1e-2] < steps[prediction, 1e-3] < steps[prediction, 1e-4]
+    # The curve a subscriber draws needs far fewer samples than straight extrapolation
+    assert steps["hermite", 1e-4] < len(trajectory) // 10
+    assert steps["hermite", 1e-3] < steps["linear", 1e-3] // 4
+
+
+def test_boost_emits_every_step_after_closing_the_segment():
+    sampler = AdaptiveSampler(tolerance=1.0, max_gap=1000, full_rate_window=5)
+    trajectory = list(hopf_trajectory(40))
+    emitted = []
+    for step, t, state, deriv in trajectory:
+        if step == 20:
+            sampler.boost(step)
+        emitted += sampler.offer(step, t, state, deriv)
+    # First step, the last one before the boost, then the boosted window
+    assert [s[0] for s in emitted] == [0, 19, 20, 21, 22, 23, 24, 25]
+    assert emitted[1] == (19, trajectory[19][2], trajectory[19][3])
+
+
+def test_hermite_reconstruction_within_tolerance():
+    tolerance = 1e-4
+    trajectory = list(hopf_trajectory(3000))
+    emitted = run(AdaptiveSampler(tolerance=tolerance, max_gap=400), trajectory)
+    assert emitted[0][0] == 0 and emitted[-1][0] == trajectory[-1][0]
+    assert max(b[0] - a[0] for a, b in zip(emitted, emitted[1:])) <= 400
+
+    worst = 0.0
+    for (k0, p0, v0), (k1, p1, v1) in zip(emitted, emitted[1:]):
+        t0, t1 = trajectory[k0][1], trajectory[k1][1]
+        for k in range(k0 + 1, k1):
+            curve = hermite(t0, np.array(p0), np.array(v0), t1, np.array(p1), np.array(v1),
+                            trajectory[k][1])
+            worst = max(worst, np.max(np.abs(curve - trajectory[k][2])))
+    assert worst <= tolerance
+
+
+def test_create_sampler_from_params():
+    assert create_sampler({}) is None
+    sampler = create_sampler({"publish_mode": "adaptive", "publish_frequency": 20,
+                              "sample_tolerance": 1e-5})
+    assert (sampler.tolerance, sampler.max_gap, sampler.prediction) == (1e-5, 200, "hermite")
@@ -0,0 +1,36 @@
+"""Regression gate of the benchmark runner"""
+
+from benchmarks.__main__ import compare
+
+
+def results(**values):
+    """Results with a "_low" suffix marking lower-is-better measurements"""
+    return {"results": {
+        name: {"value": value, "unit": "x", "higher_is_better": not name.endswith("_low")}
+        for name, value in values.items()
+    }}
+
+
+def test_direction_of_regressions():
+    baseline = results(rate=100.0, faster=100.0, steady=100.0, error_low=1.0, better_low=1.0)
+    current = results(rate=80.0, faster=150.0, steady=95.0, error_low=1.5, better_low=0.5)
+    regressions = compare(current, baseline, threshold=0.1)
+    assert [(name, old, new) for name, old, new, change in regressions] == [
+        ("rate", 100.0, 80.0), ("error_low", 1.0, 1.5)]
+    assert [round(change, 3) for *_, change in regressions] == [-0.2, 0.5]
+
+
+def test_threshold_is_exclusive():
+    assert compare(results(rate=90.0), results(rate=100.0), threshold=0.1) == []
+    assert compare(results(rate=89.0), results(rate=100.0), threshold=0.1) != []
+
+
+def test_missing_or_zero_baseline_is_not_a_regression(capsys):
+    baseline = results(zero=0.0, zero_low=0.0, dropped=5.0)
+    current = results(zero=10.0, zero_low=0.01, added=1.0)
+    assert compare(current, baseline, threshold=0.0) == []
+    out = capsys.readouterr().out
+    assert out.count("zero base") == 2 and out.count("new") == 1
+    # Records without higher_is_better are throughput, higher is better
+    record = {"results": {"rate": {"value": 50.0, "unit": "x"}}}
+    assert len(compare(record, {"results": {"rate": {"value": 100.0, "unit": "x"}}}, 0.1)) == 1
@@ -0,0 +1,24 @@
+"""Stochastic wrapper of the deterministic models"""
+
+import numpy as np
+import pytest
+
+from core_simulation import HopfNormalForm, StochasticModel
+
+
+def test_stochastic_step_stops_on_overflow_like_the_model():
+    model = StochasticModel(HopfNormalForm(dt=0.01), seed=1)
+    model.step(0.1, 0.1)
+    with pytest.raises(ValueError, match="Numerical overflow"):
+        model.step(2e6, 0.0)
+    with pytest.raises(ValueError, match="Numerical overflow"):
+        model.step(np.array([0.1, 0.1]), np.array([0.1, -3e6]))
+
+
+def test_simulate_stops_on_overflow():
+    # Growing cubic term: every path blows up within the run
+    model = StochasticModel(HopfNormalForm(mu=1.0, alpha=1.0, beta=1.0, dt=0.01), seed=1)
+    with np.errstate(all="ignore"), pytest.raises(ValueError, match="Numerical overflow"):
+        model.simulate(1.0, 0.0, n_steps=2000, n_paths=4, record_every=1000)
+    t, X, Y = StochasticModel(HopfNormalForm(dt=0.01), seed=1).simulate(0.1, 0.1, 100, n_paths=4)
+    assert np.isfinite(X).all() and np.isfinite(Y).all()
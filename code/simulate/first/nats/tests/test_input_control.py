@@ -0,0 +1,86 @@
+"""Control commands with several engines on one control subject"""
+
+import asyncio
+import json
+
+from input_control import SimulationController, SimulationState
+
+
+class FakeMessage:
+    def __init__(self, data: bytes, replies: list):
+        self.data = data
+        self.replies = replies
+
+    async def respond(self, data: bytes):
+        self.replies.append(json.loads(data))
+
+
+class FakeBus:
+    """Delivers each request to every controller, like one core NATS subject"""
+
+    def __init__(self, controllers):
+        self.controllers = controllers
+
+    async def request(self, command: dict) -> list:
+        replies = []
+        data = json.dumps(command).encode()
+        await asyncio.gather(*(c._handle_control_command(FakeMessage(data, replies))
+                               for c in self.controllers))
+        return replies
+
+
+def make_controller(engine_id):
+    controller = SimulationController(engine_id=engine_id)
+
+    async def runner(sim_id, params):
+        await asyncio.Event().wait()
+
+    controller.set_simulation_runner(runner)
+    return controller
+
+
+def test_only_owning_engine_replies():
+    async def run():
+        e1, e2 = make_controller("e1"), make_controller("e2")
+        bus = FakeBus([e1, e2])
+        replies = await bus.request({"simulation_id": "hopf_1", "action": "start",
+                                     "parameters": {"engine": "e2"}})
+        assert [r["status"] for r in replies] == ["started"]
+        assert "hopf_1" not in e1.simulations
+
+        for action, status in (("pause", "paused"), ("resume", "resumed"),
+                               ("update", "updated"), ("status", "running"),
+                               ("stop", "stopped")):
+            replies = await bus.request({"simulation_id": "hopf_1", "action": action,
+                                         "parameters": {"mu": 0.2}})
+            assert [r["status"] for r in replies] == [status], action
+        assert e2.simulations["hopf_1"] == SimulationState.STOPPED
+
+        # Nobody holds it: no engine answers with an error
+        assert await bus.request({"simulation_id": "other", "action": "stop"}) == []
+
+    asyncio.run(run())
+
+
+def test_single_engine_without_id_reports_unknown_simulation():
+    async def run():
+        bus = FakeBus([make_controller(None)])
+        replies = await bus.request({"simulation_id": "missing", "action": "stop"})
+        assert [r["message"] for r in replies] == ["Simulation not found"]
+
+    asyncio.run(run())
+
+
+def test_engines_built_like_the_cli_reply_as_expected():
+    from simulation_engine import SimulationEngine
+
+    async def run():
+        lone = SimulationEngine()
+        assert lone.engine_id == "engine" and lone.controller.engine_id is None
+        replies = await FakeBus([lone.controller]).request({"simulation_id": "missing", "action": "status"})
+        assert [r["status"] for r in replies] == ["not_found"]
+
+        named = [SimulationEngine(engine_id=e).controller for e in ("e1", "e2")]
+        assert await FakeBus(named).request({"simulation_id": "missing", "action": "stop"}) == []
+
+    asyncio.run(run())
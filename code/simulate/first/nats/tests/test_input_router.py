@@ -0,0 +1,171 @@
+"""Step-indexed external inputs"""
+
+import asyncio
+import json
+from collections import deque
+
+from input_router import InputRouter, InputSchedule, decode_inputs, subject_matches
+from metrics import SimulationMetrics
+
+
+def schedule(maxlen=100):
+    return InputSchedule(deque(maxlen=maxlen), SimulationMetrics("s", "hopf"))
+
+
+def batch(step, xs):
+    return decode_inputs(json.dumps({"step": step, "x": xs, "y": [0.0] * len(xs)}).encode())[0]
+
+
+def test_decode_numbers_batches_from_their_step():
+    assert batch(5, [1.0, 2.0]) == [(5, 1.0, 0.0), (6, 2.0, 0.0)]
+    assert decode_inputs(b'{"x": 1, "y": 2}') == ([(None, 1, 2)], None)
+
+
+def test_inputs_applied_at_their_step_holding_across_gaps():
+    s = schedule()
+    s.buffer.extend(batch(0, [1.0, 2.0]) + batch(4, [3.0]))
+    taken = [s.take(step) for step in range(10, 16)]
+    assert [t and t[0] for t in taken] == [1.0, 2.0, 2.0, 2.0, 3.0, 3.0]
+    assert s.metrics.inputs_dropped == 0
+
+
+def test_input_held_while_the_buffer_waits_for_the_next_batch():
+    s = schedule()
+    assert s.take(0) is None
+    s.buffer.extend(batch(0, [1.0, 2.0]))
+    assert [s.take(step) for step in range(3)] == [(1.0, 0.0), (2.0, 0.0), (2.0, 0.0)]
+    assert not s.buffer
+    assert s.take(3) == (2.0, 0.0)
+    s.buffer.extend(batch(4, [3.0]))
+    assert s.take(4) == (3.0, 0.0)
+
+
+def test_late_inputs_skip_to_the_newest_due():
+    s = schedule()
+    s.buffer.extend(batch(0, [1.0]))
+    assert s.take(0) == (1.0, 0.0)
+    s.buffer.extend(batch(1, [2.0, 3.0, 4.0]) + batch(20, [5.0]))
+    assert s.take(10) == (4.0, 0.0)
+    assert s.metrics.inputs_dropped == 2
+    # Anchored again at the late input: step 20 is due 17 steps later
+    assert s.take(26) == (4.0, 0.0)
+    assert s.take(27) == (5.0, 0.0)
+
+
+def test_full_buffer_and_restarted_streams_are_anchored_again():
+    s = schedule(maxlen=3)
+    s.buffer.extend(batch(0, [1.0]))
+    assert s.take(0) == (1.0, 0.0)
+    s.buffer.extend(batch(50, [2.0, 3.0, 4.0]))
+    assert s.take(1) == (2.0, 0.0)
+    assert s.take(2) == (3.0, 0.0)
+    s.buffer.extend(batch(0, [5.0]))
+    assert s.take(3) == (4.0, 0.0)
+    assert s.take(40) == (5.0, 0.0)
+
+
+def test_inputs_without_step_follow_arrival_order():
+    s = schedule()
+    s.buffer.extend(decode_inputs(b'{"x": [1, 2], "y": [0, 0]}')[0])
+    assert [s.take(step) for step in (7, 7, 7)] == [(1, 0), (2, 0), (2, 0)]
+
+
+class FakeSubscription:
+    def __init__(self, nc, pattern):
+        self.nc = nc
+        self.pattern = pattern
+
+    async def unsubscribe(self):
+        self.nc.active.remove(self.pattern)
+
+
+class FakeConnection:
+    """Core NATS stand-in delivering to the matching subscriptions"""
+
+    def __init__(self):
+        self.active = []
+        self.callbacks = {}
+
+    async def subscribe(self, pattern, cb):
+        self.active.append(pattern)
+        self.callbacks[pattern] = cb
+        return FakeSubscription(self, pattern)
+
+    async def flush(self):
+        pass
+
+    async def publish(self, subject, data):
+        for pattern in list(self.active):
+            if subject_matches(pattern, subject):
+                await self.callbacks[pattern](FakeMessage(subject, data))
+
+
+class FakeMessage:
+    def __init__(self, subject, data):
+        self.subject = subject
+        self.data = data
+
+
+def test_one_subscription_fans_out_to_every_matching_sim():
+    async def run():
+        nc = FakeConnection()
+        router = InputRouter(nc)
+        buffers = {sim: deque(maxlen=10) for sim in ("a", "b", "c")}
+        metrics = {sim: SimulationMetrics(sim, "hopf") for sim in buffers}
+        await router.add("a", "sim.input.>", buffers["a"], metrics["a"])
+        await router.add("b", "sim.input.b", buffers["b"], metrics["b"])
+        await router.add("c", "sim.input.*", buffers["c"], metrics["c"])
+        # sim.input.> covers the other patterns, a single subscription serves all three
+        assert nc.active == ["sim.input.>"]
+
+        await nc.publish("sim.input.b", json.dumps({"step": 0, "x": [1, 2], "y": [3, 4]}).encode())
+        for sim in "abc":
+            assert list(buffers[sim]) == [(0, 1, 3), (1, 2, 4)]
+            assert metrics[sim].inputs_received == 2
+        await nc.publish("sim.input.a.deep", b'{"x": 5, "y": 6}')
+        assert list(buffers["a"])[-1] == (None, 5, 6)
+        assert len(buffers["b"]) == len(buffers["c"]) == 2
+        await nc.publish("sim.input.b", b"not json")
+        assert router.stats()["messages"] == 2 and router.stats()["errors"] == 1
+
+    asyncio.run(run())
+
+
+def test_removed_sims_get_nothing_and_subscriptions_shrink():
+    async def run():
+        nc = FakeConnection()
+        router = InputRouter(nc)
+        a, b = deque(maxlen=10), deque(maxlen=10)
+        await router.add("a", "sim.input.>", a, SimulationMetrics("a", "hopf"))
+        await router.add("b", "sim.input.b", b, SimulationMetrics("b", "hopf"))
+        await nc.publish("sim.input.b", b'{"x": 1, "y": 1}')
+
+        await router.remove("a")
+        # The narrower pattern is subscribed before the covering one goes away
+        assert nc.active == ["sim.input.b"]
+        await nc.publish("sim.input.b", b'{"x": 2, "y": 2}')
+        await nc.publish("sim.input.a", b'{"x": 3, "y": 3}')
+        assert [x for _, x, _ in a] == [1]
+        assert [x for _, x, _ in b] == [1, 2]
+
+        await router.remove("b")
+        await router.remove("b")
+        assert nc.active == [] and router.stats()["routes"] == 0
+        await nc.publish("sim.input.b", b'{"x": 4, "y": 4}')
+        assert [x for _, x, _ in b] == [1, 2]
+
+    asyncio.run(run())
+
+
+def test_full_buffer_counts_dropped_inputs():
+    async def run():
+        nc = FakeConnection()
+        router = InputRouter(nc)
+        metrics = SimulationMetrics("a", "hopf")
+        buffer = deque(maxlen=3)
+        await router.add("a", "sim.input.a", buffer, metrics)
+        await nc.publish("sim.input.a", json.dumps({"step": 0, "x": [0] * 5, "y": [0] * 5}).encode())
+        assert [k for k, _, _ in buffer] == [2, 3, 4]
+        assert (metrics.inputs_received, metrics.inputs_dropped) == (5, 2)
+
+    asyncio.run(run())
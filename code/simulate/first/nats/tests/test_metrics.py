@@ -0,0 +1,102 @@
+"""Engine metrics after a short run"""
+
+import asyncio
+import contextlib
+import io
+import re
+
+from benchmarks.common import NullJetStream
+from input_control import SimulationState
+from metrics import SamplingProfiler
+from simulation_engine import SimulationEngine
+
+SAMPLE = re.compile(r'^[a-z_]+\{(engine="[^"]*"(,[a-z]+="[^"]*")*)\} [-+0-9.e]+$')
+
+
+def make_engine():
+    """Engine on a no-op JetStream that keeps per-sim metrics after a run"""
+    engine = SimulationEngine(metrics_interval=0)
+    engine.js = NullJetStream()
+    engine.metrics.remove = lambda sim_id: None
+    engine.profiler = SamplingProfiler(interval=0.002, depth=8)
+    engine.controller.simulations["hopf_1"] = SimulationState.RUNNING
+    return engine
+
+
+def hopf_params(duration):
+    return {"type": "hopf", "dt": 0.01, "beta": -1.0, "duration": duration, "realtime_factor": 0,
+            "publish_frequency": 10, "status_frequency": 10**9}
+
+
+def short_run(duration=0.3):
+    engine = make_engine()
+    with contextlib.redirect_stdout(io.StringIO()):
+        asyncio.run(engine._run_simulation("hopf_1", hopf_params(duration)))
+    return engine
+
+
+def test_per_simulation_counters():
+    engine = short_run()
+    m = engine.metrics.simulations["hopf_1"]
+    assert m.steps > 100
+    # Stride publishing: steps 0, 10, 20, ... all through the no-op JetStream
+    assert m.published == engine.js.published == -(-m.steps // 10)
+    assert m.publish_errors == 0 and m.publish_latency.count == m.published
+    assert 0 < m.integrator_seconds < 0.3 and m.serialization_seconds > 0
+    report = m.to_dict()
+    assert report["steps"] == m.steps and report["integrator_us_per_step"] > 0
+    assert engine.metrics.to_dict()["steps"] == m.steps
+
+
+def test_prometheus_text_format():
+    engine = short_run()
+    m = engine.metrics.simulations["hopf_1"]
+    text = engine.metrics.render_prometheus()
+    assert text.endswith("\n")
+    typed = set()
+    values = {}
+    for line in text.splitlines():
+        if line.startswith("#"):
+            _, keyword, name, kind = line.split(" ")
+            assert keyword == "TYPE" and kind in ("counter", "gauge", "histogram")
+            typed.add(name)
+            continue
+        assert SAMPLE.match(line), line
+        name = line.split("{")[0]
+        assert name in typed or re.sub(r"_(bucket|sum|count)$", "", name) in typed, line
+        values[line.rsplit(" ", 1)[0]] = float(line.rsplit(" ", 1)[1])
+
+    labels = 'engine="engine",sim="hopf_1",type="hopf"'
+    assert values[f"dynsys_steps_total{{{labels}}}"] == m.steps
+    assert values[f"dynsys_published_total{{{labels}}}"] == m.published
+    assert values['dynsys_simulations{engine="engine"}'] == 1
+    # Cumulative buckets ending in +Inf, which equals the count
+    buckets = [v for k, v in values.items() if k.startswith(f"dynsys_publish_latency_seconds_bucket{{{labels}")]
+    assert buckets == sorted(buckets)
+    assert values[f'dynsys_publish_latency_seconds_bucket{{{labels},le="+Inf"}}'] == \
+        values[f"dynsys_publish_latency_seconds_count{{{labels}}}"] == m.published
+
+
+def test_profile_command_reports_the_running_simulation():
+    engine = make_engine()
+
+    async def run():
+        # Long chunks: the sampler thread takes the GIL while the loop is stepping,
+        # not only when the event loop waits in select() between chunks
+        params = dict(hopf_params(60), chunk_size=20000)
+        task = asyncio.create_task(engine._run_simulation("hopf_1", params))
+        await asyncio.sleep(0.05)
+        assert (await engine.set_profiling("hopf_1", True))["status"] == "profiling"
+        await asyncio.sleep(0.3)
+        response = await engine.set_profiling("hopf_1", False)
+        await engine.controller._stop_simulation("hopf_1")
+        await task
+        return response
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        response = asyncio.run(run())
+    report = response["profile"]
+    assert response["status"] == "profiled" and report
+    assert abs(sum(r["fraction"] for r in report) - 1) < 1e-9
+    # The stepping loop is where an unpaced simulation spends its time
+    assert any("_run_integration_loop" in r["stack"] for r in report)
@@ -0,0 +1,34 @@
+"""Staleness of replayed simulations in the live plot"""
+
+import time
+
+import matplotlib
+matplotlib.use("Agg")
+
+from nats_subscriber import NatsSimulationSubscriber
+
+
+def sample(step, timestamp):
+    return {"simulation_id": "hopf_1", "step": step, "timestamp": timestamp,
+            "x": 0.1 * step, "y": 0.2, "r": 0.3, "theta": 0.4}
+
+
+def test_replayed_history_is_plotted():
+    subscriber = NatsSimulationSubscriber()
+    subscriber.setup_live_plot()
+    old = time.time() - 3600  # as from --since or a durable backlog
+    for step in range(100):
+        subscriber._ingest(sample(step, old + step * 0.01))
+    subscriber.simulation_start_times["hopf_1"] -= 10  # ingested a while ago
+    subscriber.update_live_plot()
+    assert "hopf_1" in subscriber.simulation_data
+
+
+def test_silent_simulation_is_dropped():
+    subscriber = NatsSimulationSubscriber()
+    subscriber.setup_live_plot()
+    subscriber._ingest(sample(0, time.time()))
+    subscriber.simulation_start_times["hopf_1"] -= 10
+    subscriber.last_received["hopf_1"] -= 10
+    subscriber.update_live_plot()
+    assert "hopf_1" not in subscriber.simulation_data
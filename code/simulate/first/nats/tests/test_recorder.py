@@ -0,0 +1,12 @@
+"""Recorded simulated time"""
+
+from recorder import TrajectoryWriter
+
+
+def test_sim_time_is_time_after_the_published_step(tmp_path):
+    writer = TrajectoryWriter(str(tmp_path / "hopf_1"), "hopf", ("x",))
+    params = {"dt": 0.5}
+    for step in (0, 4):
+        writer.append({"step": step, "x": 0.0, "parameters": params})
+    rows, _ = writer.take()
+    assert [row[2] for row in rows] == [0.5, 2.5]
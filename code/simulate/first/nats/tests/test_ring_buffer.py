@@ -0,0 +1,59 @@
+"""Columnar ring buffer of the live plots"""
+
+import numpy as np
+
+from ring_buffer import ColumnarRingBuffer
+
+
+def fill(buffer, steps):
+    for k in steps:
+        buffer.append(k, {"x": 10.0 * k, "y": -k})
+
+
+def test_views_in_order_before_and_after_wrapping():
+    buffer = ColumnarRingBuffer(("x", "y"), capacity=5)
+    fill(buffer, range(3))
+    assert buffer.step_view().tolist() == [0, 1, 2]
+    assert buffer.view("x").tolist() == [0.0, 10.0, 20.0]
+
+    fill(buffer, range(3, 12))
+    # The latest `capacity` samples, oldest first, after wrapping more than once
+    assert buffer.step_view().tolist() == [7, 8, 9, 10, 11]
+    assert buffer.view("x").tolist() == [70.0, 80.0, 90.0, 100.0, 110.0]
+    assert (buffer.count, buffer.total, buffer.index) == (5, 12, 2)
+
+    # Each wrap position gives one contiguous slice, without copying
+    for k in range(12, 17):
+        fill(buffer, [k])
+        view = buffer.view("y")
+        assert np.shares_memory(view, buffer.columns["y"])
+        assert view.tolist() == [-float(s) for s in range(k - 4, k + 1)]
+
+
+def test_fields_stay_aligned_with_steps():
+    buffer = ColumnarRingBuffer(("x", "y", "r"), capacity=4, overflow=1e3)
+    buffer.append(0, {"x": 1, "y": 2.5, "r": 3})
+    buffer.append(1, {"x": 4, "r": "n/a"})       # missing and non-numeric fields
+    buffer.append(2, {"x": 5e3, "y": 6, "r": 7})  # beyond overflow
+    steps = buffer.step_view()
+    assert len(buffer.view("x")) == len(buffer.view("y")) == len(buffer.view("r")) == len(steps)
+    assert steps.tolist() == [0, 1, 2]
+    np.testing.assert_array_equal(buffer.view("x"), [1.0, 4.0, np.nan])
+    np.testing.assert_array_equal(buffer.view("y"), [2.5, np.nan, 6.0])
+    np.testing.assert_array_equal(buffer.view("r"), [3.0, np.nan, 7.0])
+    assert buffer.overflows == 1
+
+    fill(buffer, range(3, 9))
+    assert buffer.step_view().tolist() == [5, 6, 7, 8]
+    assert buffer.view("x").tolist() == [10.0 * k for k in range(5, 9)]
+    assert buffer.view("y").tolist() == [-float(k) for k in range(5, 9)]
+    np.testing.assert_array_equal(buffer.view("r"), [np.nan] * 4)
+
+
+def test_clear():
+    buffer = ColumnarRingBuffer(("x",), capacity=3)
+    fill(buffer, range(5))
+    buffer.clear()
+    assert len(buffer.view("x")) == len(buffer.step_view()) == 0
+    fill(buffer, [7])
+    assert buffer.step_view().tolist() == [7] and buffer.view("x").tolist() == [70.0]
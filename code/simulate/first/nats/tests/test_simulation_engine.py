@@ -0,0 +1,69 @@
+"""Lifecycle commands reaching the chunked stepping loop"""
+
+import asyncio
+import contextlib
+import io
+
+from benchmarks.common import NullJetStream
+from simulation_engine import SimulationEngine
+
+CHUNK = 500
+
+
+def test_pause_resume_stop_take_effect_at_chunk_boundaries():
+    engine = SimulationEngine(metrics_interval=0)
+    engine.js = NullJetStream()
+    engine.metrics.remove = lambda sim_id: None
+    controller = engine.controller
+    params = {"type": "hopf", "dt": 0.01, "beta": -1.0, "duration": 60, "realtime_factor": 0,
+              "chunk_size": CHUNK, "publish_frequency": 100, "status_frequency": 10**9}
+
+    async def run():
+        assert (await controller._start_simulation("hopf_1", params))["status"] == "started"
+        task = controller.simulation_tasks["hopf_1"]
+        await asyncio.sleep(0.05)
+        metrics = engine.metrics.simulations["hopf_1"]
+        assert metrics.steps > 0
+
+        assert (await controller._pause_simulation("hopf_1"))["status"] == "paused"
+        await asyncio.sleep(0.02)
+        paused_at = metrics.steps
+        await asyncio.sleep(0.05)
+        # The chunk in progress finishes, then nothing more runs
+        assert metrics.steps == paused_at and paused_at % CHUNK == 0
+        assert engine.current_steps["hopf_1"] == paused_at
+
+        assert (await controller._resume_simulation("hopf_1"))["status"] == "resumed"
+        await asyncio.sleep(0.05)
+        assert metrics.steps > paused_at
+
+        assert (await controller._stop_simulation("hopf_1"))["status"] == "stopped"
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+        stopped_at = metrics.steps
+        await asyncio.sleep(0.02)
+        assert metrics.steps == stopped_at and stopped_at % CHUNK == 0
+        assert controller.simulations["hopf_1"].value == "stopped"
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        asyncio.run(run())
+
+
+def test_stop_flag_ends_a_paused_loop():
+    engine = SimulationEngine(metrics_interval=0)
+    engine.js = NullJetStream()
+    params = {"type": "hopf", "dt": 0.01, "beta": -1.0, "duration": 60, "realtime_factor": 0,
+              "chunk_size": CHUNK, "status_frequency": 10**9}
+
+    async def run():
+        control = engine.controller.get_control("hopf_1")
+        control.running.clear()  # paused before the first chunk
+        task = asyncio.create_task(engine._run_simulation("hopf_1", params))
+        await asyncio.sleep(0.05)
+        assert engine.current_steps.get("hopf_1", 0) == 0
+        # Without cancelling the task: the flag alone wakes the loop and ends it
+        control.stop()
+        await asyncio.wait_for(task, 1.0)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        asyncio.run(run())
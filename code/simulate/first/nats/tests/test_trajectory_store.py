@@ -0,0 +1,107 @@
+"""Recorder segments through the memory-mapped store and the query service"""
+
+import asyncio
+import json
+
+import numpy as np
+import pytest
+
+from recorder import TrajectoryWriter, load_trajectory
+from trajectory_store import TrajectoryQueryService, TrajectoryStore, decode_reply
+
+DT = 0.01
+N = 1000
+
+
+def record(directory, store=None):
+    """Record N Hopf-like messages in chunks of 64 rows over several segments"""
+    writer = TrajectoryWriter(str(directory), "hopf", ("x", "y"), chunk_rows=64,
+                              segment_bytes=4096, store=store)
+    params = {"dt": DT}
+    for step in range(N):
+        message = {"step": step, "timestamp": 1e9 + step, "x": np.cos(step * DT),
+                   "y": np.sin(step * DT), "parameters": params}
+        if writer.append(message):
+            writer.write_chunk(*writer.take())
+    writer.write_chunk(*writer.take())
+
+
+def test_recording_round_trip_through_the_store(tmp_path):
+    record(tmp_path / "recordings" / "hopf_1")
+    assert len(list((tmp_path / "recordings" / "hopf_1").glob("seg-*.npc"))) > 1
+    recorded = load_trajectory(str(tmp_path / "recordings"), "hopf_1")
+
+    store = TrajectoryStore(str(tmp_path / "store"))
+    assert store.import_recording(str(tmp_path / "recordings"), "hopf_1") == N
+    assert store.simulations() == ["hopf_1"]
+    info = store.info("hopf_1")
+    assert info["rows"] == N and info["type"] == "hopf"
+    assert info["step_range"] == [0, N - 1]
+    assert info["sim_time_range"] == pytest.approx([DT, N * DT])
+
+    everything = store.query("hopf_1")
+    for c, values in recorded.items():
+        np.testing.assert_array_equal(everything[c], values)
+
+    part = store.query("hopf_1", ["step", "x"], step_range=(100, 199), stride=10)
+    assert part["step"].tolist() == list(range(100, 200, 10))
+    np.testing.assert_array_equal(part["x"], recorded["x"][100:200:10])
+    assert isinstance(part["x"], np.memmap)   # a view, nothing copied
+
+    # sim_time of step k is (k + 1) * dt
+    timed = store.query("hopf_1", ["step"], time_range=(2.005, 2.5), step_range=(0, 220))
+    assert timed["step"].tolist() == list(range(200, 221))
+
+
+def test_writer_feeds_the_store_directly(tmp_path):
+    store = TrajectoryStore(str(tmp_path / "store"))
+    record(tmp_path / "recordings" / "hopf_1", store)
+    recorded = load_trajectory(str(tmp_path / "recordings"), "hopf_1")
+    # A fresh reader sees the committed rows
+    data = TrajectoryStore(str(tmp_path / "store")).query("hopf_1")
+    for c, values in recorded.items():
+        np.testing.assert_array_equal(data[c], values)
+
+
+class FakeMessage:
+    def __init__(self, subject, request):
+        self.subject = subject
+        self.data = json.dumps(request).encode()
+        self.reply = "_INBOX.test"
+        self.responses = []
+
+    async def respond(self, data):
+        self.responses.append(data)
+
+
+class FakeConnection:
+    max_payload = 1024 + 8000
+
+
+def query(service, sim_id, **request):
+    msg = FakeMessage(f"sim.query.{sim_id}", request)
+    asyncio.run(service._handle_query(msg))
+    return decode_reply(msg.responses[0])
+
+
+def test_query_service_replies(tmp_path):
+    store = TrajectoryStore(str(tmp_path / "store"))
+    record(tmp_path / "recordings" / "hopf_1", store)
+    service = TrajectoryQueryService(store)
+    service.nc = FakeConnection()
+
+    reply = query(service, "hopf_1", columns=["step", "x"], step_range=[10, 19], stride=3)
+    assert reply["rows"] == 4 and reply["stride"] == 3
+    assert reply["data"]["step"].tolist() == [10, 13, 16, 19]
+    np.testing.assert_array_equal(reply["data"]["x"], np.cos(np.array([10, 13, 16, 19]) * DT))
+
+    reply = query(service, "hopf_1", columns=["y"], step_range=[0, 4], format="json")
+    np.testing.assert_allclose(reply["data"]["y"], np.sin(np.arange(5) * DT))
+
+    # 1000 rows of 16 bytes do not fit in 8000: the service raises the stride
+    reply = query(service, "hopf_1", columns=["step", "x"])
+    assert reply["stride"] == 2 and reply["data"]["step"].tolist() == list(range(0, N, 2))
+
+    assert query(service, "hopf_1", info=True)["rows"] == N
+    assert "No trajectory" in query(service, "missing")["error"]
+    assert "no column" in query(service, "hopf_1", columns=["z"])["error"]
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Memory-mapped trajectory store
+One fixed-width binary file per column per simulation plus a small JSON
+index; queries are binary searches and np.memmap slices, nothing is parsed
+
+Layout per simulation, under <root>/<simulation_id>/:
+    index.json      type, column dtypes, committed row count, sortedness
+    <column>.bin    raw values, step as int64 and everything else float64
+"""
+
+import asyncio
+import argparse
+import json
+import math
+import os
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import nats
+
+import config
+
+
+QUERY_SUBJECT = "sim.query"
+
+# Columns searched by range queries, values are expected to increase
+SORTED_COLUMNS = ("step", "sim_time")
+
+
+class TrajectoryStore:
+    """
+    Append-only columnar store read through memory maps
+    Rows become visible to readers when index.json is rewritten after the
+    column files were appended, so a reader never sees a partial append.
+    """
+
+    def __init__(self, root: str = "store"):
+        self.root = root
+        self._indexes: Dict[str, Dict[str, Any]] = {}   # sim_id -> index (writer side)
+        self._maps: Dict[str, tuple] = {}   # sim_id -> (index file version, rows, index, memmaps)
+
+    def simulations(self) -> List[str]:
+        """Simulation ids in the store"""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(d for d in os.listdir(self.root)
+                      if os.path.exists(os.path.join(self.root, d, "index.json")))
+
+    def info(self, sim_id: str) -> Dict[str, Any]:
+        """Index of a simulation plus its step and sim_time bounds"""
+        rows, index, maps = self._open(sim_id)
+        info = dict(index)
+        for c in SORTED_COLUMNS:
+            if c in maps and rows:
+                info[f"{c}_range"] = [maps[c][0].item(), maps[c][rows - 1].item()]
+        return info
+
+    # Writing
+
+    def append(self, sim_id: str, columns: Dict[str, np.ndarray], sim_type: str = "unknown"):
+        """Append rows given as {column: array}, all arrays of equal length"""
+        columns = {c: np.asarray(v) for c, v in columns.items()}
+        rows = len(columns["step"])
+        if rows == 0:
+            return
+        directory = os.path.join(self.root, sim_id)
+        index = self._indexes.get(sim_id)
+        if index is None:
+            index = self._read_index(sim_id)
+            if index is None:
+                os.makedirs(directory, exist_ok=True)
+                index = {"type": sim_type, "rows": 0, "columns": {},
+                         "sorted": {c: True for c in SORTED_COLUMNS}, "last": {}}
+            self._indexes[sim_id] = index
+
+        committed = index["rows"]
+        for c in columns:
+            if c not in index["columns"]:
+                # New column, earlier rows are NaN
+                dtype = "int64" if c == "step" else "float64"
+                np.full(committed, np.nan if dtype == "float64" else 0, dtype=dtype).tofile(self._path(sim_id, c))
+                index["columns"][c] = dtype
+
+        for c, dtype in index["columns"].items():
+            path = self._path(sim_id, c)
+            expected = committed * np.dtype(dtype).itemsize
+            if os.path.getsize(path) > expected:
+                # Leftover of an append that never reached the index
+                os.truncate(path, expected)
+            values = columns.get(c)
+            if values is None:
+                values = np.full(rows, np.nan)
+            with open(path, "ab") as f:
+                np.ascontiguousarray(values, dtype=dtype).tofile(f)
+
+        for c in SORTED_COLUMNS:
+            values = columns.get(c)
+            if values is None:
+                continue
+            last = index["last"].get(c)
+            if (last is not None and values[0] < last) or np.any(np.diff(values) < 0):
+                index["sorted"][c] = False
+            index["last"][c] = values[-1].item()
+
+        index["rows"] = committed + rows
+        tmp = os.path.join(directory, "index.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp, os.path.join(directory, "index.json"))
+
+    def import_recording(self, recordings: str, sim_id: str) -> int:
+        """Copy a recorder.py recording into the store, returns the rows copied"""
+        from recorder import load_trajectory
+        with open(os.path.join(recordings, sim_id, "meta.json")) as f:
+            sim_type = json.load(f).get("type", "unknown")
+        data = load_trajectory(recordings, sim_id)
+        self.append(sim_id, data, sim_type)
+        return len(data["step"])
+
+    # Reading
+
+    def query(self, sim_id: str, columns: Optional[Iterable[str]] = None,
+              step_range: Optional[Tuple[int, int]] = None,
+              time_range: Optional[Tuple[float, float]] = None,
+              stride: int = 1) -> Dict[str, np.ndarray]:
+        """
+        Rows of sim_id with step and/or sim_time in the given inclusive ranges
+        Returns {column: array}; for sorted columns these are read-only views
+        into the memory maps, costing O(log n) plus the pages actually touched.
+        """
+        rows, index, maps = self._open(sim_id)
+        wanted = list(columns) if columns is not None else list(index["columns"])
+        missing = [c for c in wanted if c not in maps]
+        if missing:
+            raise KeyError(f"{sim_id} has no column {', '.join(missing)}")
+
+        lo, hi, mask = 0, rows, None
+        for column, bounds in (("step", step_range), ("sim_time", time_range)):
+            if bounds is None:
+                continue
+            values = maps[column][:rows]
+            if index["sorted"].get(column, False):
+                lo = max(lo, int(np.searchsorted(values, bounds[0], side="left")))
+                hi = min(hi, int(np.searchsorted(values, bounds[1], side="right")))
+            else:
+                m = (values >= bounds[0]) & (values <= bounds[1])
+                mask = m if mask is None else mask & m
+
+        stride = max(1, int(stride))
+        if mask is None:
+            return {c: maps[c][lo:max(lo, hi):stride] for c in wanted}
+        rows_selected = np.flatnonzero(mask[lo:max(lo, hi)])[::stride] + lo
+        return {c: maps[c][rows_selected] for c in wanted}
+
+    def _open(self, sim_id: str):
+        """Memory maps of sim_id, re-opened when index.json was rewritten"""
+        path = os.path.join(self.root, sim_id, "index.json")
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"No trajectory for {sim_id} in {self.root}") from None
+        version = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        cached = self._maps.get(sim_id)
+        if cached is not None and cached[0] == version:
+            return cached[1], cached[2], cached[3]
+
+        index = self._read_index(sim_id)
+        rows = index["rows"]
+        maps = {}
+        for c, dtype in index["columns"].items():
+            if rows:
+                maps[c] = np.memmap(self._path(sim_id, c), dtype=dtype, mode="r", shape=(rows,))
+            else:
+                maps[c] = np.empty(0, dtype=dtype)
+        self._maps[sim_id] = (version, rows, index, maps)
+        return rows, index, maps
+
+    def _read_index(self, sim_id: str) -> Optional[Dict[str, Any]]:
+        path = os.path.join(self.root, sim_id, "index.json")
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def _path(self, sim_id: str, column: str) -> str:
+        return os.path.join(self.root, sim_id, f"{column}.bin")
+
+
+class TrajectoryQueryService:
+    """
+    Serves store queries on sim.query.<simulation_id>
+    Request: {"columns": [...], "step_range": [a, b], "time_range": [a, b],
+              "stride": n, "format": "binary" | "json", "info": false}
+    Binary replies are one JSON header line followed by the raw column bytes;
+    slices larger than the server's max payload are decimated by raising stride.
+    """
+
+    def __init__(self, store: TrajectoryStore, server: str = config.NATS_SERVER):
+        self.store = store
+        self.server = server
+        self.nc = None
+        self.queries = 0
+
+    async def connect(self):
+        self.nc = await nats.connect(self.server)
+        await self.nc.subscribe(f"{QUERY_SUBJECT}.*", cb=self._handle_query)
+        await self.nc.flush()
+        print(f"Serving {os.path.abspath(self.store.root)} on {QUERY_SUBJECT}.<simulation_id>")
+
+    async def _handle_query(self, msg):
+        if not msg.reply:
+            return
+        sim_id = msg.subject[len(QUERY_SUBJECT) + 1:]
+        try:
+            request = json.loads(msg.data) if msg.data else {}
+            if request.get("info"):
+                await msg.respond(json.dumps(self.store.info(sim_id)).encode())
+                return
+            data = self.store.query(sim_id, request.get("columns"),
+                                    request.get("step_range"), request.get("time_range"),
+                                    request.get("stride", 1))
+            payload = self._encode(sim_id, data, request.get("stride", 1),
+                                   request.get("format", "binary"))
+            self.queries += 1
+        except Exception as e:
+            payload = json.dumps({"simulation_id": sim_id, "error": str(e)}).encode()
+        await msg.respond(payload)
+
+    def _encode(self, sim_id: str, data: Dict[str, np.ndarray], stride: int, fmt: str) -> bytes:
+        rows = len(next(iter(data.values()))) if data else 0
+        row_bytes = sum(a.dtype.itemsize for a in data.values()) or 1
+        if fmt == "json":
+            row_bytes *= 3      # rough size of a float as JSON text
+        budget = self.nc.max_payload - 1024
+        if rows * row_bytes > budget:
+            extra = math.ceil(rows * row_bytes / budget)
+            data = {c: a[::extra] for c, a in data.items()}
+            stride = max(1, int(stride)) * extra
+            rows = len(next(iter(data.values())))
+
+        header = {"simulation_id": sim_id, "rows": rows, "stride": stride,
+                  "columns": {c: str(a.dtype) for c, a in data.items()}}
+        if fmt == "json":
+            header["data"] = {c: a.tolist() for c, a in data.items()}
+            return json.dumps(header).encode()
+        return json.dumps(header).encode() + b"\n" + b"".join(a.tobytes() for a in data.values())
+
+    async def close(self):
+        if self.nc:
+            await self.nc.close()
+
+
+def decode_reply(payload: bytes) -> Dict[str, Any]:
+    """Decode a query reply, binary columns become arrays over the payload"""
+    end = payload.find(b"\n")
+    if end < 0:
+        reply = json.loads(payload)
+        if "data" in reply:
+            reply["data"] = {c: np.asarray(v, dtype=reply["columns"][c]) for c, v in reply["data"].items()}
+        return reply
+    reply = json.loads(payload[:end])
+    data = {}
+    offset = end + 1
+    for c, dtype in reply["columns"].items():
+        data[c] = np.frombuffer(payload, dtype=dtype, count=reply["rows"], offset=offset)
+        offset += reply["rows"] * np.dtype(dtype).itemsize
+    reply["data"] = data
+    return reply
+
+
+async def query_trajectory(nc, sim_id: str, timeout: float = 5.0, **request) -> Dict[str, Any]:
+    """
+    Request a slice from a running query service
+    Replies are collected on an inbox because a JetStream stream on sim.>
+    answers the request with a publish ack first, that one is skipped.
+    """
+    inbox = nc.new_inbox()
+    future = asyncio.get_running_loop().create_future()
+
+    async def on_reply(msg):
+        if msg.data.startswith(b'{"stream"'):
+            return
+        if not future.done():
+            future.set_result(msg.data)
+
+    sub = await nc.subscribe(inbox, cb=on_reply)
+    try:
+        await nc.publish(f"{QUERY_SUBJECT}.{sim_id}", json.dumps(request).encode(), reply=inbox)
+        payload = await asyncio.wait_for(future, timeout)
+    finally:
+        await sub.unsubscribe()
+    reply = decode_reply(payload)
+    if "error" in reply:
+        raise RuntimeError(reply["error"])
+    return reply
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Memory-mapped trajectory store")
+    parser.add_argument("--root", default=config.RECORDING["store_root"], help="Store directory")
+    parser.add_argument("--server", default=config.NATS_SERVER)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("serve", help=f"Answer queries on {QUERY_SUBJECT}.<simulation_id>")
+    imp = sub.add_parser("import", help="Copy recorder.py recordings into the store")
+    imp.add_argument("recordings", nargs="?", default=config.RECORDING["root"])
+    imp.add_argument("sim_ids", nargs="*", help="Default: all recordings")
+    q = sub.add_parser("query", help="Query a running service")
+    q.add_argument("sim_id")
+    q.add_argument("--steps", type=int, nargs=2, metavar=("FIRST", "LAST"))
+    q.add_argument("--time", type=float, nargs=2, metavar=("START", "END"))
+    q.add_argument("--columns", nargs="+")
+    q.add_argument("--stride", type=int, default=1)
+    args = parser.parse_args()
+
+    store = TrajectoryStore(args.root)
+    if args.command == "import":
+        from recorder import list_recordings
+        for sim_id in args.sim_ids or list_recordings(args.recordings):
+            rows = store.import_recording(args.recordings, sim_id)
+            print(f"Imported {sim_id}: {rows} rows")
+    elif args.command == "query":
+        nc = await nats.connect(args.server)
+        try:
+            reply = await query_trajectory(nc, args.sim_id, columns=args.columns, step_range=args.steps,
+                                           time_range=args.time, stride=args.stride)
+        finally:
+            await nc.close()
+        print(f"{reply['rows']} rows (stride {reply['stride']})")
+        for c, a in reply["data"].items():
+            print(f"  {c}: {a[:3]} ... {a[-3:]}" if len(a) > 6 else f"  {c}: {a}")
+    else:
+        service = TrajectoryQueryService(store, args.server)
+        await service.connect()
+        try:
+            while True:
+                await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            await service.close()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
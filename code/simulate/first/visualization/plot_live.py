@@ -6,22 +6,158 @@ Usage: fluent-bit -c n3.conf | python3 plot_live.py
 import sys
 import json
 import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
 from collections import deque
-import numpy as np
 import os
 import time
-import asyncio
+import argparse
 import threading
 
+# Shared rendering helpers live next to the NATS tools
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'nats'))
+from live_render import BlitRenderer
+from ring_buffer import ColumnarRingBuffer
+
+# Feedback fifo read by n1.conf (`mkfifo fifo` in code/simulate/first)
+DEFAULT_FIFO = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'fifo')
+
+
+class StdinReader:
+    """
+    Drains a stream of JSON lines on a background thread
+    Parsed records are queued for the GUI thread, so a fast producer never
+    waits for the plot and never builds a backlog in the pipe.
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream if stream is not None else sys.stdin.buffer
+        self.pending = deque()        # parsed records, appended here, popped by the GUI
+        self.lines = 0
+        self.records = 0
+        self.errors = 0
+        self.eof = False
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        for line in self.stream:
+            self.lines += 1
+            try:
+                records = json.loads(line)
+            except ValueError:
+                self.errors += 1
+                print(f"Warning: Could not parse line: {line[:200]!r}", file=sys.stderr)
+                continue
+            if isinstance(records, dict):
+                records = [records]
+            elif not isinstance(records, list):
+                continue
+            records = [r for r in records if isinstance(r, dict)]
+            self.records += len(records)
+            self.pending.extend(records)
+        self.eof = True
+
+    def drain(self):
+        """All records received since the last call"""
+        n = len(self.pending)
+        return [self.pending.popleft() for _ in range(n)]
+
+
+class FifoWriter:
+    """
+    Writes feedback records to the fifo through one persistent handle
+    Records become due `delay` seconds after they were queued and are
+    written in batches, one write() per batch of JSON lines. The fifo stays
+    non-blocking: without a reader, or while the reader lags and the pipe is
+    full, batches are dropped rather than queued. The rest of a partly
+    written batch goes out before anything else, so lines stay whole.
+    """
+
+    def __init__(self, path=DEFAULT_FIFO, delay=4.0, interval=0.1):
+        self.path = path
+        self.delay = delay
+        self.interval = interval
+        self.queue = deque()          # (due time, record)
+        self.fd = None
+        self.partial = b""            # unwritten tail of the last batch
+        self.written = 0
+        self.dropped = 0
+        self._stop = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def put(self, records):
+        due = time.time() + self.delay
+        self.queue.extend((due, r) for r in records)
+
+    def _open(self):
+        if not os.path.exists(self.path):
+            return False
+        try:
+            # Non-blocking open fails instead of hanging while nobody reads the fifo
+            self.fd = os.open(self.path, os.O_WRONLY | os.O_NONBLOCK)
+            self.partial = b""
+            return True
+        except OSError:
+            self.fd = None
+            return False
+
+    def _write(self, data):
+        """Write as much of data as the pipe takes, keeping the rest in partial"""
+        n = os.write(self.fd, data)
+        self.partial = data[n:]
+
+    def flush(self, now=None):
+        """Write the records that are due, or drop them if the fifo cannot take them"""
+        now = time.time() if now is None else now
+        batch = []
+        while self.queue and self.queue[0][0] <= now:
+            batch.append(self.queue.popleft()[1])
+        if not batch and not self.partial:
+            return
+        if self.fd is None and not self._open():
+            self.dropped += len(batch)
+            return
+        try:
+            if self.partial:
+                self._write(self.partial)
+            if not batch:
+                return
+            if self.partial:
+                raise BlockingIOError
+            self._write("".join(json.dumps(r) + "\n" for r in batch).encode())
+            self.written += len(batch)
+        except BlockingIOError:
+            # Reader lagging behind, the pipe is full
+            self.dropped += len(batch)
+        except OSError:
+            # Reader went away, reopen on the next batch
+            os.close(self.fd)
+            self.fd = None
+            self.partial = b""
+            self.dropped += len(batch)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def close(self):
+        self._stop.set()
+        self.thread.join(timeout=1.0)
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
 class LivePlot:
-    def __init__(self, max_points=1000):
+    def __init__(self, max_points=1000, decimation='minmax', fifo_path=DEFAULT_FIFO,
+                 feedback_delay=4.0, stream=None):
         self.max_points = max_points
         self.fig, self.ax = plt.subplots(figsize=(12, 6))
-        self.lines = {}
-        self.buffers = {}
-        self.timesteps = deque(maxlen=max_points)
-        
+        self.renderer = BlitRenderer(self.fig, self.ax, method=decimation)
+        self.lines = self.renderer.lines
+        self.buffers = {}  # key -> ColumnarRingBuffer, x is the record number
+        self.record_count = 0
+
         # Set up the plot
         self.ax.set_title('Live Simulation Data')
         self.ax.set_xlabel('Time Step')
@@ -31,44 +167,19 @@ class LivePlot:
         self.start_time = time.time()
         self.save_interval = 120  # Save every 120 seconds
         self.last_save_time = self.start_time
-        
-        # Start the async event loop in a thread
-        self.loop = asyncio.new_event_loop()
-        self.thread = threading.Thread(target=self._run_event_loop, daemon=True)
-        self.thread.start()
-        
-    def _run_event_loop(self):
-        """Run the event loop in a separate thread"""
-        asyncio.set_event_loop(self.loop)
-        self.loop.run_forever()
-        
-    async def async_write_to_fifo(self, record):
-        """Async version of write_to_fifo"""
-        try:
-            fifo_path = "/home/n/data/p/dynsys/code/simulate/first/fifo"
-            if os.path.exists(fifo_path):
-                await asyncio.sleep(4)  # 0.5 second delay
-                # Use subprocess instead of os.system for better control
-                import subprocess
-                json_str = json.dumps(record)  # Convert dict to JSON string
-                subprocess.run(['echo', json_str], stdout=open(fifo_path, 'w'), check=True)
-        except Exception as e:
-            pass  # Silently ignore fifo write errors
-        
+
+        # Input and feedback run on their own threads
+        self.reader = StdinReader(stream)
+        self.fifo = FifoWriter(fifo_path, delay=feedback_delay) if fifo_path else None
+
     def save_plot(self, filename='live_plot.png'):
         """Save the current plot to an image file"""
         try:
-            self.fig.savefig(filename, dpi=150, bbox_inches='tight')
+            self.renderer.savefig(filename, dpi=150, bbox_inches='tight')
             print(f"Plot saved to {filename}")
         except Exception as e:
             print(f"Error saving plot: {e}")
-    
-    def write_to_fifo(self, record):
-        """Write JSON record to fifo - runs asynchronously"""
-        if not self.loop.is_running():
-            return
-        asyncio.run_coroutine_threadsafe(self.async_write_to_fifo(record), self.loop)
-        
+
     def update(self, frame):
         # Check if it's time to save the plot
         current_time = time.time()
@@ -76,75 +187,65 @@ class LivePlot:
             timestamp = int(current_time)
             self.save_plot(f'live_plot_{timestamp}.png')
             self.last_save_time = current_time
-        
-        # Read a line from stdin
-        line = sys.stdin.readline()
-        if not line:
+
+        # Take everything the reader thread parsed since the last frame
+        records = self.reader.drain()
+        if not records:
             return list(self.lines.values())
-            
+
         try:
-            # Parse the JSON data
-            records = json.loads(line.strip())
-            if not records or not isinstance(records, list):
-                return list(self.lines.values())
-                
-            # Process each record in the array
+            # Feed back to the fifo in one batch
+            if self.fifo:
+                self.fifo.put(records)
+
+            # Process each record in the batch
+            touched = set()
             for record in records:
-                if not isinstance(record, dict):
-                    continue
-                
-                # Write to fifo
-                self.write_to_fifo(record)
-                    
-                # Get or create data buffers for each key
+                self.record_count += 1
                 for key, value in record.items():
                     if not isinstance(value, (int, float)):
                         continue
-                        
-                    if key not in self.buffers:
-                        self.buffers[key] = deque(maxlen=self.max_points)
-                        # Create a new line for this key
-                        self.lines[key], = self.ax.plot([], [], label=key, alpha=0.8)
-                        self.ax.legend()
-                    
-                    self.buffers[key].append(value)
-                
-                # Update x-axis (time steps)
-                self.timesteps.append(len(self.timesteps) + 1)
-                
-                # Update each line
-                for key, line in self.lines.items():
-                    if key in self.buffers and self.buffers[key]:
-                        line.set_data(range(len(self.buffers[key])), self.buffers[key])
-                
-                # Adjust the plot limits
-                if self.timesteps:
-                    self.ax.set_xlim(0, max(len(buf) for buf in self.buffers.values()) + 1)
-                    
-                    # Find the overall y-range
-                    all_values = []
-                    for buf in self.buffers.values():
-                        if buf:
-                            all_values.extend(buf)
-                    
-                    if all_values:
-                        min_val = min(all_values)
-                        max_val = max(all_values)
-                        padding = (max_val - min_val) * 0.1  # 10% padding
-                        self.ax.set_ylim(min_val - padding, max_val + padding)
-            
-        except json.JSONDecodeError:
-            print(f"Warning: Could not parse line: {line}", file=sys.stderr)
+                    buffer = self.buffers.get(key)
+                    if buffer is None:
+                        buffer = self.buffers[key] = ColumnarRingBuffer((key,), self.max_points)
+                    buffer.append(self.record_count, record)
+                    touched.add(key)
+
+            # Update changed lines once per frame, the renderer rescales only when needed
+            for key in touched:
+                buffer = self.buffers[key]
+                self.renderer.set_data(key, buffer.step_view(), buffer.view(key), alpha=0.8)
+            self.renderer.render()
+
         except Exception as e:
             print(f"Error: {e}", file=sys.stderr)
-            
+
         return list(self.lines.values())
 
+    def close(self):
+        if self.fifo:
+            self.fifo.close()
+
 def main():
-    plot = LivePlot(max_points=1000)
-    ani = FuncAnimation(plot.fig, plot.update, interval=50, blit=False, cache_frame_data=False)
+    parser = argparse.ArgumentParser(description="Live plot of Fluent Bit JSON output on stdin")
+    parser.add_argument("--max-points", type=int, default=1000, help="Records kept per value")
+    parser.add_argument("--fifo", default=DEFAULT_FIFO, help="Feedback fifo, '' to disable")
+    parser.add_argument("--feedback-delay", type=float, default=4.0, help="Seconds before a record is fed back")
+    parser.add_argument("--decimation", choices=["minmax", "lttb", "none"], default="minmax")
+    parser.add_argument("--interval", type=int, default=50, help="Frame interval in ms")
+    args = parser.parse_args()
+
+    plot = LivePlot(max_points=args.max_points, decimation=args.decimation,
+                    fifo_path=args.fifo, feedback_delay=args.feedback_delay)
     plt.tight_layout()
-    plt.show()
+    # A plain timer instead of FuncAnimation, which would redraw the whole figure every frame
+    timer = plot.fig.canvas.new_timer(interval=args.interval)
+    timer.add_callback(plot.update, None)
+    timer.start()
+    try:
+        plt.show()
+    finally:
+        plot.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
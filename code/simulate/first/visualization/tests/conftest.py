@@ -0,0 +1,5 @@
+import os
+import sys
+
+# plot_live is imported by bare name, as when run from the visualization directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
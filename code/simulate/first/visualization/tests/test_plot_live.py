@@ -0,0 +1,85 @@
+"""Feedback fifo of the live plot"""
+
+import json
+import os
+
+import matplotlib
+matplotlib.use("Agg")
+
+import pytest
+
+from plot_live import FifoWriter
+
+
+@pytest.fixture
+def fifo(tmp_path):
+    path = str(tmp_path / "fifo")
+    os.mkfifo(path)
+    reader = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+    # The background thread never wakes up, flush() is driven by the test
+    writer = FifoWriter(path, delay=0.0, interval=3600)
+    yield writer, reader
+    writer.close()
+    try:
+        os.close(reader)
+    except OSError:
+        pass
+
+
+def test_due_records_are_written_as_one_batch(fifo):
+    writer, reader = fifo
+    writer.put([{"x": 1}, {"x": 2}, {"x": 3}])
+    writer.put([{"x": 4}])
+    writer.queue.append((float("inf"), {"x": 5}))  # not due yet
+    writer.flush()
+    lines = os.read(reader, 4096).decode().splitlines()
+    assert [json.loads(line)["x"] for line in lines] == [1, 2, 3, 4]
+    assert (writer.written, writer.dropped, len(writer.queue)) == (4, 0, 1)
+
+
+def test_lagging_reader_drops_batches_without_blocking(fifo):
+    writer, reader = fifo
+    record = {"x": "a" * 1000}
+    for _ in range(200):
+        writer.put([record] * 10)
+        writer.flush()
+    assert writer.dropped > 0
+    assert writer.written + writer.dropped == 2000
+    # Once the reader catches up the partial batch is finished, lines stay whole
+    data = b""
+    while True:
+        try:
+            chunk = os.read(reader, 1 << 16)
+        except BlockingIOError:
+            chunk = b""
+        if not chunk:
+            if not writer.partial:
+                break
+            writer.flush()
+            continue
+        data += chunk
+    assert len(data.splitlines()) == writer.written
+    assert all(json.loads(line) == record for line in data.splitlines())
+
+
+def test_reader_gone_drops_and_reopens(fifo):
+    writer, reader = fifo
+    writer.put([{"x": 1}])
+    writer.flush()
+    os.close(reader)
+    writer.put([{"x": 2}])
+    writer.flush()
+    assert (writer.written, writer.dropped, writer.fd) == (1, 1, None)
+
+    # Still nobody reading: the open fails and the batch is dropped
+    writer.put([{"x": 3}])
+    writer.flush()
+    assert (writer.dropped, writer.fd) == (2, None)
+
+    reader = os.open(writer.path, os.O_RDONLY | os.O_NONBLOCK)
+    try:
+        writer.put([{"x": 4}])
+        writer.flush()
+        assert json.loads(os.read(reader, 4096)) == {"x": 4}
+    finally:
+        os.close(reader)
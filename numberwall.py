@@ -1,331 +1,1019 @@
 
+import os
+import re
+import json
+import math
+import multiprocessing
+from fractions import Fraction
 import numpy as np
 from PIL import Image, ImageColor
 
 def modm(n,m): #Reduces an integer modulo n modulo m.
     return n-m*(n//m)
 
-def modminv(n,m): #Finds the inverse of a number n modulo m.
-    if n==0:
-        return 0
-    for i in range(m):
-        if modm(i*n,m)==1:
-            return i
+def modminv(n,m): #Finds the inverse of a number n modulo m, 0 if it has none.
+    if m>TABLE_LIMIT:
+        return pow(n,-1,m) if math.gcd(n,m)==1 else 0
+    return int(inverse_table(m)[modm(n,m)])
+
+SMALLPRIMES=(2,3,5,7,11,13,17,19,23,29,31,37)
+
+def isprime(m): #Miller-Rabin with the first twelve primes as bases, which decides
+    #every m below 3.3e24. Larger m passing are strong probable primes.
+    if m<2:
+        return False
+    for p in SMALLPRIMES:
+        if m%p==0:
+            return m==p
+    d,s=m-1,0
+    while d%2==0:
+        d//=2
+        s+=1
+    for b in SMALLPRIMES:
+        x=pow(b,d,m)
+        if x==1 or x==m-1:
+            continue
+        for _ in range(s-1):
+            x=x*x%m
+            if x==m-1:
+                break
+        else:
+            return False
+    return True
+
+def largeprimes(count,below=1<<31): #The count largest primes below below, descending
+    primes=[]
+    p=below-1
+    while len(primes)<count and p>1:
+        if isprime(p):
+            primes.append(p)
+        p-=1
+    return primes
+
+TABLE_LIMIT=1<<20 #Largest modulus with a table of inverses, larger primes use powers
+FIXED_LIMIT=1<<31 #Largest modulus whose products of two residues fit in int64
+
+_inverse_tables={} #Modulus -> table from inverse_table, so it is only built once.
+
+def inverse_table(m): #Array of the inverses of 0,...,m-1 modulo m. Entries without
+    #an inverse (0, and for composite m the non-units) are 0.
+    inv=_inverse_tables.get(m)
+    if inv is None:
+        table=[0]*m
+        if m>1:
+            table[1]=1
+        if isprime(m):
+            for i in range(2,m):#inv(i)=-(m//i)*inv(m%i), one multiplication per entry
+                table[i]=(m-m//i)*table[m%i]%m
+        else:
+            for i in range(2,m):
+                if np.gcd(i,m)==1:
+                    table[i]=pow(i,-1,m)
+        inv=_inverse_tables[m]=np.array(table,dtype=np.int64)
+    return inv
+
+class PowerInverse: #Inverses modulo a prime m too large for inverse_table, indexed like
+    #the table: inv[x] for a residue or an array of residues, 0 for 0. For int64 arrays
+    #they are computed as x^(m-2) by square and multiply on the whole array at once,
+    #otherwise one at a time by the extended Euclidean algorithm in pow.
+
+    def __init__(self,m):
+        self.m=m
+
+    def __getitem__(self,x):
+        m=self.m
+        if np.ndim(x)==0:
+            return pow(int(x),-1,m) if x%m else 0
+        x=np.asarray(x)
+        if x.dtype==object:
+            return np.frompyfunc(lambda v:pow(v,-1,m) if v else 0,1,1)(x)
+        inv=np.ones(x.shape,dtype=np.int64)
+        x=x.astype(np.int64)%m
+        e=m-2
+        while e:
+            if e&1:
+                inv=inv*x%m
+            x=x*x%m
+            e>>=1
+        return inv
+
+def modinverses(m): #Inverses modulo the prime m, inverse_table or PowerInverse by size
+    return inverse_table(m) if m<=TABLE_LIMIT else PowerInverse(m)
+
+def rowdtype(m): #Type for computing with residues modulo m: int64 as long as products
+    #of two residues fit, Python ints beyond
+    return np.int64 if m<=FIXED_LIMIT else object
+
+def residues(seq,m): #seq modulo m as an array of rowdtype(m)
+    seq=np.asarray(seq)
+    if seq.dtype==object or rowdtype(m) is object:
+        seq=np.frompyfunc(lambda v:int(v)%m,1,1)(seq)
+        return np.asarray(seq,dtype=rowdtype(m))
+    return seq.astype(np.int64)%m
+
+def walldtype(m): #Smallest unsigned integer type holding the residues modulo m, Python
+    #ints beyond int64.
+    for dtype in (np.uint8,np.uint16,np.uint32):
+        if m-1<=np.iinfo(dtype).max:
+            return dtype
+    return np.int64 if m-1<=np.iinfo(np.int64).max else object
 
 def numbwall(seq,m): #Input sequence and base, outputs portion of numberwall
-    #print('seq=',seq)
-    L=len(seq) #L is the length of the sequence inputted.
-    for i in range(L):
-        seq[i]=modm(seq[i],m)#Sequence taken mod m.
-    ans=[] #This set will be the number wall.
-    rowm1=[]
-    row0=[]
-    for i in range(L): #Creates row -1 and row 0 of the number wall.
-        row0.append(1)
-        rowm1.append(0)
-    ans.append(rowm1)#Adds row -1 into the numberwall.
-    ans.append(row0) #Adds row 0 into the numberwall.
-    ans[0].insert(0,' ')
-    ans[1].insert(0,' ') #Adds * to the left side of first two rows
-    for c in range(0,int(np.ceil(L/2))): #Makes shape of number wall, fills with 1
-        row=[' '] #Adds an astrix to the start of every row. This is so the
-        #innerframe function does not overrun into the right hand side portion
-        #of the number wall.
-        for i in range(c):
-            row.append(' ')#A finite sequence generates a trapesium shaped 
-            #portion of the numberwall. This puts astrix's in the gaps to fill 
-            #it into a rectangle, which is useful for display reasons.
-        for i in range(L-2*c):
-            row.append(-1) #This puts the number -1 in everywhere in the number wall 
-            #one would expect there to be a number. -1 is chosen as it never naturally 
-            #appears in the number wall, so mistakes are easy to spot.
-        for i in range(c):
-            row.append(' ')#Fills out the right side of the trapesium to complete
-            #the rectangle.
-        ans.append(row)
-    for i in range(len(ans)):
-        ans[i].append(' ')
-    #print('before first row',ans)
-    for i in range(1,L+1): #Fills in row 1 with the sequence.
-        ans[2][i]=seq[i-1]
-    #print(ans)
-    for c in range(3,2+int(np.ceil(L/2))): #Fills in the remaining rows.
-        if c==3: #Row 2 is filled seperately, since it never has a zero two rows 
-        #above. This might be unnecessary, but don't fix what isn't broken.
-            for j in range(c-1,L-c+3):
-                ans[c][j]=modm(ans[c-1][j]**2-ans[c-1][j-1]*ans[c-1][j+1],m)
-                #Uses the first frame constraint formula knowing that two rows above is entirely 1.
-        if c!=3: #For the remaining rows, use frame constraints.
-            for j in range(c-1,L-c+3):
-                if ans[c-2][j]!=0: #If entry two above isn't zero.
-                    ans[c][j]=modm(modminv(ans[c-2][j],m)*(ans[c-1][j]**2-ans[c-1][j-1]*ans[c-1][j+1]),m)
-                    #First frame constraint formula
-                if ans[c-2][j]==0 and ans[c-1][j]==0: #If both the two entries above are zero
-                    A,B,C,D=innerframe(ans,c-2,j)#Find inner frame
-                    li,lj, ui, uj = windowfind(ans,c-2,j)#Find corners of window
-                    deltam1=len(A)-2#find length of window
-                    k=deltam1-j+lj#Find value for k
-                    if ui-li!=uj-lj:#If window not square
-                        ans[c][j]=0#Make it so
-                    else:
-                        #Use frame constraints
-                        ans[c][j]=modm((-1)**(deltam1*k)*B[k]*C[k]*modminv(A[k],m),m)
-                if (ans[c-2][j]==0) and (ans[c-1][j]!=0): #If the entry two above isn't zero 
-                #but the entry one above is.
-                    A,B,C,D=innerframe(ans,c-2,j)#Inner frame
-                    E,F,G,H = outerframe(ans,c-2,j)#Outer frame
-                    P,Q,R,S = ratiofinder(ans,c-2,j,m)#Ratios of inner frame
-                    li,lj, ui, uj = windowfind(ans,c-2,j)#Window corners
-                    deltam1=len(A)-2#length of window
-                    k=deltam1-j+lj#Value for k
-                    if ui-li!=uj-lj:#If window not square 
-                        ans[c][j]=0#Make it so
-                    else:#Use finall frame constraint.
-                        ans[c][j]=modm((Q*E[k]*modminv(A[k],m)+(-1)**(k)*P*F[k]*modminv(B[k],m)-(-1)\
-                                        **(k)*S*G[k]*modminv(C[k],m))*modminv(R*modminv(D[k],m),m),m)
-    return ans #return number wall
-
-
-def windowfind(set,i,j):#Finds the upper left and lower right corners of a window
-    if set[i][j]!=0: #If a window is not inputted
-        return('Window not found') 
-    #These values will be pushed out to find the corners of the window
-    lj=j
-    li=i
-    uj=j
-    ui=i
-    while set[li][j]==0 and li>=0:
-        li-=1#Find left side of window
-    while set[li+1][lj]==0 and lj >=0:
-        lj-=1#Find right side of window
-    while ui<=len(set)-1 and set[ui][j]==0:
-        ui+=1#Find top row of window
-    while uj <= len(set[i])-1 and set[li+1][uj]==0:
-        uj+=1#Find bottom of window
-    if li==-1: #Deals with issue caused by zeros in the input sequence,
-    #where the value of li would go into row -1
-        li+=1
-    return li+1,lj+1,ui-1,uj-1 #Return corners of window
-
-def innerframe(set, i, j): #Finds inner frame
-    li,lj, ui, uj = windowfind(set,i,j) #Corners of window
-    A = []
-    na = lj-1#Starting at the topleft wall of the window
-    while na<=uj+1 and na<=len(set[li-1])-1: #Go along the top row of window
-    #and only stop adding the entries to A when the window closes or the number
-    #wall ends
-        A.append(set[li-1][na])
-        na+=1
-    nb = li-1 #Same idea as A
-    B=[]
-    while nb<=ui+1 and nb<=len(set)-1:
-        B.append(set[nb][lj-1])
-        nb+=1
-    nc = lj-1#Same idea as A
-    C=[]
-    while nc<=uj+1 and nc<=len(set[ui+1])-1:
-        #print(nc)
-        C.insert(0,set[ui+1][nc])
-        nc+=1
-    nd = li-1#Same idea as A
-    D=[]
-    while nd<=ui+1 and nd<=len(set)-1:
-        D.insert(0,set[nd][uj+1])
-        nd+=1
-    return A,B,D,C
-    
-def outerframe(set, i, j): #Finds outer frame
-    li,lj, ui, uj = windowfind(set,i,j) #Finds window corners
-    E = [] #As in A, finds the start of the outer frame and then adds it to a 
-    #list until it the window closes ot the number wall stops
-    na = lj-1
-    while na<=uj+1 and na<=len(set[li-1])-1:
-        E.append(set[li-2][na])
-        #print(na)
-        na+=1
-    nb = li-1
-    F=[]
-    while nb<=ui+1 and nb<=len(set)-1:
-        F.append(set[nb][lj-2])
-        nb+=1
-    nc = lj-1
-    G=[]
-    while nc<=uj+1 and nc<=len(set[ui+1])-1:
-        #print(nc)
-        G.insert(0,set[ui+2][nc])
-        nc+=1
-    nd = li-1
-    H=[]
-    while nd<=ui+1 and nd<=len(set)-1:
-        H.insert(0,set[nd][uj+2])
-        nd+=1
-    return E,F,H,G
-
-def ratiofinder(set,i,j,m): #Finds ratios of the geometric series comprising the 
-#inner frame
-    A,B,C,D=innerframe(set,i,j) #Finds inner frame
-    P=modm(A[1]*modminv(A[0],m),m) #Multiplies the second term by the inverse of
-    #the first to find ratio.
-    Q=modm(B[1]*modminv(B[0],m),m)
-    for i in range(len(C)-1): #Scans the C row and if two consecutive entries are
-    #integers, finds the ratio between them. Necessary because it would 
-    #sometimes try and multiply by an astrix
-        if type(C[i])==int and type(C[i+1])==int:
-            R=modm(C[i+1]*modminv(C[i],m),m)
-            pass
-    #R=modm(C[-1]*modminv(C[-2]))
-    for i in range(len(D)-1): #Same as R
-        if type(D[i])==int and type(D[i+1])==int:
-            S=modm(D[i+1]*modminv(D[i],m),m)
-            pass
-    return P,Q,R,S
-
-def PrintNW(seq,m):#Creates an image of the number wall generated by a given sequence modulo m.
-    data=numbwall(seq,m)
-    #print(data)
-    for i in range(len(data)):
-        for j in range(len(data[i])):
-            if data[i][j]==' ':
-                data[i][j]=-1
-    im = Image.new('RGBA', (len(data[0]),len(data))) # create the Image of size 1 pixel 
-    #print(data)
-    for i in range(len(data)):
-        for j in range(len(data[i])): #Change Colours below   
-            #print(i,j)
-            if data[i][j]==-1:
-                im.putpixel((j,i), ImageColor.getcolor('white', 'RGBA'))
-            elif data[i][j]==0:
-                im.putpixel((j,i), ImageColor.getcolor('red', 'RGBA'))
-            elif data[i][j]==1:
-                im.putpixel((j,i), ImageColor.getcolor('#222021', 'RGBA'))
-            elif data[i][j]==2:
-                im.putpixel((j,i), ImageColor.getcolor('#363636', 'RGBA'))
-            elif data[i][j]==3:
-                im.putpixel((j,i), ImageColor.getcolor('#544C4A', 'RGBA'))
-            elif data[i][j]==4:
-                im.putpixel((j,i), ImageColor.getcolor('#787276', 'RGBA'))
-            elif data[i][j]==5:
-                im.putpixel((j,i), ImageColor.getcolor('#787276', 'RGBA'))
+    #as nested lists: row -1, row 0, row 1 (the sequence mod m) and the rows below,
+    #with ' ' outside the trapesium and one column of ' ' on either side.
+    W,valid=numbwall_array(seq,m)
+    ans=[]
+    for row,ok in zip(W.tolist(),valid.tolist()):
+        ans.append([' ']+[v if o else ' ' for v,o in zip(row,ok)]+[' '])
+    return ans
+
+def numbwall_array(seq,m,depth=None,method='bareiss'): #Number wall of seq modulo the prime
+    #m as a pair of arrays (W,valid). W[i,n] is the entry in row i-1 and column n, so W[0]
+    #is row -1, W[1] is row 0 and W[2] the sequence; valid marks the trapesium determined
+    #by seq. depth limits the number of rows below row 0. With m None the wall is over the
+    #integers, computed by intwall (method 'bareiss') or crtwall (method 'crt').
+    if m is None:
+        return (crtwall if method=='crt' else intwall)(seq,depth)
+    L=len(seq)
+    R=(L+1)//2 if depth is None else min(depth,(L+1)//2)
+    W=np.zeros((R+2,L),dtype=walldtype(m))
+    valid=np.zeros((R+2,L),dtype=bool)
+    valid[:2]=True
+    for i,row in wallrows(seq,m,depth):
+        W[i]=row
+        if i>=2:
+            valid[i,i-2:L-i+2]=True
+    return W,valid
+
+def wallrows(seq,m,depth=None,windows=None): #Rows of the number wall of seq modulo the prime
+    #m one at a time, as (i,row) with row the entries of W[i] in numbwall_array (0 outside
+    #the trapesium). Only the two rows above are kept, entries below windows come from
+    #the WindowRegistry, so memory does not grow with the depth. For a 2D seq, one
+    #sequence per row, the walls are computed together and each row has one row per wall.
+    #Rows are int64 for m up to FIXED_LIMIT and Python ints (object arrays) beyond.
+    seq=residues(seq,m)
+    single=seq.ndim==1
+    seq=np.atleast_2d(seq) #(1,0) for an empty sequence, which reshape(-1,0) rejects
+    S,L=seq.shape
+    R=(L+1)//2 if depth is None else min(depth,(L+1)//2)
+    dtype=rowdtype(m)
+    inv=modinverses(m)
+    if windows is None:
+        windows=WindowRegistry(keep=False,batch=S)
+    prev2=np.zeros((S,L),dtype=dtype)
+    prev=np.ones((S,L),dtype=dtype)
+    yield 0,prev2[0] if single else prev2
+    yield 1,prev[0] if single else prev
+    for i in range(2,R+2): #W[i] from the two rows above
+        lo,hi=i-2,L-i+2 #Columns of row i-1
+        if i==2:
+            row=seq
+        else:
+            row=np.zeros((S,L),dtype=dtype)
+            mid=prev[:,lo:hi]
+            #First frame constraint on the whole row at once. Below a window it gives 0
+            #(inv[0]=0), which is right except on the two rows under a closed window.
+            row[:,lo:hi]=(mid*mid-prev[:,lo-1:hi-1]*prev[:,lo+1:hi+1])%m*inv[prev2[:,lo:hi]]%m
+            windows.fill(i,row,prev,lo,hi,m,inv)
+        windows.open(i,row,prev,prev2,lo,hi,m,inv)
+        windows.record(i,row)
+        windows.retire(i)
+        yield i,row[0] if single else row
+        prev2,prev=prev,row
+
+def _ranges(lengths): #For consecutive groups of the given lengths: the group of each
+    #element and its position in the group
+    lengths=np.asarray(lengths,dtype=np.int64)
+    group=np.repeat(np.arange(len(lengths)),lengths)
+    starts=np.cumsum(lengths)-lengths
+    return group,np.arange(group.size)-starts[group]
+
+class WindowRegistry: #Windows of a number wall, each registered once when its top row is
+    #computed. Window w has its top row t[w] (array row, as in W), left column a[w] and
+    #width g[w]; closed[w] is False when it runs off the trapesium, then all entries
+    #below it are 0. For closed windows the inner frame A,B,C and outer frame E,F,G are
+    #recorded in frames[:,off[w]:off[w]+g[w]+2] as the rows are computed (indexed as in
+    #framecell, A,B,E,F from the top left and C,G from the bottom right), with the
+    #ratios P,Q of A and B. The two rows below a window are filled from these, a whole
+    #row of windows at a time. With keep=False a window is forgotten once the rows below
+    #it are filled (ids change), only the totals are kept.
+    #For batch walls (wallrows with one sequence per row) rows are (batch,L) arrays and
+    #base[w] is the offset of the window's wall in the flattened rows.
+
+    fields=('t','a','g','base','off','P','Q')
+
+    def __init__(self,keep=True,batch=1):
+        self.keep=keep
+        self.total=0 #Windows so far
+        self.largest=0 #Widest window so far
+        self.windows=np.zeros(batch,dtype=np.int64) #Per wall: windows,
+        self.deficiency=np.zeros(batch,dtype=np.int64) #widest window or run of zeros,
+        self.widest=np.zeros(batch,dtype=np.int64) #and widest window inside the trapesium
+        self.count=0
+        for name in self.fields:
+            setattr(self,name,np.zeros(16,dtype=np.int64))
+        self.closed=np.zeros(16,dtype=bool)
+        self.frames=np.zeros((6,64),dtype=np.int64) #A,B,C,E,F,G
+        self.used=0
+        self.active=np.zeros(0,dtype=np.int64) #Closed windows with rows still to fill
+
+    def _reserve(self,windows,entries):
+        size=len(self.t)
+        while self.count+windows>size:
+            size*=2
+        if size>len(self.t):
+            for name in self.fields+('closed',):
+                old=getattr(self,name)
+                new=np.zeros(size,dtype=old.dtype)
+                new[:len(old)]=old
+                setattr(self,name,new)
+        size=self.frames.shape[1]
+        while self.used+entries>size:
+            size*=2
+        if size>self.frames.shape[1]:
+            frames=np.zeros((6,size),dtype=self.frames.dtype)
+            frames[:,:self.used]=self.frames[:,:self.used]
+            self.frames=frames
+
+    def open(self,i,row,prev,prev2,lo,hi,m,inv): #Registers the windows with top row i
+        row,prev,prev2=np.atleast_2d(row,prev,prev2)
+        if row.dtype!=self.frames.dtype: #Python ints for large moduli
+            self.frames=self.frames.astype(row.dtype)
+            self.P=self.P.astype(row.dtype)
+            self.Q=self.Q.astype(row.dtype)
+        L=row.shape[1]
+        w=hi-lo+2
+        top=np.zeros((len(row),w),dtype=np.int8) #A 0 on either side keeps runs in their wall
+        top[:,1:-1]=(row[:,lo:hi]==0)&(prev[:,lo:hi]!=0)
+        edges=np.diff(top.ravel())
+        start=np.flatnonzero(edges==1)+1
+        if not start.size:
+            return
+        g=np.flatnonzero(edges==-1)+1-start
+        wall=start//w
+        a=start%w-1+lo
+        closed=(a>lo)&(a+g<hi)
+        sizes=np.where(closed,g+2,0)
+        self._reserve(len(a),int(sizes.sum()))
+        ids=np.arange(self.count,self.count+len(a))
+        off=self.used+np.cumsum(sizes)-sizes
+        base=wall*L
+        self.t[ids]=i
+        self.a[ids]=a
+        self.g[ids]=g
+        self.base[ids]=base
+        self.closed[ids]=closed
+        self.off[ids]=off
+        self.count+=len(a)
+        self.used+=int(sizes.sum())
+        self.total+=len(a)
+        self.largest=max(self.largest,int(g.max()))
+        self.windows+=np.bincount(wall,minlength=len(self.windows))
+        np.maximum.at(self.deficiency,wall,g)
+        np.maximum.at(self.widest,wall[closed],g[closed])
+        c=np.flatnonzero(closed)
+        if not c.size:
+            return
+        a,g,off,base,ids=a[c],g[c],off[c],base[c],ids[c]
+        row,prev,prev2=row.ravel(),prev.ravel(),prev2.ravel()
+        group,k=_ranges(g+2)
+        cols=base[group]+a[group]-1+k
+        self.frames[0,off[group]+k]=prev[cols] #A
+        self.frames[3,off[group]+k]=prev2[cols] #E
+        self.frames[1,off]=prev[base+a-1] #B_0=A_0
+        self.frames[4,off]=prev[base+np.clip(a-2,0,L-1)] #F_0
+        self.frames[2,off+g+1]=prev[base+a+g] #C_(g+1)=A_(g+1)
+        self.frames[5,off+g+1]=prev[base+np.clip(a+g+1,0,L-1)] #G_(g+1)
+        iA0=inv[prev[base+a-1]]
+        self.P[ids]=prev[base+a]*iA0%m
+        self.Q[ids]=row[base+a-1]*iA0%m
+        self.active=np.concatenate((self.active,ids))
+
+    def record(self,i,row): #Frame entries in row i of the closed windows around it
+        act=self.active
+        t,g=self.t[act],self.g[act]
+        act=act[(t<=i)&(i<=t+g)]
+        if not act.size:
+            return
+        t,a,g,base,off=self.t[act],self.a[act],self.g[act],self.base[act],self.off[act]
+        L=row.shape[-1]
+        row=row.ravel()
+        k=i-t+1
+        self.frames[1,off+k]=row[base+a-1] #B
+        self.frames[4,off+k]=row[base+np.clip(a-2,0,L-1)] #F
+        k=t+g-i
+        self.frames[2,off+k]=row[base+np.clip(a+g,0,L-1)] #C
+        self.frames[5,off+k]=row[base+np.clip(a+g+1,0,L-1)] #G
+
+    def fill(self,i,row,prev,lo,hi,m,inv): #Entries of row i on the inner and outer frames
+        #below closed windows
+        act=self.active
+        if not act.size:
+            return
+        row,prev=row.reshape(-1),prev.reshape(-1) #Views, row is written through
+        f=self.frames
+        bottom=self.t[act]+self.g[act]
+        ids=act[bottom==i] #Second frame constraint, D_k=(-1)^(gk)B_kC_k/A_k
+        if ids.size:
+            group,k=_ranges(self.g[ids])
+            k+=1
+            a,g,base,off=self.a[ids][group],self.g[ids][group],self.base[ids][group],self.off[ids][group]
+            n=a+g-k
+            pos=off+k
+            D=f[1,pos]*f[2,pos]%m*inv[f[0,pos]]%m
+            D=np.where((g*k)%2==1,(m-D)%m,D)
+            ok=(n>=lo)&(n<hi)
+            row[(base+n)[ok]]=D[ok]
+        ids=act[bottom+1==i] #Third frame constraint,
+        #QE_k/A_k+(-1)^k PF_k/B_k=RH_k/D_k+(-1)^k SG_k/C_k
+        if ids.size:
+            group,k=_ranges(self.g[ids])
+            k+=1
+            a,g,base,off=self.a[ids][group],self.g[ids][group],self.base[ids][group],self.off[ids][group]
+            P,Q=self.P[ids][group],self.Q[ids][group]
+            n=a+g-k
+            ok=(n>=lo)&(n<hi)
+            n,k,pos=(base+n)[ok],k[ok],(off+k)[ok]
+            #Ratios of C and D from the entries next to C_k and D_k, the corners can lie
+            #outside the trapesium
+            S=prev[n]*inv[prev[n+1]]%m
+            rhs=(P[ok]*f[4,pos]%m*inv[f[1,pos]]-S*f[5,pos]%m*inv[f[2,pos]])%m
+            rhs=np.where(k%2==1,(m-rhs)%m,rhs)
+            rhs=(Q[ok]*f[3,pos]%m*inv[f[0,pos]]+rhs)%m
+            row[n]=rhs*prev[n]%m*f[2,pos-1]%m*inv[f[2,pos]]%m #H_k=D_k/R*(...), R=C_k/C_(k-1)
+
+    def retire(self,i): #Drops windows whose last row below has been filled
+        act=self.active
+        self.active=act=act[self.t[act]+self.g[act]+1>i]
+        if not self.keep and self.count>2*len(act)+256:
+            #Compact to the active windows, so memory follows the windows still open
+            sizes=self.g[act]+2
+            off=np.cumsum(sizes)-sizes
+            group,k=_ranges(sizes)
+            frames=np.zeros((6,max(64,2*int(sizes.sum()))),dtype=self.frames.dtype)
+            frames[:,off[group]+k]=self.frames[:,self.off[act][group]+k]
+            for name in self.fields+('closed',):
+                old=getattr(self,name)
+                new=np.zeros(max(16,2*len(act)),dtype=old.dtype)
+                new[:len(act)]=old[act]
+                setattr(self,name,new)
+            self.off[:len(act)]=off
+            self.frames=frames
+            self.used=int(sizes.sum())
+            self.count=len(act)
+            self.active=np.arange(len(act))
+
+    def sizes(self): #Widths of the windows kept, open ones as far as they are in the wall
+        return self.g[:self.count]
+
+
+def wallstats(seqs,m,depth=None,chunk=65536): #Summaries of the number walls of many
+    #sequences of the same length modulo the prime m, one sequence per row of seqs. The
+    #walls are computed together, chunk sequences at a time, and never stored. Returns a
+    #dict of arrays with one entry per sequence: zeros (entries 0 below row 0), windows,
+    #largest (widest window inside the trapesium) and deficiency (widest window or run of
+    #zeros at all, so defn(size,m) counts exactly the sequences with deficiency<=size).
+    seqs=np.atleast_2d(np.asarray(seqs,dtype=np.int64))
+    S,L=seqs.shape
+    stats={name:np.zeros(S,dtype=np.int64) for name in ('zeros','windows','largest','deficiency')}
+    for start in range(0,S,chunk):
+        batch=seqs[start:start+chunk]
+        windows=WindowRegistry(keep=False,batch=len(batch))
+        zeros=stats['zeros'][start:start+chunk]
+        for i,row in wallrows(batch,m,depth,windows):
+            if i>=2:
+                zeros+=(row[:,i-2:L-i+2]==0).sum(axis=1)
+        stats['windows'][start:start+chunk]=windows.windows
+        stats['largest'][start:start+chunk]=windows.widest
+        stats['deficiency'][start:start+chunk]=windows.deficiency
+    return stats
+
+def allsequences(L,m): #All m**L sequences of length L modulo m, one per row, in order
+    return np.arange(m**L,dtype=np.int64)[:,None]//m**np.arange(L-1,-1,-1,dtype=np.int64)%m
+
+
+def _window(W,i,n,L): #Top row t, left column a and width g of the window holding
+    #W[i-1][n], None when W[i+1][n] is inside it or the window runs off the trapesium
+    t=i-1 #Finds the top row of the window
+    while W[t-1][n]==0:
+        t-=1
+    a=n #Left and right ends of the window in its top row
+    while a>t-2 and W[t][a-1]==0:
+        a-=1
+    b=n
+    while b<L-t+1 and W[t][b+1]==0:
+        b+=1
+    g=b-a+1
+    if a==t-2 or b==L-t+1 or i+1<t+g:
+        return None
+    return t,a,g
+
+def framecell(W,i,n,L,m,inv): #Entry W[i+1][n] when W[i-1][n] lies in a window, from the
+    #frame theorems. Only entries up to the anti-diagonal of W[i+1][n] are read, so this
+    #also works while a wall is extended one term at a time. L is the sequence length.
+    window=_window(W,i,n,L)
+    if window is None:
+        return 0 #Inside the window, or the window runs off the edge of the trapesium
+    t,a,g=window
+    k=a+g-n #Inner frame entries are indexed from the top left (A,B) and bottom right (C,D)
+    Ak=int(W[t-1][a-1+k])
+    Bk=int(W[t-1+k][a-1])
+    Ck=int(W[t+g-k][a+g])
+    if W[i][n]==0:
+        Dk=Bk*Ck*int(inv[Ak])%m #Second frame constraint, D_k=(-1)^(gk)B_kC_k/A_k
+        return int((m-Dk)%m if (g*k)%2 else Dk)
+    #W[i][n] is on the inner frame below the window, W[i+1][n] on the outer frame
+    P=int(W[t-1][a])*int(inv[int(W[t-1][a-1])])%m
+    Q=int(W[t][a-1])*int(inv[int(W[t-1][a-1])])%m
+    #Ratios of C and D from the entries next to C_k and D_k, the corner is not known yet
+    Ck1=int(W[t+g-k+1][a+g])
+    Dk=int(W[i][n])
+    Dk1=int(W[i][n+1])
+    S=Dk*int(inv[Dk1])%m
+    Ek=int(W[t-2][a-1+k])
+    Fk=int(W[t-1+k][a-2])
+    Gk=int(W[t+g-k][a+g+1])
+    #Third frame constraint, QE_k/A_k+(-1)^k PF_k/B_k=RH_k/D_k+(-1)^k SG_k/C_k
+    rhs=P*Fk*int(inv[Bk])-S*Gk*int(inv[Ck])
+    if k%2:
+        rhs=-rhs
+    rhs=(Q*Ek*int(inv[Ak])+rhs)%m
+    return int(rhs*Dk%m*Ck1%m*int(inv[Ck])%m) #H_k=D_k/R*(...), R=C_k/C_(k-1)
+
+def intframecell(W,i,n,L): #framecell for a wall over the integers. The second frame
+    #constraint divides exactly, the third is evaluated in fractions.
+    window=_window(W,i,n,L)
+    if window is None:
+        return 0
+    t,a,g=window
+    k=a+g-n
+    Ak=int(W[t-1][a-1+k])
+    Bk=int(W[t-1+k][a-1])
+    Ck=int(W[t+g-k][a+g])
+    if W[i][n]==0:
+        Dk=Bk*Ck//Ak
+        return -Dk if (g*k)%2 else Dk
+    A0=int(W[t-1][a-1])
+    P=Fraction(int(W[t-1][a]),A0)
+    Q=Fraction(int(W[t][a-1]),A0)
+    Ck1=int(W[t+g-k+1][a+g])
+    Dk=int(W[i][n])
+    S=Fraction(Dk,int(W[i][n+1]))
+    rhs=P*int(W[t-1+k][a-2])/Bk-S*int(W[t+g-k][a+g+1])/Ck
+    if k%2:
+        rhs=-rhs
+    rhs+=Q*int(W[t-2][a-1+k])/Ak
+    return int(rhs*Dk*Ck1/Ck)
+
+def intwall(seq,depth=None): #Number wall of an integer sequence over the integers, as
+    #(W,valid) in numbwall_array with W an array of Python ints. Away from windows the
+    #first frame constraint divides exactly (Sylvester's identity, as in Bareiss
+    #elimination), so a row costs a few big integer operations per entry and no fractions.
+    seq=[int(v) for v in seq]
+    L=len(seq)
+    R=(L+1)//2 if depth is None else min(depth,(L+1)//2)
+    W=np.zeros((R+2,L),dtype=object)
+    valid=np.zeros((R+2,L),dtype=bool)
+    valid[:2]=True
+    W[1]=1
+    for i in range(2,R+2):
+        lo,hi=i-2,L-i+2
+        valid[i,lo:hi]=True
+        if i==2:
+            W[2]=seq
+            continue
+        up=W[i-1]
+        div=W[i-2,lo:hi]
+        zero=div==0
+        W[i,lo:hi]=(up[lo:hi]*up[lo:hi]-up[lo-1:hi-1]*up[lo+1:hi+1])//np.where(zero,1,div)
+        for n in np.flatnonzero(zero)+lo:
+            W[i,n]=intframecell(W,i-1,n,L)
+    return W,valid
+
+def crtwall(seq,depth=None,primes=None): #intwall from walls modulo several primes below
+    #FIXED_LIMIT, each computed in int64 by wallrows, combined by Chinese remaindering.
+    #Without primes enough are taken to cover Hadamard's bound on the entries. The
+    #walls modulo the primes are independent of each other and of intwall.
+    seq=[int(v) for v in seq]
+    L=len(seq)
+    R=(L+1)//2 if depth is None else min(depth,(L+1)//2)
+    if primes is None: #|det| of an r by r matrix with entries at most M is <= (M*sqrt(r))^r
+        bits=R*(math.log2(max(max(map(abs,seq),default=1),1))+math.log2(max(R,1))/2)+2
+        primes=largeprimes(int(bits//30)+1)
+    W=None
+    for p in primes: #Garner's form, W is the residue modulo the product M of the primes so far
+        Wp,valid=numbwall_array([v%p for v in seq],p,depth)
+        Wp=Wp.astype(np.int64)
+        if W is None:
+            W,M=Wp.astype(object),p
+            continue
+        t=(Wp-(W%p).astype(np.int64))%p*pow(M%p,p-2,p)%p
+        W=W+M*t.astype(object)
+        M*=p
+    W=np.where(W>M//2,W-M,W) #Symmetric residues
+    return W,valid
+
+def _checkentry(L,r,n): #ValueError unless row r>=0 has entries in the columns n of the
+    #wall of a sequence of length L, r-1<=n<=L-r as in numbwall
+    n=np.asarray(n)
+    if r<0 or n.size and (n.min()<max(r-1,0) or n.max()>min(L-r,L-1)):
+        raise ValueError(f"row {r} of the number wall of a sequence of length {L} has columns "
+                         f"{max(r-1,0)} to {min(L-r,L-1)}, not {n.tolist() if n.ndim==0 else 'all of n'}")
+
+def wallentry(seq,r,n,m): #Entry in row r and column n of the number wall of seq modulo
+    #the prime m, for n a column or an array of columns. It depends on seq[n-r+1:n+r]
+    #only, the top of the wall of that segment, so all columns are done in one batch of
+    #segments by wallrows in O(r^2) each, without the wall around them.
+    _checkentry(len(seq),r,n)
+    if r==0:
+        return np.ones(np.shape(n),dtype=np.int64)[()]
+    n=np.asarray(n,dtype=np.int64)
+    seq=residues(seq,m)
+    segments=seq[n[...,None]-r+1+np.arange(2*r-1)]
+    for i,row in wallrows(segments.reshape(-1,2*r-1),m,r):
+        pass
+    return row[:,r-1].reshape(n.shape)[()]
+
+def wallrow(seq,r,m): #Row r of the number wall of seq modulo the prime m (0 outside the
+    #trapesium), from wallrows keeping only the rows needed
+    for i,row in wallrows(seq,m,r):
+        if i==r+1:
+            return row
+    return np.zeros(len(seq),dtype=rowdtype(m))
+
+def toeplitzdet(seq,r,n,m): #Entry in row r and column n of the number wall of seq modulo
+    #the prime m as the determinant det[seq[n+i-j]] (0<=i,j<r), by Gaussian elimination.
+    #O(r^3) and independent of the frame theorems, the reference for checkwall.
+    _checkentry(len(seq),r,n)
+    if r==0:
+        return 1
+    T=residues(seq,m)[n+np.arange(r)[:,None]-np.arange(r)]
+    inv=modinverses(m)
+    d=1
+    for c in range(r):
+        nz=np.flatnonzero(T[c:,c]!=0)
+        if not nz.size:
+            return 0
+        if nz[0]:
+            T[[c,c+nz[0]]]=T[[c+nz[0],c]]
+            d=-d
+        d=d*int(T[c,c])%m
+        f=T[c+1:,c]*inv[T[c,c]]%m
+        T[c+1:,c:]=(T[c+1:,c:]-f[:,None]*T[c,c:])%m
+    return d%m
+
+def checkwall(seq,m,samples=100,depth=None,seed=None): #Compares random entries of
+    #numbwall_array(seq,m,depth) with toeplitzdet. Returns the mismatches as tuples
+    #(row,column,wall entry,determinant), empty if all agree. An entry in row r costs
+    #O(r^3), so for long sequences depth keeps the samples near the top.
+    W,valid=numbwall_array(seq,m,depth)
+    cells=np.argwhere(valid[2:])
+    rng=np.random.default_rng(seed)
+    bad=[]
+    for i,n in cells[rng.choice(len(cells),min(samples,len(cells)),replace=False)]:
+        det=toeplitzdet(seq,i+1,n,m)
+        if W[i+2,n]!=det:
+            bad.append((int(i+1),int(n),int(W[i+2,n]),det))
+    return bad
+
+def memowall(seq,m,depth,tile=256,cache=None): #numbwall_array(seq,m,depth) by blocks of tile
+    #columns. Down to depth rows a block depends only on the depth-1 terms either side of
+    #it, so blocks are keyed by that segment of seq and each distinct segment is computed
+    #once, in batches by wallrows. For automatic and Sturmian sequences the segments at
+    #block starts (multiples of tile) take few values, so the work no longer grows with
+    #the length of seq. cache, a dict, keeps the blocks between calls. The columns
+    #near either end, without a full segment, are computed directly.
+    seq=residues(seq,m)
+    L=len(seq)
+    R=min(depth,(L+1)//2)
+    span=tile+2*R-2
+    first=-(-(R-1)//tile)*tile #Block starts are multiples of tile with R-1 terms before
+    starts=np.arange(first,L-R+2-tile,tile) #and after them
+    if not starts.size:
+        return numbwall_array(seq,m,R)
+    if cache is None:
+        cache={}
+    dtype=walldtype(m)
+    segments=seq[starts[:,None]-R+1+np.arange(span)]
+    if dtype is not object:
+        segments=segments.astype(dtype)
+        keys=[(m,R,tile,segment.tobytes()) for segment in segments]
+    else:
+        keys=[(m,R,tile,tuple(segment)) for segment in segments]
+    missing={}
+    for j,key in enumerate(keys):
+        if key not in cache:
+            missing.setdefault(key,j)
+    missing=list(missing.items())
+    chunk=max(1,(1<<24)//(span*(R+2)))
+    for c in range(0,len(missing),chunk):
+        batch=missing[c:c+chunk]
+        blocks=np.zeros((R+2,len(batch),tile),dtype=dtype)
+        for i,row in wallrows(segments[[j for key,j in batch]],m,R):
+            blocks[i]=row[:,R-1:R-1+tile]
+        for b,(key,j) in enumerate(batch):
+            cache[key]=blocks[:,b].copy()
+    W=np.zeros((R+2,L),dtype=dtype)
+    for x,key in zip(starts.tolist(),keys):
+        W[:,x:x+tile]=cache[key]
+    end=int(starts[-1])+tile
+    if first:
+        left,_=numbwall_array(seq[:first+R-1],m,R)
+        W[:len(left),:first]=left[:,:first]
+    if end<L:
+        right,_=numbwall_array(seq[end-R+1:],m,R)
+        W[:len(right),end:]=right[:,R-1:]
+    valid=np.zeros((R+2,L),dtype=bool)
+    valid[:2]=True
+    for i in range(2,R+2):
+        valid[i,i-2:L-i+2]=True
+    return W,valid
+
+
+class NumberWall: #Number wall of a sequence modulo the prime m that grows one term at a time.
+    #Appending a term only computes the new anti-diagonal of entries and truncate() drops
+    #the latest terms again, so a search over extensions shares the work on every prefix.
+    #rows[i][n] is the entry in row i-1 and column n, as W in numbwall_array.
+
+    def __init__(self,m,seq=()):
+        self.m=m
+        inv=modinverses(m)
+        self.inv=inv.tolist() if isinstance(inv,np.ndarray) else inv
+        self.rows=[[],[]] #Rows -1 and 0, the rows below are added as the sequence grows
+        self.zeros=[[],[]] #Length of the run of zeros ending at each entry
+        for term in seq:
+            self.extend(term)
+
+    def __len__(self):
+        return len(self.rows[0])
+
+    def extend(self,term): #Appends a term. Returns the longest run of zeros ending on the
+        #new anti-diagonal, the width so far of the widest window it reaches.
+        m,inv,rows,zeros=self.m,self.inv,self.rows,self.zeros
+        N=len(self)+1
+        rows[0].append(0)
+        rows[1].append(1)
+        longest=0
+        i,n=2,N-1 #Row i-1 gets the entry in column N-i+1
+        while n>=i-2:
+            if i==len(rows):
+                rows.append([0]*(i-2))
+                zeros.append([0]*(i-2))
+            if i==2:
+                v=term%m
+            elif rows[i-2][n]:
+                up=rows[i-1] #First frame constraint
+                v=(up[n]*up[n]-up[n-1]*up[n+1])*inv[rows[i-2][n]]%m
+            else:
+                v=framecell(rows,i-1,n,N,m,inv)
+            rows[i].append(v)
+            if v==0:
+                z=zeros[i][n-1]+1 if n>i-2 else 1
+                if z>longest:
+                    longest=z
+            else:
+                z=0
+            zeros[i].append(z)
+            i+=1
+            n-=1
+        return longest
+
+    def truncate(self,length): #Drops the terms after the first length
+        rows,zeros=self.rows,self.zeros
+        del rows[0][length:]
+        del rows[1][length:]
+        for i in range(2,len(rows)):
+            if length-i+2<=i-2: #Row i-1 has no entries left, nor the rows below
+                del rows[i:]
+                del zeros[i:]
+                break
+            del rows[i][length-i+2:]
+            del zeros[i][length-i+2:]
+
+    def fork(self): #Independent copy
+        other=NumberWall.__new__(NumberWall)
+        other.m,other.inv=self.m,self.inv
+        other.rows=[row[:] for row in self.rows]
+        other.zeros=[row[:] for row in self.zeros]
+        return other
+
+    def sequence(self):
+        return self.rows[2][:] if len(self.rows)>2 else []
+
+    def array(self): #(W,valid) as returned by numbwall_array
+        L=len(self)
+        W=np.zeros(((L+1)//2+2,L),dtype=walldtype(self.m))
+        valid=np.zeros(W.shape,dtype=bool)
+        for i,row in enumerate(self.rows):
+            W[i,:len(row)]=row
+            valid[i,max(i-2,0):len(row)]=True
+        return W,valid
+
+
+PALETTE=('red','#222021','#363636','#544C4A','#787276') #Colours of 0,1,2,... the last one
+#is used for all larger values
+OUTSIDE='white' #Outside the trapesium
+
+def palettelut(palette=PALETTE,outside=OUTSIDE): #RGBA of each palette index, 255 is outside
+    lut=np.zeros((256,4),dtype=np.uint8)
+    lut[:len(palette)]=[ImageColor.getcolor(c,'RGBA') for c in palette]
+    lut[255]=ImageColor.getcolor(outside,'RGBA')
+    return lut
+
+def paletteindex(row,valid,palette=PALETTE): #Palette indices of wall entries, 255 outside
+    return np.where(valid,np.minimum(row,len(palette)-1),255).astype(np.uint8)
+
+def wallimage(W,valid,palette=PALETTE,outside=OUTSIDE,cell=1,grid=None): #RGBA image of a wall
+    #from numbwall_array, each entry a cell x cell square. With grid set the top and left
+    #edge of every square inside the trapesium are drawn in that colour.
+    rgba=palettelut(palette,outside)[paletteindex(W,valid,palette)] #One lookup for the whole wall
+    if cell>1:
+        rgba=np.repeat(np.repeat(rgba,cell,axis=0),cell,axis=1)
+        if grid is not None:
+            inside=np.repeat(np.repeat(valid,cell,axis=0),cell,axis=1)
+            lines=np.zeros(inside.shape,dtype=bool)
+            lines[::cell,:]=True
+            lines[:,::cell]=True
+            rgba[lines&inside]=ImageColor.getcolor(grid,'RGBA')
+    return Image.fromarray(rgba,'RGBA')
+
+class TileWriter: #Writes the rows of a wall, as palette indices, to PNG tiles
+    #out/<level>/<y>/<x>.png of tile=(height,width) pixels (width None for whole rows).
+    #Level 0 has one pixel per entry, each further level halves both directions, a pixel
+    #taking the smallest index of the four below it so zeros (windows) stay visible.
+    #Only one row of tiles per level is held in memory.
+
+    def __init__(self,out,width,tile=256,levels=1,palette=PALETTE,outside=OUTSIDE):
+        self.out=out
+        self.tile=(tile,tile) if isinstance(tile,int) else tuple(tile)
+        lut=palettelut(palette,outside)
+        self.palette=lut[:,:3].ravel().tolist()
+        self.alpha=bytes(lut[:,3].tolist()) if (lut[:len(palette),3]<255).any() or lut[255,3]<255 else None
+        self.widths=[width]
+        for level in range(1,levels):
+            self.widths.append((self.widths[-1]+1)//2)
+        self.strips=[[] for w in self.widths] #Rows waiting for a row of tiles
+        self.pairs=[None for w in self.widths] #Row waiting for the next one to be halved
+        self.y=[0 for w in self.widths]
+        self.tiles=0
+
+    def add(self,index,level=0): #Appends a row of palette indices to a level
+        self.strips[level].append(index)
+        if len(self.strips[level])==self.tile[0]:
+            self._flush(level)
+        if level+1<len(self.widths):
+            if self.pairs[level] is None:
+                self.pairs[level]=index
             else:
-                im.putpixel((j,i), ImageColor.getcolor('#787276', 'RGBA'))
-                    
-    #im.show()
-    x='numberwallout'
-    im.save(x+'.png',interlace=False) # or any image format
+                self.add(self._halve(self.pairs[level],index),level+1)
+                self.pairs[level]=None
+
+    def close(self): #Writes the last, shorter rows of tiles
+        for level in range(len(self.widths)):
+            if self.pairs[level] is not None and level+1<len(self.widths):
+                self.add(self._halve(self.pairs[level],self.pairs[level]),level+1)
+                self.pairs[level]=None
+            if self.strips[level]:
+                self._flush(level)
+
+    def _halve(self,a,b):
+        rows=np.minimum(a,b)
+        if len(rows)%2:
+            rows=np.append(rows,np.uint8(255))
+        return rows.reshape(-1,2).min(axis=1)
+
+    def _flush(self,level):
+        strip=np.array(self.strips[level])
+        self.strips[level]=[]
+        width=self.tile[1] or strip.shape[1]
+        folder=os.path.join(self.out,str(level),str(self.y[level]))
+        os.makedirs(folder,exist_ok=True)
+        for x in range(0,strip.shape[1],width):
+            #Palette PNGs: one byte per pixel, and fast compression for many tiles
+            im=Image.fromarray(np.ascontiguousarray(strip[:,x:x+width]),'P')
+            im.putpalette(self.palette)
+            if self.alpha is not None:
+                im.info['transparency']=self.alpha
+            im.save(os.path.join(folder,'%d.png'%(x//width)),compress_level=1)
+            self.tiles+=1
+        self.y[level]+=1
+
+def wallstream(seq,m,out,depth=None,tile=256,levels=1,palette=PALETTE,outside=OUTSIDE):
+    #Computes the wall of seq modulo the prime m row by row and writes it to out as tiles
+    #(see TileWriter) and out/wall.json, never holding more than a row of tiles per level.
+    #Returns the WindowRegistry totals.
+    L=len(seq)
+    writer=TileWriter(out,L,tile,levels,palette,outside)
+    windows=WindowRegistry(keep=False)
+    rows=0
+    for i,row in wallrows(seq,m,depth,windows):
+        valid=np.zeros(L,dtype=bool)
+        valid[(0 if i<2 else i-2):(L if i<2 else L-i+2)]=True
+        writer.add(paletteindex(row,valid,palette))
+        rows+=1
+    writer.close()
+    info={'length':L,'modulus':m,'rows':rows,'tile':list(writer.tile),'levels':len(writer.widths),
+          'widths':writer.widths,'windows':windows.total,'largest':windows.largest}
+    with open(os.path.join(out,'wall.json'),'w') as f:
+        json.dump(info,f,indent=1)
+    return info
+
+def _bordered(seq,m): #numbwall_array with a column outside the trapesium on either side
+    W,valid=numbwall_array(seq,m)
+    return np.pad(W,((0,0),(1,1))),np.pad(valid,((0,0),(1,1)))
+
+def PrintNW(seq,m,palette=PALETTE,cell=1,filename='numberwallout'):#Creates an image of the
+    #number wall generated by a given sequence modulo m.
+    W,valid=_bordered(seq,m)
+    im=wallimage(W,valid,palette,cell=cell)
+    im.save(filename+'.png',interlace=False) # or any image format
     return im
-    
-
-def PrintSpacedNW(seq,m):#Creates image of number wall with spaces between entries
-    data=numbwall(seq,m)
-    #print(data)
-    for i in range(len(data)):
-        for j in range(len(data[i])):
-            if data[i][j]==' ':
-                data[i][j]=-1
-    im = Image.new('RGBA', (10*len(data[0]),10*len(data))) # create the Image of size 1 pixel 
-    #print(data)
-    for i in range(len(data)):
-        for j in range(len(data[i])):    
-            #print(i,j)
-            if data[i][j]==-1:
-                for k in range(10):
-                    for l in range(10):
-                        im.putpixel((10*j+k,10*i+l), ImageColor.getcolor('white', 'RGBA'))
-            if data[i][j]==0:
-                for k in range(10):
-                    for l in range(10):
-                        if k==0 or l==0:
-                            im.putpixel((10*j+k,10*i+l), ImageColor.getcolor('white', 'RGBA'))
-                        else:
-                            im.putpixel((10*j+k,10*i+l), ImageColor.getcolor('red', 'RGBA'))
-                        
-            if data[i][j]==1:
-                for k in range(10):
-                    for l in range(10):
-                        if k==0 or l==0:
-                            im.putpixel((10*j+k,10*i+l), ImageColor.getcolor('white', 'RGBA'))
-                        else:
-                            im.putpixel((10*j+k,10*i+l), ImageColor.getcolor('#222021', 'RGBA'))
-            if data[i][j]==2:
-                for k in range(10):
-                    for l in range(10):
-                        if k==0 or l==0:
-                            im.putpixel((10*j+k,10*i+l), ImageColor.getcolor('white', 'RGBA'))
-                        else:
-                            im.putpixel((10*j+k,10*i+l), ImageColor.getcolor('#363636', 'RGBA'))
-            if data[i][j]==3:
-                for k in range(10):
-                    for l in range(10):
-                        if k==0 or l==0:
-                            im.putpixel((10*j+k,10*i+l), ImageColor.getcolor('white', 'RGBA'))
-                        else:
-                            im.putpixel((10*j+k,10*i+l), ImageColor.getcolor('#544C4A', 'RGBA'))
-            if data[i][j]==4:
-                for k in range(10):
-                    for l in range(10):
-                        if k==0 or l==0:
-                            im.putpixel((10*j+k,10*i+l), ImageColor.getcolor('white', 'RGBA'))
-                        else:
-                            im.putpixel((10*j+k,10*i+l), ImageColor.getcolor('#787276', 'RGBA'))
-    im.show()
-    x='Thue Morse'
-    im.save(x+'.png',interlace=False) # or any image format
+
+def PrintSpacedNW(seq,m,palette=PALETTE,cell=10,filename='Thue Morse',show=True):#Creates image
+    #of number wall with spaces between entries
+    W,valid=_bordered(seq,m)
+    im=wallimage(W,valid,palette,cell=cell,grid=OUTSIDE)
+    if show:
+        im.show()
+    im.save(filename+'.png',interlace=False) # or any image format
     return im
 
-def deftwoIterate(start,size,m): #finds all possible sequences of length L,
-# and counts how many have a window of size exactly L with top left corner ulpos
-    #produces every possible sequence of length
-    #L made of digits 0,1,2. Must be changed manually to work over F_5 or F_7.
-    #Would need new code for F_p p double digit prime.
-    ans=0
-    ans3=[]
-    c=0
-    L=len(start[0])+2
+def _survivors(start,size,m): #Extensions by one symbol of the sequences in start (all of
+    #the same length) without windows wider than size
+    ans=[]
     for i in start:
-        C=0
+        wall=NumberWall(m,i) #Built once per prefix, each symbol only adds a diagonal
         for p in range(m):
-            #print(i,p)
-            c+=1
-            if c%1000000==0:
-                print(100*(c/(len(start)*m)),'%')
-            ans2=[]
-            for q in i:
-                ans2.append(q)
-            ans2.append(p)
-            d=0
-            nw = numbwall(ans2,m)
-            for j in range(2,1+int(np.ceil(L/2))):
-                e=0
-                for k in range(size+1):
-                    #print(nw[2],nw[j][L-j+1-k])
-                    if nw[j][L-j+1-k]==0:
-                        e+=1
-                    if e==size+1:
-                        d+=1
-                        break
-            if d==0:
-                C+=1
-                ans3.append(ans2)
-                ans+=1
-    print('L=',L-1,'number of sequences=', m**L,'number of squences of deficiency',ans)
-    #print(ans3)
+            if wall.extend(p)<=size:
+                ans.append(i+[p])
+            wall.truncate(len(i))
+    return ans
+
+def deftwoIterate(start,size,m): #Extends every sequence in start by each symbol modulo the
+    #prime m and returns the extensions whose number wall has no window wider than size,
+    #i.e. no row with more than size consecutive zeros (see extensions).
+    ans3=_survivors(start,size,m)
+    L=len(start[0])+1 #Length of the extended sequences
+    print('L=',L,'number of sequences=', m**L,'number of squences of deficiency',len(ans3))
     return(ans3)
 
-def defn(size,m):#Count how many sequences modulo m have windows of size 'size'
-    start=[[]]
-    while len(start)>0:
-        start=deftwoIterate(start,size,m)
+def extensions(wall,size,maxlen=None,counts=None,keep=None): #Depth-first search over the
+    #extensions of the sequence in wall whose number wall has no window wider than size,
+    #up to length maxlen. A window is judged by the zero runs of its rows as far as the
+    #wall of the prefix shows them: no row, the sequence itself included, may have more
+    #than size consecutive zeros. Size 0 thus means no zeros at all, size 1 no two
+    #adjacent zeros in a row. counts[L] is increased for each one of length L and keep(seq) is
+    #called on it. Only the one wall is used: extended, and truncated when backtracking.
+    if counts is None:
+        counts=[0]*(len(wall)+1)
+    base=len(wall)
+    nxt=[0] #Next symbol to try after each prefix of the current sequence
+    while nxt:
+        d=base+len(nxt)-1
+        if nxt[-1]==wall.m or d==maxlen:
+            nxt.pop()
+            if nxt:
+                wall.truncate(d-1)
+            continue
+        p=nxt[-1]
+        nxt[-1]+=1
+        if wall.extend(p)>size:
+            wall.truncate(d) #Prune: every extension has the window as well
+            continue
+        while len(counts)<=d+1:
+            counts.append(0)
+        counts[d+1]+=1
+        if keep is not None:
+            keep(wall.rows[2])
+        nxt.append(0)
+    return counts
+
+def defn(size,m,maxlen=None):#Count how many sequences modulo m have no windows wider than
+    #'size', for each length up to maxlen (or until there are none). Returns the counts,
+    #index = length. Windows are bounded by zero runs, see extensions: no row of the wall
+    #has more than size consecutive zeros. For size 1 modulo 3 the counts start
+    #[1,3,8,22,56,144,332,784], as a brute-force count with toeplitzdet gives.
+    counts=extensions(NumberWall(m),size,maxlen,[1])
+    if maxlen is None or len(counts)<=maxlen:
+        counts.append(0) #First length without any such sequence
+    for L in range(1,len(counts)):
+        print('L=',L,'number of sequences=', m**L,'number of squences of deficiency',counts[L])
+    return counts
+
+class SurvivorWriter: #Appends sequences modulo m to out/len<L>.bin, one file per length L.
+    #Each sequence takes ceil(L*b/8) bytes, b=(m-1).bit_length() bits per symbol, most
+    #significant first. Sequences are buffered per length and written in blocks.
+
+    def __init__(self,out,m,suffix='',buffer=4096):
+        self.out=out
+        self.m=m
+        self.suffix=suffix
+        self.buffer=buffer
+        self.pending={}
+        os.makedirs(out,exist_ok=True)
+
+    def write(self,seq):
+        rows=self.pending.setdefault(len(seq),[])
+        rows.append(list(seq))
+        if len(rows)>=self.buffer:
+            self.flush(len(seq))
+
+    def flush(self,L=None):
+        for n in ([L] if L is not None else list(self.pending)):
+            rows=self.pending.pop(n,[])
+            if rows:
+                with open(survivorpath(self.out,n)+self.suffix,'ab') as f:
+                    packsequences(np.array(rows,dtype=np.uint64).reshape(len(rows),n),self.m).tofile(f)
+
+    close=flush
+
+def survivorpath(out,L):
+    return os.path.join(out,'len%d.bin'%L)
+
+SURVIVORFILE=re.compile(r'len\d+\.bin(\.part\d+)?') #Names written by SurvivorWriter, parts by workers
+
+def packsequences(seqs,m): #Rows of seqs packed as written by SurvivorWriter
+    b=max(1,(m-1).bit_length())
+    shifts=np.arange(b-1,-1,-1,dtype=np.uint64)
+    bits=((seqs[:,:,None]>>shifts)&1).astype(np.uint8)
+    return np.packbits(bits.reshape(len(seqs),-1),axis=1)
+
+def read_survivors(out,L,m): #Sequences of length L stored by defsearch, one per row
+    b=max(1,(m-1).bit_length())
+    path=survivorpath(out,L)
+    if not os.path.exists(path):
+        return np.zeros((0,L),dtype=np.int64)
+    data=np.fromfile(path,dtype=np.uint8).reshape(-1,(L*b+7)//8)
+    bits=np.unpackbits(data,axis=1)[:,:L*b].reshape(len(data),L,b).astype(np.int64)
+    return (bits<<np.arange(b-1,-1,-1)).sum(axis=2)
+
+def _defsearch_task(args): #One subtree of defsearch, run in a worker process
+    prefix,size,m,maxlen,out=args
+    counts=[0]*(len(prefix)+1)
+    writer=SurvivorWriter(out,m,'.part%d'%os.getpid()) if out else None
+    extensions(NumberWall(m,prefix),size,maxlen,counts,writer.write if writer else None)
+    if writer:
+        writer.close()
+    return counts
+
+def defsearch(size,m,maxlen=None,processes=None,out=None,split=None): #defn on a pool of
+    #processes. The prefix tree is expanded breadth-first until there are enough prefixes
+    #(or to depth split), and the subtree below each one is a task. Idle workers take the
+    #next task, so the uneven subtrees balance out. Survivors of every length are stored
+    #in out (see SurvivorWriter, read back with read_survivors). Returns the counts.
+    processes=processes or os.cpu_count() or 1
+    writer=None
+    if out:
+        writer=SurvivorWriter(out,m)
+        for name in os.listdir(out): #Survivors of an earlier search, other files are left alone
+            if SURVIVORFILE.fullmatch(name):
+                os.remove(os.path.join(out,name))
+    counts=[1]
+    level=[[]]
+    while level and len(level[0])!=maxlen and (len(level)<16*processes if split is None else len(level[0])<split):
+        level=_survivors(level,size,m)
+        counts.append(len(level))
+        if writer:
+            for seq in level:
+                writer.write(seq)
+    if writer:
+        writer.close()
+    tasks=[] if not level or len(level[0])==maxlen else [(seq,size,m,maxlen,out) for seq in level]
+    if processes>1 and len(tasks)>1:
+        with multiprocessing.Pool(processes) as pool:
+            results=list(pool.imap_unordered(_defsearch_task,tasks,chunksize=1))
+    else:
+        results=[_defsearch_task(task) for task in tasks]
+    for task in results:
+        for L in range(len(counts),len(task)):
+            counts.append(0)
+        for L in range(len(level[0])+1,len(task)):
+            counts[L]+=task[L]
+    if out: #Gather the parts written by the workers
+        for name in sorted(os.listdir(out)):
+            match=SURVIVORFILE.fullmatch(name)
+            if match and match.group(1):
+                part=os.path.join(out,name)
+                with open(os.path.join(out,name.split('.part')[0]),'ab') as f, open(part,'rb') as g:
+                    f.write(g.read())
+                os.remove(part)
+    if counts[-1] and (maxlen is None or len(counts)<=maxlen):
+        counts.append(0)
+    for L in range(1,len(counts)):
+        print('L=',L,'number of sequences=', m**L,'number of squences of deficiency',counts[L])
+    return counts
 
 def calculate_nth(n):
   return bin(n).count("1") % 2
 
-seq = [calculate_nth(x) for x in range(0,300)]
-#print(seq)
+if __name__ == '__main__':
+    seq = [calculate_nth(x) for x in range(0,300)]
+    #print(seq)
 
 
-#out = numbwall([1,2,3,4,5],2)
-#print(out)
-#seq = [1,2,3,4,5]
-m = 2
-PrintNW(seq,m)
+    #out = numbwall([1,2,3,4,5],2)
+    #print(out)
+    #seq = [1,2,3,4,5]
+    m = 2
+    PrintNW(seq,m)
 
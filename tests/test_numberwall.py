@@ -0,0 +1,356 @@
+import itertools
+import json
+from fractions import Fraction
+
+import numpy as np
+from PIL import Image, ImageColor
+
+import numberwall as nw
+
+
+def test_empty_sequence():
+    assert nw.numbwall([],3)==[[' ',' '],[' ',' ']]
+    W,valid=nw.numbwall_array([],3)
+    assert W.shape==valid.shape==(2,0)
+    assert [row.shape for i,row in nw.wallrows([],3)]==[(0,),(0,)]
+
+
+def test_empty_batch():
+    rows=list(nw.wallrows(np.zeros((0,5),dtype=np.int64),3))
+    assert [i for i,row in rows]==[0,1,2,3,4]
+    assert all(row.shape==(0,5) for i,row in rows)
+
+
+def test_entries_at_the_edges():
+    seq=[1,0,2,2,1,0,1,1,2]
+    L=len(seq)
+    W,valid=nw.numbwall_array(seq,3)
+    for r in range(0,(L+1)//2+1):
+        ends=[max(r-1,0),min(L-r,L-1)]
+        assert nw.wallentry(seq,r,ends[0],3)==W[r+1,ends[0]]
+        assert (nw.wallentry(seq,r,np.array(ends),3)==W[r+1,ends]).all()
+        assert [nw.toeplitzdet(seq,r,n,3) for n in ends]==list(W[r+1,ends])
+
+
+def test_entries_outside_the_wall():
+    seq=[1,0,2,2,1,0,1,1,2]
+    L=len(seq)
+    for r,n in ((-1,3),(2,0),(2,L-1),(3,-1),(0,L),(6,4)):
+        for f in (nw.wallentry,nw.toeplitzdet):
+            try:
+                f(seq,r,n,3)
+            except ValueError:
+                continue
+            raise AssertionError((f.__name__,r,n))
+    try:
+        nw.wallentry(seq,2,np.array([1,4,8]),3)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("column 8 of row 2")
+
+
+def test_defsearch_replaces_only_its_own_files(tmp_path):
+    out=str(tmp_path)
+    for name in ('len2.bin','len3.bin.part7','len2.bin.bak','lenient.bin','notes.txt'):
+        (tmp_path/name).write_bytes(b'\xff')
+    counts=nw.defsearch(2,2,maxlen=4,processes=1,out=out)
+    assert len(nw.read_survivors(out,2,2))==counts[2]
+    assert not (tmp_path/'len3.bin.part7').exists()
+    for name in ('len2.bin.bak','lenient.bin','notes.txt'):
+        assert (tmp_path/name).read_bytes()==b'\xff'
+
+
+def widest_zero_run(seq,m): #Brute force with the Toeplitz determinants
+    L=len(seq)
+    widest=0
+    for r in range((L+1)//2+1):
+        run=0
+        for n in range(max(r-1,0),min(L-r,L-1)+1):
+            run=run+1 if nw.toeplitzdet(seq,r,n,m)==0 else 0
+            widest=max(widest,run)
+    return widest
+
+
+def test_defn_counts_bound_the_zero_runs():
+    assert nw.defn(1,3,7)==[1,3,8,22,56,144,332,784]
+    for size,m,maxlen in ((0,2,6),(1,2,8),(2,3,5)):
+        counts=[sum(widest_zero_run(list(seq),m)<=size for seq in itertools.product(range(m),repeat=L))
+                for L in range(maxlen+1)]
+        got=nw.defn(size,m,maxlen) #Stops at the first length without survivors
+        assert got+[0]*(maxlen+1-len(got))==counts
+
+
+def test_defsearch_matches_serial_enumeration(tmp_path):
+    size,m,maxlen=1,3,7
+    expected=nw.defn(size,m,maxlen)
+    level=[[]]
+    survivors={}
+    for L in range(1,maxlen+1):
+        level=nw._survivors(level,size,m)
+        survivors[L]=sorted(map(tuple,level))
+    for processes,split in ((1,None),(3,2),(4,None)):
+        out=str(tmp_path/str(processes))
+        assert nw.defsearch(size,m,maxlen,processes=processes,out=out,split=split)==expected
+        for L in range(1,maxlen+1):
+            assert sorted(map(tuple,nw.read_survivors(out,L,m).tolist()))==survivors[L]
+
+
+def toeplitzwall(seq,m,depth=None): #(W,valid) as in numbwall_array, every entry from toeplitzdet
+    L=len(seq)
+    R=(L+1)//2 if depth is None else min(depth,(L+1)//2)
+    W=np.zeros((R+2,L),dtype=object)
+    valid=np.zeros((R+2,L),dtype=bool)
+    valid[:2]=True
+    W[1]=1
+    for r in range(1,R+1):
+        for n in range(max(r-1,0),min(L-r,L-1)+1):
+            W[r+1,n]=nw.toeplitzdet(seq,r,n,m)
+            valid[r+1,n]=True
+    return W,valid
+
+
+def thuemorse(L):
+    return [bin(n).count('1')%2 for n in range(L)]
+
+
+def test_inverse_tables():
+    for m in (2,3,7,9,12,101):
+        inv=nw.inverse_table(m)
+        assert inv is nw.inverse_table(m) #Built once
+        for x in range(m):
+            assert inv[x]==(pow(x,-1,m) if np.gcd(x,m)==1 else 0)
+    for m in (2**31-1,2**61-1):
+        inv=nw.modinverses(m)
+        assert isinstance(inv,nw.PowerInverse)
+        x=np.array([0,1,2,12345,m-1],dtype=nw.rowdtype(m))
+        expected=[0]+[pow(int(v),-1,m) for v in x[1:]]
+        assert list(inv[x])==expected and [inv[v] for v in x]==expected
+        assert nw.modminv(12345,m)==pow(12345,-1,m)
+
+
+def test_array_wall_matches_toeplitz_determinants():
+    rng=np.random.default_rng(1)
+    cases=[(thuemorse(24),2),(thuemorse(19),3),([1,2,0,0,0,3,1,1,2,0,0,4,1],5),
+           ([1,1,2,3,5,8,13,21,34,55],7),([1,0,0,0,0,1,2],3)]
+    cases+=[(rng.integers(0,m,L).tolist(),m) for m,L in ((2,21),(3,16),(5,14))]
+    cases+=[([1,2,0,0,0,3,4,5,0,0,6,7,1],m) for m in (2**31-1,2**61-1)] #PowerInverse, int64 and Python ints
+    for seq,m in cases:
+        W,valid=nw.numbwall_array(seq,m)
+        expected,ok=toeplitzwall(seq,m)
+        assert (valid==ok).all()
+        assert W[valid].tolist()==expected[ok].tolist(),(seq,m)
+        assert not W[~valid].any()
+        assert nw.checkwall(seq,m,samples=10,seed=0)==[]
+
+
+def test_nested_list_wall():
+    seq=[1,0,0,2,1,0,1,1,2]
+    wall=nw.numbwall(seq,3)
+    W,valid=toeplitzwall(seq,3)
+    assert len(wall)==len(W) and all(len(row)==len(seq)+2 for row in wall)
+    for row,expected,ok in zip(wall,W.tolist(),valid.tolist()):
+        assert row==[' ']+[v if o else ' ' for v,o in zip(expected,ok)]+[' ']
+
+
+def test_batch_rows_match_single_walls():
+    seqs=nw.allsequences(8,2)
+    walls=[nw.numbwall_array(seq,2,depth=3)[0] for seq in seqs]
+    for i,rows in nw.wallrows(seqs,2,depth=3):
+        assert rows.tolist()==[W[i].tolist() for W in walls]
+    #Every sequence of length 8 modulo 2, windows of all widths included
+    for seq,W in zip(seqs,walls):
+        expected,ok=toeplitzwall(seq,2,depth=3)
+        assert W[ok[:len(W)]].tolist()==expected[ok].tolist()
+
+
+def colour(W,valid,i,n,palette=nw.PALETTE,outside=nw.OUTSIDE): #Colour of one entry, cell by cell
+    if not valid[i,n]:
+        return ImageColor.getcolor(outside,'RGBA')
+    return ImageColor.getcolor(palette[min(W[i,n],len(palette)-1)],'RGBA')
+
+
+def test_wall_image_colours_every_entry():
+    seq=[1,2,0,0,0,3,4,6,0,0,5,1,2,3]
+    W,valid=toeplitzwall(seq,7) #Values past the end of the palette take its last colour
+    pixels=np.asarray(nw.wallimage(*nw.numbwall_array(seq,7)))
+    assert pixels.shape==W.shape+(4,)
+    for i,n in itertools.product(*map(range,W.shape)):
+        assert tuple(pixels[i,n])==colour(W,valid,i,n)
+
+    palette=('#00000000','blue','#ff000080')
+    pixels=np.asarray(nw.wallimage(*nw.numbwall_array(seq,7),palette=palette,outside='yellow'))
+    for i,n in itertools.product(*map(range,W.shape)):
+        assert tuple(pixels[i,n])==colour(W,valid,i,n,palette,'yellow')
+
+
+def test_wall_image_cells_and_grid():
+    seq=thuemorse(9)
+    W,valid=toeplitzwall(seq,2)
+    cell=4
+    plain=np.asarray(nw.wallimage(*nw.numbwall_array(seq,2),cell=cell))
+    grid=np.asarray(nw.wallimage(*nw.numbwall_array(seq,2),cell=cell,grid='green'))
+    assert plain.shape==grid.shape==(W.shape[0]*cell,W.shape[1]*cell,4)
+    green=ImageColor.getcolor('green','RGBA')
+    for i,n in itertools.product(*map(range,W.shape)):
+        square=plain[i*cell:(i+1)*cell,n*cell:(n+1)*cell]
+        assert (square==colour(W,valid,i,n)).all()
+        square=grid[i*cell:(i+1)*cell,n*cell:(n+1)*cell]
+        edges=(square[0]==green).all() and (square[:,0]==green).all()
+        assert edges==bool(valid[i,n])
+        assert (square[1:,1:]==colour(W,valid,i,n)).all()
+
+
+def test_printed_walls_have_a_border(tmp_path):
+    seq=[1,0,2,2,1,0,1,1,2]
+    W,valid=toeplitzwall(seq,3)
+    im=nw.PrintNW(seq,3,filename=str(tmp_path/'wall'))
+    assert Image.open(tmp_path/'wall.png').size==im.size==(len(seq)+2,len(W))
+    pixels=np.asarray(im)
+    white=ImageColor.getcolor(nw.OUTSIDE,'RGBA')
+    assert (pixels[:,0]==white).all() and (pixels[:,-1]==white).all()
+    for i,n in itertools.product(*map(range,W.shape)):
+        assert tuple(pixels[i,n+1])==colour(W,valid,i,n)
+    im=nw.PrintSpacedNW(seq,3,filename=str(tmp_path/'spaced'),show=False)
+    assert im.size==(10*(len(seq)+2),10*len(W))
+
+
+def readlevel(out,level,info): #Tiles of a level of the pyramid, checked for size, put together
+    th,tw=info['tile']
+    width=info['widths'][level]
+    tw=tw or width
+    folder=out/str(level)
+    ys=sorted(int(p.name) for p in folder.iterdir())
+    assert ys==list(range(len(ys)))
+    rows=[]
+    for y in ys:
+        xs=sorted(int(p.stem) for p in (folder/str(y)).iterdir())
+        assert xs==list(range(-(-width//tw)))
+        tiles=[Image.open(folder/str(y)/('%d.png'%x)) for x in xs]
+        assert all(im.mode=='P' for im in tiles)
+        strip=np.hstack([np.asarray(im) for im in tiles])
+        assert [im.size for im in tiles]==[(min(tw,width-x*tw),len(strip)) for x in xs]
+        assert len(strip)==th or y==ys[-1]
+        rows.append(strip)
+    return np.vstack(rows)
+
+
+def halve(level): #Each pixel the smallest of the four below it, 255 past the right edge
+    H,Wd=level.shape
+    padded=np.full((H+H%2,Wd+Wd%2),255,dtype=np.uint8)
+    padded[:H,:Wd]=level
+    if H%2:
+        padded[H]=level[-1]
+    return padded.reshape((H+H%2)//2,2,(Wd+Wd%2)//2,2).min(axis=(1,3))
+
+
+def test_tile_pyramid(tmp_path):
+    seq=[1,2,0,0,0,3,4,6,0,0,5,1,2,3]*3
+    W,valid=toeplitzwall(seq,7)
+    info=nw.wallstream(seq,7,str(tmp_path),tile=(5,8),levels=3)
+    assert info==json.loads((tmp_path/'wall.json').read_text())
+    assert (info['rows'],info['widths'],info['levels'])==(len(W),[42,21,11],3)
+    heights=[len(W)]
+    for level in (1,2):
+        heights.append((heights[-1]+1)//2)
+    assert heights==[23,12,6]
+    #ceil(23/5)*ceil(42/8)+ceil(12/5)*ceil(21/8)+ceil(6/5)*ceil(11/8)
+    assert len(list(tmp_path.glob('*/*/*.png')))==5*6+3*3+2*2==43
+
+    expected=np.where(valid,np.minimum(W,len(nw.PALETTE)-1),255).astype(np.uint8)
+    for level in range(3):
+        pixels=readlevel(tmp_path,level,info)
+        assert pixels.shape==(heights[level],info['widths'][level])
+        assert (pixels==expected).all()
+        expected=halve(expected)
+    #The tiles' palette gives the colours of wallimage
+    image=np.asarray(nw.wallimage(*nw.numbwall_array(seq,7)))
+    corner=Image.open(tmp_path/'0'/'0'/'0.png').convert('RGBA')
+    assert (np.asarray(corner)==image[:5,:8]).all()
+
+
+def test_tiles_of_whole_rows(tmp_path):
+    seq=thuemorse(30)
+    W,valid=toeplitzwall(seq,2)
+    info=nw.wallstream(seq,2,str(tmp_path),tile=(4,None))
+    assert info['windows']>0 and info['levels']==1
+    assert len(list(tmp_path.glob('0/*/*.png')))==-(-len(W)//4)
+    pixels=readlevel(tmp_path,0,info)
+    assert (pixels==np.where(valid,W,255)).all()
+
+
+def intdet(seq,r,n): #det[seq[n+i-j]] (0<=i,j<r) over the rationals
+    T=[[Fraction(seq[n+i-j]) for j in range(r)] for i in range(r)]
+    d=Fraction(1)
+    for c in range(r):
+        p=next((i for i in range(c,r) if T[i][c]),None)
+        if p is None:
+            return 0
+        if p!=c:
+            T[c],T[p]=T[p],T[c]
+            d=-d
+        d*=T[c][c]
+        for i in range(c+1,r):
+            f=T[i][c]/T[c][c]
+            T[i]=[a-f*b for a,b in zip(T[i],T[c])]
+    assert d.denominator==1
+    return int(d)
+
+
+def test_integer_walls_match_exact_determinants():
+    rng=np.random.default_rng(2)
+    cases=[[1,2,0,0,0,3,-4,5,0,0,6,7,1],[1,1,2,3,5,8,13,21,34,55,89],thuemorse(16),
+           [0,0,1,-1,0,0,0,2,2,-3,1,0,0,1,5],[10**6,-10**6+1,3,0,0,0,10**5,7,-2,10**6,0,1]]
+    cases+=[rng.integers(-3,4,15).tolist() for _ in range(4)]
+    for seq in cases:
+        L=len(seq)
+        W,valid=nw.intwall(seq)
+        assert W.dtype==object
+        for r in range(1,(L+1)//2+1):
+            cols=range(max(r-1,0),min(L-r,L-1)+1)
+            assert [W[r+1,n] for n in cols]==[intdet(seq,r,n) for n in cols],(seq,r)
+        for method in ('bareiss','crt'):
+            Wm,validm=nw.numbwall_array(seq,None,method=method)
+            assert (validm==valid).all() and Wm[valid].tolist()==W[valid].tolist()
+        Wc,validc=nw.crtwall(seq,depth=4,primes=nw.largeprimes(8))
+        assert Wc[validc].tolist()==W[:6][valid[:6]].tolist()
+
+
+def test_integer_walls_reduce_to_the_walls_modulo_primes():
+    seq=[3,-1,4,1,-5,9,2,-6,5,3,5,0,0,0,8,9,7,-9,3,2]
+    W,valid=nw.intwall(seq)
+    for p in (2,3,5,7,2**31-1):
+        Wp,validp=nw.numbwall_array(seq,p)
+        assert (validp==valid).all()
+        assert [int(v)%p for v in W[valid]]==Wp[valid].tolist(),p
+
+
+def test_memoized_blocks_match_the_wall():
+    rng=np.random.default_rng(3)
+    cases=[(thuemorse(203),2,6,16),(thuemorse(150),3,8,8),(rng.integers(0,5,97).tolist(),5,5,10),
+           ([1,2,0,0,0,3,4,5,0,0,6,7,1]*5,2**61-1,4,8),(thuemorse(20),2,12,4),(thuemorse(9),2,3,16)]
+    for seq,m,depth,tile in cases:
+        W,valid=nw.memowall(seq,m,depth,tile)
+        expected,ok=nw.numbwall_array(seq,m,depth)
+        assert (valid==ok).all()
+        assert W.tolist()==expected.tolist(),(m,depth,tile)
+    seq=thuemorse(41)
+    W,valid=nw.memowall(seq,2,5,tile=4)
+    expected,ok=toeplitzwall(seq,2,depth=5)
+    assert (valid==ok).all() and W[valid].tolist()==expected[ok].tolist()
+
+
+def test_memoized_blocks_are_shared():
+    cache={}
+    seq=thuemorse(1024)
+    W,valid=nw.memowall(seq,2,6,tile=32,cache=cache)
+    #30 blocks start at multiples of 32, the segments around them take a few values only
+    assert 0<len(cache)<=8
+    keys=set(cache)
+    longer=thuemorse(2048)
+    W2,valid2=nw.memowall(longer,2,6,tile=32,cache=cache)
+    assert set(cache)==keys
+    assert W2.tolist()==nw.numbwall_array(longer,2,6)[0].tolist()
+    assert (W2[:,:1000]==W[:,:1000]).all()
+    nw.memowall(longer,2,6,tile=16,cache=cache) #Other tiles are kept apart
+    assert len(cache)>len(keys)